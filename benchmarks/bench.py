@@ -0,0 +1,310 @@
+"""Benchmarks of the prompts CLI over synthetic instruction trees.
+
+Instruction trees of increasing size are generated in a temporary directory,
+after which the startup and lookup paths are timed:
+
+- `setup_cold`: `_parser.setup` without an index cache on disk.
+- `setup_warm`: `_parser.setup` with an index cache on disk.
+- `setup_full`: `_parser.setup` with the options of all commands.
+- `list`, `find`, `read` and `make_prompt`: `Instructions` lookups for a
+  sample of the commands.
+- `cli`: wall time of `python -m prompts` in a new process.
+
+The results are written as JSON, so they can be compared across commits:
+
+```bash
+python benchmarks/bench.py --output before.json
+git checkout my_branch_name
+python benchmarks/bench.py --compare before.json --output after.json
+```
+
+The comparison table and the regressions are written to stderr, so the JSON
+on stdout stays valid when `--output` is not given.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from os.path import dirname, join
+from typing import Any
+from unittest.mock import patch
+
+_SRC: str = join(dirname(dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, _SRC)
+
+from prompts import _index, _parser, _templates  # noqa: E402
+from prompts.instructions import Instructions  # noqa: E402
+
+SIZES: tuple[int, ...] = (10, 100, 1000, 10000)
+FILETYPES: tuple[str, ...] = tuple(f"type{i}" for i in range(50))
+
+# Number of commands that are looked up per size, so the lookup benchmarks
+# measure the cost per lookup and not the size of the sample.
+_SAMPLE: int = 100
+
+
+def generate(root: str, commands: int) -> list[str]:
+    """Generate an instruction tree with `commands` commands.
+
+    Every command has a `command.md` and a `user.md` with a placeholder. Every
+    tenth command also has its own `filetype` value directory, which
+    overrides the one in `default`.
+
+    Args:
+        root: The directory in which the tree is created.
+        commands: The number of commands.
+
+    Returns:
+        The command names.
+    """
+    names: list[str] = [f"cmd{i:05d}" for i in range(commands)]
+    _write(join(root, "default", "files.md"), "Files: {files}")
+    _write(join(root, "default", "user.md"), "User: {user}")
+    for filetype in FILETYPES:
+        _write(
+            join(root, "default", "filetype", f"{filetype}.md"),
+            f"Filetype {filetype}",
+        )
+    for i, name in enumerate(names):
+        command: str = join(root, "commands", name)
+        _write(join(command, "command.md"), f"Command {name}")
+        _write(join(command, "user.md"), "Request for {user}")
+        if i % 10 == 0:
+            for filetype in FILETYPES[:5]:
+                _write(
+                    join(command, "filetype", f"{filetype}.md"),
+                    f"{name} {filetype}",
+                )
+    return names
+
+
+def _write(path: str, content: str) -> None:
+    """Write `content` to `path`, creating its parent directories."""
+    os.makedirs(dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(content)
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict[str, float]:
+    """Time `func`.
+
+    Args:
+        func: The function to time.
+        repeat: The number of times `func` is called.
+
+    Returns:
+        The minimum and median duration in seconds.
+    """
+    durations: list[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return dict(min=min(durations), median=statistics.median(durations))
+
+
+def _reset(cache: str | None = None) -> None:
+    """Forget the in-process caches and, optionally, the index cache file."""
+    _index._loaded.clear()
+    _templates.cache.clear()
+    if cache is not None:
+        shutil.rmtree(cache, ignore_errors=True)
+
+
+def run(tree: str, cache: str, names: list[str], repeat: int) -> dict:
+    """Run all benchmarks for a generated tree.
+
+    Args:
+        tree: The instructions directory.
+        cache: The cache directory, which is used instead of the user's.
+        names: The command names of the tree.
+        repeat: The number of repetitions per benchmark.
+
+    Returns:
+        Mapping of benchmark names to their timings.
+    """
+    argv: list[str] = ["--dir", tree, names[-1], "--user", "me"]
+    sample: list[str] = names[:: max(len(names) // _SAMPLE, 1)]
+    results: dict[str, dict[str, float]] = {}
+
+    def setup_cold() -> None:
+        _reset(cache)
+        _parser.setup(lazy=True, argv=argv)
+
+    def setup_warm() -> None:
+        _reset()
+        _parser.setup(lazy=True, argv=argv)
+
+    results["setup_cold"] = measure(setup_cold, repeat)
+    results["setup_warm"] = measure(setup_warm, repeat)
+    results["setup_full"] = measure(
+        lambda: _parser.setup(lazy=False, argv=argv), repeat
+    )
+
+    instructions = Instructions(tree)
+    lookups: dict[str, Callable[[str], object]] = {
+        "list": instructions.list,
+        "find": lambda x: instructions.find(x, "filetype", "type1.md"),
+        "read": lambda x: instructions.read(x, "filetype", "type1.md"),
+        "make_prompt": lambda x: instructions.make_prompt(
+            x, files="a.py", user="me", filetype="type1"
+        ),
+    }
+    for name, lookup in lookups.items():
+        timing = measure(lambda: [lookup(x) for x in sample], repeat)
+        results[name] = {k: v / len(sample) for k, v in timing.items()}
+
+    cmd: list[str] = [
+        sys.executable,
+        "-m",
+        "prompts",
+        *argv,
+        "--logfile",
+        os.devnull,
+    ]
+    pythonpath: str = os.pathsep.join(
+        filter(None, (_SRC, os.environ.get("PYTHONPATH")))
+    )
+    env: dict[str, str] = dict(
+        os.environ, PYTHONPATH=pythonpath, XDG_CACHE_HOME=dirname(cache)
+    )
+    results["cli"] = measure(
+        lambda: subprocess.run(cmd, env=env, check=True, capture_output=True),
+        repeat,
+    )
+    return results
+
+
+def metadata() -> dict[str, Any]:
+    """Return information about the environment of the benchmark."""
+    try:
+        commit: str = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=dirname(_SRC),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return dict(
+        commit=commit,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        time=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    )
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Compare the median timings of two benchmark runs.
+
+    A table with the timings and their ratio is written to stderr.
+
+    Args:
+        baseline: The results of the earlier run.
+        current: The results of the later run.
+        threshold: The ratio above which a benchmark is a regression.
+
+    Returns:
+        A line per regression.
+    """
+    regressions: list[str] = []
+    print(
+        f"{'size':>6} {'benchmark':<12} {'before':>10} {'after':>10} ratio",
+        file=sys.stderr,
+    )
+    for size, benchmarks in current["results"].items():
+        for name, timing in benchmarks.items():
+            before = baseline["results"].get(size, {}).get(name)
+            if before is None:
+                continue
+            ratio: float = timing["median"] / max(before["median"], 1e-9)
+            line: str = (
+                f"{size:>6} {name:<12} {before['median']:>10.6f} "
+                f"{timing['median']:>10.6f} {ratio:.2f}"
+            )
+            print(line, file=sys.stderr)
+            if ratio > threshold:
+                regressions.append(line)
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmarks from the command line.
+
+    Args:
+        argv: The command-line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        The exit status, which is 1 if a regression was found.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=lambda x: [int(y) for y in x.split(",")],
+        default=list(SIZES),
+        help="Comma-separated numbers of commands (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of repetitions per benchmark (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="JSON output file (default: -)"
+    )
+    parser.add_argument(
+        "--compare", default="", help="JSON results of an earlier run"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="Slowdown ratio that counts as a regression (default: "
+        "%(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    report: dict[str, Any] = dict(meta=metadata(), results={})
+    for size in args.sizes:
+        workdir: str = tempfile.mkdtemp(prefix="prompts-bench-")
+        try:
+            tree: str = join(workdir, "instructions")
+            cache: str = join(workdir, "cache", "bartste-prompts")
+            names: list[str] = generate(tree, size)
+            with patch("prompts._paths.cache", cache):
+                results = run(tree, cache, names, args.repeat)
+            report["results"][str(size)] = results
+            _reset()
+        finally:
+            shutil.rmtree(workdir)
+        print(f"Finished {size} commands", file=sys.stderr)
+
+    text: str = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+
+    if not args.compare:
+        return 0
+    with open(args.compare, encoding="utf-8") as file:
+        baseline = json.load(file)
+    regressions: list[str] = compare(baseline, report, args.threshold)
+    for line in regressions:
+        print(f"Regression: {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,11 @@
-from importlib.metadata import version
+def __getattr__(name: str) -> str:
+    """Resolve the package version lazily.
 
-__version__ = version("bartste-prompts")
+    Looking up the version through `importlib.metadata` is relatively slow,
+    so it is only done when `__version__` is accessed.
+    """
+    if name == "__version__":
+        from importlib.metadata import version
+
+        return version("bartste-prompts")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,6 +1,8 @@
 """Entry point for the prompt generation CLI."""
 
-from prompts import _parser
+import sys
+
+from prompts import _parser, profiling
 
 
 def main() -> None:
@@ -8,9 +10,44 @@ def main() -> None:
 
     This function parses command line arguments, sets up logging,
     and executes the function specified by the arguments.
+
+    When one of the profiling options is given, the whole call is profiled
+    and the timing breakdown is written to stderr or to `--profile-output`,
+    even if the command fails.
+    """
+    options = _parser.preparse_profile()
+    if not (options.profile or options.profile_output or options.cprofile):
+        args = _parser.setup(lazy=True).parse_args()
+        args.func(args)
+        return
+
+    with profiling.profile(cprofile=bool(options.cprofile)) as profiler:
+        try:
+            with profiling.span("setup"):
+                args = _parser.setup(lazy=True).parse_args()
+            with profiling.span("run"):
+                args.func(args)
+        finally:
+            _report(profiler, options.profile_output, options.cprofile)
+
+
+def _report(profiler: profiling.Profiler, output: str, cprofile: str) -> None:
+    """Write the results of the profiler.
+
+    Args:
+        profiler: The profiler, which is still running.
+        output: The file for the timing breakdown, or an empty string for
+            stderr.
+        cprofile: The file for the cProfile profile, if any.
     """
-    args = _parser.setup().parse_args()
-    args.func(args)
+    profiler.stop()
+    if cprofile:
+        profiler.dump_stats(cprofile)
+    if not output:
+        profiler.dump(sys.stderr)
+        return
+    with open(output, "w", encoding="utf-8") as file:
+        profiler.dump(file)
 
 
 if __name__ == "__main__":
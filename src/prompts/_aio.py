@@ -0,0 +1,102 @@
+"""Asyncio helpers for actions that run a subprocess.
+
+Like `pygeneral.process.stream_subprocess`, but the output is read without
+blocking the event loop, so many actions can run concurrently in a single
+thread.
+"""
+
+import asyncio
+import codecs
+from collections.abc import Callable, Iterable
+
+from prompts._logger import logger
+
+# Seconds to wait for a child to exit after it was terminated.
+_GRACE: float = 5.0
+
+# Bytes that are read from a pipe at once.
+_CHUNK: int = 65536
+
+Sink = Callable[[str], object]
+
+
+async def stream_subprocess(
+    cmd: list[str], stdout: Iterable[Sink], stderr: Iterable[Sink]
+) -> int:
+    """Run a command and pass its output, line by line, to sinks.
+
+    When the task is cancelled, the child is terminated, and killed if it
+    does not exit within a few seconds, before the cancellation propagates.
+
+    Args:
+        cmd: The command and its arguments.
+        stdout: Callables that receive each line of stdout.
+        stderr: Callables that receive each line of stderr.
+
+    Returns:
+        The return code of the command.
+
+    Raises:
+        OSError: If the command cannot be started.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    assert process.stdout and process.stderr
+    try:
+        await asyncio.gather(
+            _pump(process.stdout, list(stdout)),
+            _pump(process.stderr, list(stderr)),
+        )
+        return await process.wait()
+    except BaseException:
+        await _kill(process)
+        raise
+
+
+async def _pump(reader: asyncio.StreamReader, sinks: list[Sink]) -> None:
+    """Pass the lines of `reader` to `sinks` until the end of the stream.
+
+    The output is read in chunks instead of with `readline`, so lines that
+    are longer than the limit of the reader, like a large diff on a single
+    line, do not fail.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    buffer: str = ""
+    while chunk := await reader.read(_CHUNK):
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            _send(sinks, f"{line}\n")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        _send(sinks, buffer)
+
+
+def _send(sinks: list[Sink], text: str) -> None:
+    """Pass `text` to each of `sinks`."""
+    for sink in sinks:
+        sink(text)
+
+
+async def _kill(process: asyncio.subprocess.Process) -> None:
+    """Terminate a child process, and kill it if it does not exit.
+
+    Args:
+        process: The child process.
+    """
+    if process.returncode is not None:
+        return
+    logger.info("Terminating process %s", process.pid)
+    try:
+        process.terminate()
+        await asyncio.wait_for(asyncio.shield(process.wait()), _GRACE)
+    except ProcessLookupError:
+        return
+    except (TimeoutError, asyncio.CancelledError):
+        logger.warning("Killing process %s", process.pid)
+        process.kill()
+        await asyncio.shield(process.wait())
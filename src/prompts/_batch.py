@@ -0,0 +1,291 @@
+"""Generate prompts for a stream of requests.
+
+Each line of the input is a JSON object with the command and the values of
+its instructions, e.g.:
+
+```json
+{"command": "docstrings", "files": "main.py", "filetype": "python"}
+```
+
+For each request, a JSON object is written to the output, in the same order
+as the input. With the `json` action (the default) it contains the command,
+the prompt and the values, like the `json` action of the CLI. With the
+`print` action it only contains the prompt. With the `openai` action, the
+prompt is sent to an OpenAI-compatible endpoint and the object contains the
+prompt and the `reply`. If a request fails, the object contains an `error`
+instead. Values that are `null` are left out, like values that are not given.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from contextlib import ExitStack
+from functools import partial
+from itertools import batched
+from typing import Any, TextIO
+
+from prompts import _parser
+from prompts._logger import logger
+from prompts.builder import PromptBuilder
+
+ACTIONS: set[str] = {"print", "json", "openai"}
+
+# Builders of the current process per instructions directory, which are
+# created by `_initialize`. The workers of a thread pool share them.
+_builders: dict[str, PromptBuilder] = {}
+_lock = threading.Lock()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of the `batch` subcommand.
+
+    Args:
+        parser: The subcommand parser to add options to.
+    """
+    parser.add_argument(
+        "-i",
+        "--input",
+        default="-",
+        help="JSONL file with requests, or - for stdin",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="JSONL file to write the results to, or - for stdout",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of workers that generate prompts",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=["thread", "process"],
+        default="thread",
+        help="Generate prompts in a thread or a process pool",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=64,
+        help="Number of requests that are sent to a worker at once",
+    )
+    _parser.add_logging_options(parser)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Read the requests, generate the prompts and write the results.
+
+    Args:
+        args: Parsed command-line arguments.
+    """
+    _parser.setup_logging(args)
+    with ExitStack() as stack:
+        source: TextIO = _open(stack, args.input, "r", sys.stdin)
+        target: TextIO = _open(stack, args.output, "w", sys.stdout)
+        results = generate(
+            source,
+            args.dir,
+            workers=args.workers,
+            executor=args.executor,
+            chunksize=args.chunksize,
+        )
+        for result in results:
+            target.write(json.dumps(result) + "\n")
+
+
+def generate(
+    lines: Iterable[str],
+    directory: str,
+    workers: int = 1,
+    executor: str = "thread",
+    chunksize: int = 64,
+) -> Iterator[dict[str, Any]]:
+    """Generate a result for each JSON request in `lines`.
+
+    The lines are consumed lazily and at most a few chunks per worker are
+    in flight, so the memory usage does not depend on the input size.
+
+    Args:
+        lines: JSON encoded requests, one per line. Empty lines are skipped.
+        directory: The instructions directory.
+        workers: The number of workers.
+        executor: Either "thread" or "process".
+        chunksize: The number of requests that are sent to a worker at once.
+
+    Yields:
+        The results in the same order as the requests.
+    """
+    requests: Iterator[str] = (line for line in lines if line.strip())
+    chunks: Iterator[tuple[str, ...]] = batched(requests, max(chunksize, 1))
+    render: Callable[[tuple[str, ...]], list[dict[str, Any]]] = partial(
+        _render_chunk, directory
+    )
+    with _make_executor(executor, workers, directory) as pool:
+        for results in _ordered(pool, render, chunks, 2 * workers):
+            yield from results
+
+
+def _make_executor(kind: str, workers: int, directory: str) -> Executor:
+    """Create an executor whose workers share one PromptBuilder instance.
+
+    Args:
+        kind: Either "thread" or "process".
+        workers: The number of workers.
+        directory: The instructions directory.
+
+    Returns:
+        The executor.
+    """
+    cls = ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+    return cls(
+        max_workers=max(workers, 1),
+        initializer=_initialize,
+        initargs=(directory,),
+    )
+
+
+def _ordered(
+    pool: Executor,
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    window: int,
+) -> Iterator[Any]:
+    """Map `func` over `items` in `pool`, preserving the order.
+
+    Unlike `Executor.map`, the items are submitted lazily: at most `window`
+    items are pending at any time.
+
+    Args:
+        pool: The executor.
+        func: The function to apply.
+        items: The items to apply `func` to.
+        window: The maximum number of pending items.
+
+    Yields:
+        The results of `func` in the order of `items`.
+    """
+    pending: deque[Future[Any]] = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _initialize(directory: str) -> None:
+    """Create the PromptBuilder of the worker for `directory`.
+
+    The instructions are read into memory once, so the requests are rendered
+    without filesystem I/O. Invalid instructions are reported per request.
+    The builders are kept per directory, so pools for other directories that
+    run at the same time do not replace them.
+
+    Args:
+        directory: The instructions directory.
+    """
+    with _lock:
+        if directory not in _builders:
+            _builders[directory] = PromptBuilder(directory, validate=False)
+
+
+def _render_chunk(
+    directory: str, lines: tuple[str, ...]
+) -> list[dict[str, Any]]:
+    """Render a chunk of requests.
+
+    Args:
+        directory: The instructions directory.
+        lines: The JSON encoded requests.
+
+    Returns:
+        The results, in the same order.
+    """
+    builder: PromptBuilder = _builders[directory]
+    return [_render(builder, line) for line in lines]
+
+
+def _render(builder: PromptBuilder, line: str) -> dict[str, Any]:
+    """Render a single request.
+
+    Args:
+        builder: The PromptBuilder of the instructions directory.
+        line: The JSON encoded request.
+
+    Returns:
+        The result, or a dict with an error message if the request failed.
+    """
+    try:
+        request: dict[str, Any] = {
+            key: value
+            for key, value in json.loads(line).items()
+            if value is not None
+        }
+        action: str = request.pop("action", "json")
+        if "command" not in request:
+            raise ValueError("Missing command")
+        if action not in ACTIONS:
+            raise ValueError(f"Action not supported in batch mode: {action}")
+        kwargs: dict[str, str] = {
+            key: ",".join(value) if isinstance(value, list) else str(value)
+            for key, value in request.items()
+        }
+        prompt: str = builder.render(**kwargs)
+    except Exception as error:
+        logger.debug("Failed to render request: %s", line, exc_info=True)
+        return dict(error=f"{type(error).__name__}: {error}")
+
+    if action == "print":
+        return dict(prompt=prompt)
+    if action == "openai":
+        return _reply(prompt)
+    return {"command": kwargs["command"], "prompt": prompt, **kwargs}
+
+
+def _reply(prompt: str) -> dict[str, Any]:
+    """Send a prompt to the configured OpenAI-compatible endpoint.
+
+    Args:
+        prompt: The prompt.
+
+    Returns:
+        The prompt and the reply, or a dict with an error message if the
+        request failed.
+    """
+    from prompts import _http
+
+    try:
+        return dict(prompt=prompt, reply=_http.chat(prompt, lambda _: None))
+    except (OSError, _http.HTTPError) as error:
+        return dict(prompt=prompt, error=f"{type(error).__name__}: {error}")
+
+
+def _open(stack: ExitStack, path: str, mode: str, default: TextIO) -> TextIO:
+    """Open `path`, or return `default` if `path` is "-".
+
+    Args:
+        stack: The exit stack that closes the opened file.
+        path: The path to open.
+        mode: The mode to open the file in.
+        default: The stream to use for "-".
+
+    Returns:
+        The opened stream.
+    """
+    if path == "-":
+        return default
+    return stack.enter_context(open(path, mode, encoding="utf-8"))
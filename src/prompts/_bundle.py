@@ -0,0 +1,292 @@
+"""Single-file bundles of an instructions directory.
+
+A bundle packs an instructions tree into one file, so it can be shipped and
+read without touching many small files, e.g., on network filesystems. Pass
+the bundle as `--dir` to use it instead of the directory. The file layout
+is:
+
+- The magic bytes `PROMPTS\\0` and the format version.
+- The length of the header, as an unsigned 64-bit little-endian integer.
+- The JSON header, with the entries of each directory and, for each file,
+  its offset and length in the data section. Relative paths use "/" as
+  separator, like in an `Index`.
+- The data section with the contents of all files.
+
+The bundle is mapped into memory with `mmap`, so looking up and reading an
+instruction does not need any system calls.
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from os.path import abspath, dirname, join
+
+from prompts import _index, _parser, profiling
+from prompts._index import Index, Overlay
+from prompts._logger import logger
+from prompts._templates import Template
+
+MAGIC: bytes = b"PROMPTS\0"
+_VERSION: int = 1
+_PREAMBLE: struct.Struct = struct.Struct("<8sIQ")
+_loaded: dict[str, "Bundle"] = {}
+
+
+class BundleError(Exception):
+    """Raised when a file is not a valid bundle."""
+
+
+class Bundle:
+    """Index of an instructions bundle, see the module docstring.
+
+    A bundle answers the same queries as an `Index`, so `Instructions` can
+    use either of them. Templates are parsed once per bundle.
+
+    Attributes:
+        directory: The absolute path of the bundle file.
+    """
+
+    directory: str
+    _dirs: dict[str, list[str]]
+    _files: dict[str, tuple[int, int]]
+    _data: mmap.mmap
+    _offset: int
+    _stat: tuple[int, int, int]
+    _templates: dict[str, Template]
+
+    def __init__(self, path: str) -> None:
+        """Map a bundle into memory and read its header.
+
+        Use `Bundle.load` instead of calling this directly.
+
+        Args:
+            path: The path of the bundle file.
+
+        Raises:
+            BundleError: If the file is not a valid bundle.
+        """
+        self.directory = abspath(path)
+        self._templates = {}
+        with open(self.directory, "rb") as file:
+            stat = os.fstat(file.fileno())
+            self._stat = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if stat.st_size < _PREAMBLE.size:
+                raise BundleError(f"Not an instructions bundle: {path}")
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, size = _PREAMBLE.unpack_from(self._data)
+        if magic != MAGIC or version != _VERSION:
+            raise BundleError(f"Not an instructions bundle: {path}")
+        start: int = _PREAMBLE.size
+        header = json.loads(self._data[start : start + size])
+        self._dirs = header["dirs"]
+        self._files = {k: (v[0], v[1]) for k, v in header["files"].items()}
+        self._offset = start + size
+
+    @classmethod
+    def load(cls, path: str) -> "Bundle":
+        """Return the bundle at `path`.
+
+        The bundle is taken from memory if it was loaded before by this
+        process and the file was not replaced or modified since.
+
+        Args:
+            path: The path of the bundle file.
+
+        Returns:
+            The bundle.
+
+        Raises:
+            BundleError: If the file is not a valid bundle.
+        """
+        path = abspath(path)
+        with profiling.span("bundle.load"):
+            bundle: Bundle | None = _loaded.get(path)
+            if bundle is None or bundle.is_stale():
+                logger.debug("Loading instructions bundle: %s", path)
+                bundle = _loaded[path] = cls(path)
+        return bundle
+
+    def is_stale(self) -> bool:
+        """Return True if the bundle file was replaced or modified."""
+        try:
+            stat = os.stat(self.directory)
+        except OSError:
+            return True
+        return self._stat != (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def digest(self) -> str:
+        """Return a digest of the bundle file, see `Index.digest`.
+
+        A bundle is only replaced as a whole, so its inode, size and mtime
+        identify its contents.
+        """
+        identity: str = f"{self.directory}\0{self._stat}"
+        return hashlib.sha1(identity.encode()).hexdigest()
+
+    def path(self, relative: str) -> str:
+        """Return a path for a relative path in the bundle.
+
+        The path does not exist on disk; it is only used in messages.
+
+        Args:
+            relative: A "/" separated path relative to the bundle root.
+
+        Returns:
+            The path.
+        """
+        if not relative:
+            return self.directory
+        return join(self.directory, *relative.split("/"))
+
+    def which(self, relative: str) -> str:
+        """Return the bundle that serves `relative`, see `Overlay.which`.
+
+        Args:
+            relative: A "/" separated path relative to the bundle.
+        """
+        return self.directory
+
+    def exists(self, relative: str) -> bool:
+        """Return True if `relative` is a file or directory in the bundle.
+
+        Args:
+            relative: A "/" separated path relative to the bundle root.
+        """
+        return relative in self._files or relative in self._dirs
+
+    def isfile(self, relative: str) -> bool:
+        """Return True if `relative` is a file in the bundle.
+
+        Args:
+            relative: A "/" separated path relative to the bundle root.
+        """
+        return relative in self._files
+
+    def listdir(self, relative: str) -> list[str]:
+        """Return the entries of a directory in the bundle.
+
+        Args:
+            relative: A "/" separated path relative to the bundle root.
+
+        Returns:
+            The names of the entries, like `os.listdir`.
+
+        Raises:
+            FileNotFoundError: If the directory is not in the bundle.
+        """
+        try:
+            return self._dirs[relative]
+        except KeyError as error:
+            raise FileNotFoundError(self.path(relative)) from error
+
+    def template(self, relative: str) -> Template:
+        """Return the parsed template of a file in the bundle.
+
+        Args:
+            relative: A "/" separated path relative to the bundle root.
+
+        Returns:
+            The template.
+
+        Raises:
+            FileNotFoundError: If the file is not in the bundle.
+        """
+        template: Template | None = self._templates.get(relative)
+        if template is None:
+            try:
+                offset, length = self._files[relative]
+            except KeyError as error:
+                raise FileNotFoundError(self.path(relative)) from error
+            start: int = self._offset + offset
+            source: bytes = self._data[start : start + length]
+            template = self._templates[relative] = Template(source.decode())
+        return template
+
+
+def pack(directory: str, output: str) -> int:
+    """Pack an instructions directory into a bundle.
+
+    The bundle is written atomically, so processes that read the previous
+    version of the bundle are not affected.
+
+    Args:
+        directory: The instructions directory. Multiple layers, separated
+            by `os.pathsep`, are packed as they are merged by `Overlay`.
+        output: The path of the bundle file.
+
+    Returns:
+        The number of packed files.
+
+    Raises:
+        NotADirectoryError: If a layer is not a directory.
+    """
+    for layer in directory.split(os.pathsep):
+        if not os.path.isdir(layer):
+            raise NotADirectoryError(f"Not an instructions directory: {layer}")
+
+    index: Index | Bundle | Overlay = _index.load(directory)
+    dirs: dict[str, list[str]] = {}
+    files: list[str] = []
+    pending: list[str] = [""]
+    while pending:
+        relative: str = pending.pop()
+        dirs[relative] = index.listdir(relative)
+        for name in dirs[relative]:
+            child: str = f"{relative}/{name}" if relative else name
+            (files if index.isfile(child) else pending).append(child)
+
+    table: dict[str, tuple[int, int]] = {}
+    chunks: list[bytes] = []
+    offset: int = 0
+    for relative in sorted(files):
+        with open(index.path(relative), "rb") as file:
+            data: bytes = file.read()
+        table[relative] = (offset, len(data))
+        chunks.append(data)
+        offset += len(data)
+
+    header: bytes = json.dumps(dict(dirs=dirs, files=table)).encode()
+    target: str = abspath(output)
+    fd, tmp = tempfile.mkstemp(dir=dirname(target), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(_PREAMBLE.pack(MAGIC, _VERSION, len(header)))
+            file.write(header)
+            file.writelines(chunks)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(files)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of the `bundle` subcommand.
+
+    Args:
+        parser: The subcommand parser to add options to.
+    """
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="Path of the bundle file to write",
+    )
+    _parser.add_logging_options(parser)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Pack the instructions directory of `--dir` into a bundle.
+
+    Args:
+        args: Parsed command-line arguments.
+    """
+    _parser.setup_logging(args)
+    count: int = pack(args.dir, args.output)
+    logger.info("Packed %s instructions into '%s'", count, args.output)
+    print(f"Packed {count} instructions into {args.output}")
@@ -0,0 +1,276 @@
+"""On-disk cache of rendered prompts.
+
+A prompt only depends on the instruction tree, the command and the values
+of its instructions. The cache stores each prompt in a file that is named
+after a hash of these inputs, where the tree is represented by
+`Instructions.digest`, so editing, adding or removing an instruction file
+results in new keys instead of stale prompts. A cache hit never reads or
+parses the instruction files.
+
+The cache is opt-in, see the `--cache` option, as the prompts contain the
+values of the instructions, e.g., diffs or secrets that are passed with
+`--user`, which are then stored on disk in plain text.
+
+Entries are written atomically, so parallel jobs that share the cache never
+read a partially written prompt. The total size of the cache is bounded by
+the environment variable `PROMPTS_CACHE_SIZE`, in bytes (default: 64 MiB);
+when it is exceeded, the least recently used prompts are removed. The cache
+directory is only checked after one in `_EVICT_EVERY` writes, so the cache
+can exceed its size by a few entries in between.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from contextlib import suppress
+from os.path import join
+
+from prompts import _parser, _paths
+from prompts._logger import logger
+from prompts.instructions import Instructions
+
+_VERSION: int = 1
+_SUFFIX: str = ".txt"
+_EVICT_EVERY: int = 32
+
+
+class PromptCache:
+    """Content-addressed cache of rendered prompts, see the module docstring.
+
+    Attributes:
+        directory: The directory of the cache files.
+        max_size: The maximum total size of the cache files, in bytes.
+        hits: The number of prompts that were read from the cache by this
+            instance.
+        misses: The number of prompts that were rendered by this instance.
+    """
+
+    directory: str
+    max_size: int
+    hits: int
+    misses: int
+    _lock: threading.Lock
+
+    def __init__(self, directory: str = "", max_size: int = 0) -> None:
+        """Initialize the cache.
+
+        Args:
+            directory: The directory of the cache files. Defaults to the
+                `prompts` directory in the cache directory of the package.
+            max_size: The maximum total size in bytes. Defaults to the value
+                of `PROMPTS_CACHE_SIZE`.
+        """
+        self.directory = directory or join(_paths.cache, "prompts")
+        self.max_size = max_size or int(
+            os.environ.get("PROMPTS_CACHE_SIZE", 64 * 1024 * 1024)
+        )
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def make_prompt(
+        self, instructions: Instructions, command: str, **kwargs: str
+    ) -> str:
+        """Return the prompt of `Instructions.make_prompt`, using the cache.
+
+        Args:
+            instructions: The instructions that render the prompt.
+            command: The command name.
+            **kwargs: The values of the instructions.
+
+        Returns:
+            The prompt.
+        """
+        key: str = self.key(instructions, command, kwargs)
+        prompt: str | None = self.get(key)
+        with self._lock:
+            if prompt is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if prompt is not None:
+            logger.debug("Prompt read from cache: %s", key)
+            return prompt
+
+        prompt = instructions.make_prompt(command, **kwargs)
+        self.put(key, prompt)
+        return prompt
+
+    @staticmethod
+    def key(
+        instructions: Instructions, command: str, kwargs: dict[str, str]
+    ) -> str:
+        """Return the key of a prompt.
+
+        Empty values are left out, like in `make_prompt`. The order of the
+        values is part of the key, as it is the order of the instructions
+        in the prompt.
+
+        Args:
+            instructions: The instructions that render the prompt.
+            command: The command name.
+            kwargs: The values of the instructions.
+
+        Returns:
+            The hexadecimal SHA-256 hash of the inputs.
+        """
+        values = [[key, str(value)] for key, value in kwargs.items() if value]
+        data = [_VERSION, instructions.digest(), command, values]
+        return hashlib.sha256(json.dumps(data).encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Return the cached prompt of `key`, if there is one.
+
+        The entry is marked as recently used.
+
+        Args:
+            key: The key of the prompt.
+
+        Returns:
+            The prompt, or None if it is not cached.
+        """
+        path: str = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                prompt: str = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return prompt
+
+    def put(self, key: str, prompt: str) -> None:
+        """Add a prompt to the cache and evict old entries if needed.
+
+        Listing the cache directory is only worth it after a number of
+        writes, so only keys whose hash falls in one of `_EVICT_EVERY`
+        buckets evict, which spreads the evictions over all processes that
+        share the cache.
+
+        Failures are logged and otherwise ignored as the cache is only an
+        optimization.
+
+        Args:
+            key: The key of the prompt.
+            prompt: The prompt.
+        """
+        path: str = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(prompt)
+            os.replace(tmp, path)
+        except OSError as error:
+            logger.debug("Could not write prompt cache '%s': %s", path, error)
+            return
+        if zlib.crc32(key.encode()) % _EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """Remove the least recently used entries until the size fits.
+
+        Entries that are removed by another process at the same time are
+        skipped.
+
+        Returns:
+            The number of removed entries.
+        """
+        entries: list[tuple[int, int, str]] = []
+        for entry in self._entries():
+            with suppress(OSError):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        size: int = sum(x[1] for x in entries)
+        removed: int = 0
+        for _, length, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            with suppress(FileNotFoundError):
+                os.unlink(path)
+                removed += 1
+            size -= length
+        if removed:
+            logger.debug("Evicted %s prompts from the cache", removed)
+        return removed
+
+    def stats(self) -> dict[str, int | str]:
+        """Return the number of entries and the size of the cache.
+
+        Returns:
+            The directory, the number of entries, their total size and the
+            maximum size, in bytes.
+        """
+        entries: int = 0
+        size: int = 0
+        for entry in self._entries():
+            with suppress(OSError):
+                size += entry.stat().st_size
+                entries += 1
+        return dict(
+            directory=self.directory,
+            entries=entries,
+            size=size,
+            max_size=self.max_size,
+        )
+
+    def clear(self) -> int:
+        """Remove all entries, including unfinished writes.
+
+        Returns:
+            The number of removed entries.
+        """
+        removed: int = 0
+        with suppress(FileNotFoundError), os.scandir(self.directory) as it:
+            for entry in it:
+                with suppress(FileNotFoundError):
+                    os.unlink(entry.path)
+                    removed += entry.name.endswith(_SUFFIX)
+        return removed
+
+    def _entries(self) -> list[os.DirEntry[str]]:
+        """Return the cache files, without unfinished writes."""
+        try:
+            with os.scandir(self.directory) as it:
+                return [x for x in it if x.name.endswith(_SUFFIX)]
+        except FileNotFoundError:
+            return []
+
+    def _path(self, key: str) -> str:
+        """Return the path of the cache file of `key`."""
+        return join(self.directory, f"{key}{_SUFFIX}")
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of the `cache` subcommand.
+
+    Args:
+        parser: The subcommand parser to add options to.
+    """
+    parser.add_argument(
+        "operation",
+        choices=["stats", "clear"],
+        help="Show the size of the prompt cache, or remove all prompts",
+    )
+    _parser.add_logging_options(parser)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Show the statistics of the prompt cache or clear it.
+
+    Args:
+        args: Parsed command-line arguments.
+    """
+    _parser.setup_logging(args)
+    cache = PromptCache()
+    if args.operation == "clear":
+        removed: int = cache.clear()
+        logger.info("Removed %s prompts from '%s'", removed, cache.directory)
+        print(f"Removed {removed} prompts from {cache.directory}")
+        return
+    for key, value in cache.stats().items():
+        print(f"{key}: {value}")
@@ -0,0 +1,72 @@
+"""Thin client for the prompt server.
+
+The client is a drop-in replacement for the `prompts` entry point. It sends
+its command-line arguments to a server that is started with `prompts serve`
+and writes the response to stdout and stderr. If no server is running, or if
+the server cannot handle the request, the command is run locally instead.
+
+Only the standard library and `prompts._paths` are imported here, so the
+client starts as fast as the interpreter allows.
+"""
+
+import json
+import os
+import socket
+import sys
+from collections.abc import Sequence
+
+from prompts import _paths
+
+
+def main() -> None:
+    """Entry point of the client."""
+    status: int | None = request(sys.argv[1:])
+    if status is None:
+        from prompts.__main__ import main as run_locally
+
+        run_locally()
+    else:
+        sys.exit(status)
+
+
+def request(argv: Sequence[str], path: str = "") -> int | None:
+    """Let the server run a command and stream its output.
+
+    Args:
+        argv: The command-line arguments, without the program name.
+        path: The path of the Unix socket. Defaults to the socket path of
+            `prompts serve`.
+
+    Returns:
+        The exit status of the command, or None if the command must be run
+        locally.
+    """
+    path = path or _paths.socket
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        client.close()
+        return None
+
+    with client, client.makefile("rwb") as stream:
+        message: str = json.dumps(dict(argv=list(argv), cwd=os.getcwd()))
+        stream.write(message.encode() + b"\n")
+        stream.flush()
+        for line in stream:
+            response: dict = json.loads(line)
+            if "stdout" in response:
+                sys.stdout.write(response["stdout"])
+            elif "stderr" in response:
+                sys.stderr.write(response["stderr"])
+            elif "exit" in response:
+                return response["exit"]
+            elif response.get("fallback"):
+                return None
+
+    print("prompts: error: connection to server was lost", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+"""Static shell completion scripts for bash, zsh and fish.
+
+Completing `prompts <TAB>` by calling the CLI would start Python and scan the
+instruction tree on every key press. Instead, `prompts completions` writes
+a manifest of the commands, their options and the values of the options,
+e.g., the names in the `filetype` directories, together with completion
+scripts that contain the same data. The manifest also contains the help
+text of each command.
+
+The scripts only compare the modification times of the instruction tree
+with that of the manifest, using `find -newer`. When an instruction file
+was added, removed or changed, the scripts run `prompts completions` to
+regenerate themselves and source the new version; otherwise, completion
+never starts the interpreter.
+"""
+
+import argparse
+import json
+import os
+import shlex
+import sys
+import tempfile
+from os.path import join
+from typing import Any
+
+from prompts import _parser, _paths
+from prompts._logger import logger
+from prompts.instructions import Instructions
+
+_VERSION: int = 1
+_MANIFEST: str = "manifest.json"
+
+# The file name of the script of each shell.
+SCRIPTS: dict[str, str] = {
+    "bash": "prompts.bash",
+    "zsh": "_prompts",
+    "fish": "prompts.fish",
+}
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of the `completions` subcommand.
+
+    Args:
+        parser: The subcommand parser to add options to.
+    """
+    parser.add_argument(
+        "--output-dir",
+        default="",
+        help="Directory of the scripts and the manifest; defaults to the "
+        "completions directory in the cache directory",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate the scripts even if the instructions did not change",
+    )
+    _parser.add_logging_options(parser)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Write the completion scripts and print how to load them.
+
+    Args:
+        args: Parsed command-line arguments.
+    """
+    _parser.setup_logging(args)
+    output: str = args.output_dir or join(_paths.cache, "completions")
+    scripts: dict[str, str] = generate(args.dir, output, force=args.force)
+    for shell, path in scripts.items():
+        print(f"{shell}: source {shlex.quote(path)}")
+
+
+def generate(
+    directory: str, output: str, force: bool = False
+) -> dict[str, str]:
+    """Write the manifest and the completion scripts, if they are outdated.
+
+    The scripts are outdated if the digest of the instructions differs from
+    the one in the manifest. If they are up to date, only the modification
+    time of the manifest is updated, so the scripts do not check again.
+
+    Args:
+        directory: The instructions directory, as given to `--dir`.
+        output: The directory of the scripts and the manifest.
+        force: Regenerate the scripts even if they are up to date.
+
+    Returns:
+        The path of the script of each shell.
+    """
+    paths: dict[str, str] = {k: join(output, v) for k, v in SCRIPTS.items()}
+    manifest_path: str = join(output, _MANIFEST)
+    digest: str = Instructions(directory).digest()
+    if not force and _read_digest(manifest_path) == digest:
+        if all(os.path.exists(x) for x in paths.values()):
+            logger.debug("Completions are up to date: %s", output)
+            os.utime(manifest_path)
+            return paths
+
+    data: dict[str, Any] = manifest(directory)
+    regenerate: str = " ".join(
+        [
+            shlex.quote(sys.executable),
+            "-m",
+            "prompts",
+            "--dir",
+            shlex.quote(directory),
+            "completions",
+            "--output-dir",
+            shlex.quote(output),
+        ]
+    )
+    for shell, path in paths.items():
+        script: str = _RENDERERS[shell](data, path, manifest_path, regenerate)
+        _write(path, script)
+    # The manifest is written last, so it is newer than the scripts.
+    _write(manifest_path, json.dumps(data, indent=2) + "\n")
+    logger.info("Wrote completions for %s to '%s'", list(paths), output)
+    return paths
+
+
+def manifest(directory: str) -> dict[str, Any]:
+    """Return the commands and options of the CLI.
+
+    The options are read from a fully configured parser, so the options of
+    the builtin subcommands are included as well. The values of options
+    without choices are the names of the matching instruction directories,
+    e.g., `filetype`.
+
+    Args:
+        directory: The instructions directory, as given to `--dir`.
+
+    Returns:
+        The manifest, with the options of the main parser, the commands with
+        their help, options and positional arguments, and the directories
+        of the instruction tree.
+    """
+    parser = _parser.setup(argv=["--dir", directory])
+    instructions = Instructions(directory)
+    names: list[str] = sorted(instructions.list_commands())
+    commands: dict[str, Any] = {}
+    subparsers: argparse._SubParsersAction = next(
+        x for x in parser._actions if isinstance(x, argparse._SubParsersAction)
+    )
+    descriptions: dict[str, str] = {
+        x.dest: x.help or "" for x in subparsers._choices_actions
+    }
+    for name, subparser in sorted(subparsers.choices.items()):
+        sources: list[str] = [name] if name in names else names
+        commands[name] = dict(
+            help=descriptions.get(name, ""),
+            options=_options(subparser, instructions, sources),
+            arguments=_arguments(subparser),
+            usage=subparser.format_help(),
+        )
+    return dict(
+        version=_VERSION,
+        digest=instructions.digest(),
+        directories=[x for x in directory.split(os.pathsep) if x],
+        options=_options(parser, instructions, []),
+        commands=commands,
+        usage=parser.format_help(),
+    )
+
+
+def _options(
+    parser: argparse.ArgumentParser,
+    instructions: Instructions,
+    commands: list[str],
+) -> list[dict[str, Any]]:
+    """Return the options of a parser.
+
+    Args:
+        parser: The parser.
+        instructions: The instructions that provide the values of options
+            without choices.
+        commands: The commands whose instruction values are used.
+
+    Returns:
+        The flags, help, whether the option takes a value, and the choices
+        of each option.
+    """
+    options: list[dict[str, Any]] = []
+    for action in parser._actions:
+        if not action.option_strings or action.help == argparse.SUPPRESS:
+            continue
+        choices: set[str] = set()
+        if action.choices is not None:
+            choices.update(str(x) for x in action.choices)
+        else:
+            for command in commands:
+                choices |= instructions.values(command, action.dest)
+        options.append(
+            dict(
+                flags=list(action.option_strings),
+                help=_help(action, parser.prog),
+                value=action.nargs != 0,
+                choices=sorted(choices),
+            )
+        )
+    return options
+
+
+def _arguments(parser: argparse.ArgumentParser) -> list[dict[str, Any]]:
+    """Return the positional arguments of a parser and their choices."""
+    return [
+        dict(
+            name=action.dest,
+            help=_help(action, parser.prog),
+            choices=[str(x) for x in action.choices or []],
+        )
+        for action in parser._actions
+        if not action.option_strings
+    ]
+
+
+def _help(action: argparse.Action, prog: str) -> str:
+    """Return the help of an action on one line, like argparse formats it."""
+    if not action.help:
+        return ""
+    params: dict[str, Any] = dict(vars(action), prog=prog)
+    if action.choices is not None:
+        params["choices"] = ", ".join(str(x) for x in action.choices)
+    return " ".join((action.help % params).split())
+
+
+def _read_digest(path: str) -> str:
+    """Return the digest of a manifest, or "" if it cannot be read."""
+    try:
+        with open(path, encoding="utf-8") as file:
+            data: dict[str, Any] = json.load(file)
+    except (OSError, ValueError):
+        return ""
+    return data.get("digest", "") if data.get("version") == _VERSION else ""
+
+
+def _write(path: str, content: str) -> None:
+    """Write a file atomically, creating its directory."""
+    directory: str = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.fchmod(fd, 0o644)
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(tmp, path)
+
+
+def _stale_check(data: dict[str, Any], manifest: str) -> str:
+    """Return the `find` command that prints a path if the tree changed."""
+    directories: str = " ".join(shlex.quote(x) for x in data["directories"])
+    return (
+        f"command find {directories} -newer {shlex.quote(manifest)} "
+        "-print -quit 2>/dev/null"
+    )
+
+
+def _flags(options: list[dict[str, Any]], value: bool) -> list[str]:
+    """Return the flags of the options that take a value, or of all."""
+    return [x for o in options if o["value"] or not value for x in o["flags"]]
+
+
+def _bash(
+    data: dict[str, Any], script: str, manifest: str, regenerate: str
+) -> str:
+    """Return the bash completion script.
+
+    The data is returned by `_prompts_words`, which is looked up by a key,
+    e.g., "options fix" or "values fix --filetype".
+    """
+    words: dict[str, list[str]] = {
+        "commands": list(data["commands"]),
+        "options": _flags(data["options"], value=False),
+        "takes": _flags(data["options"], value=True),
+    }
+    for name, command in data["commands"].items():
+        words[f"options {name}"] = _flags(command["options"], value=False)
+        words[f"takes {name}"] = _flags(command["options"], value=True)
+        words[f"arguments {name}"] = [
+            x for argument in command["arguments"] for x in argument["choices"]
+        ]
+        for option in command["options"]:
+            for flag in option["flags"]:
+                words[f"values {name} {flag}"] = option["choices"]
+    for option in data["options"]:
+        for flag in option["flags"]:
+            words[f"values {flag}"] = option["choices"]
+
+    cases: str = "".join(
+        f"        {shlex.quote(key)}) echo {shlex.quote(' '.join(value))} ;;\n"
+        for key, value in words.items()
+        if value
+    )
+    return f"""\
+# Completion of prompts for bash, generated by `prompts completions`.
+
+_prompts_words() {{
+    case "$1" in
+{cases}    esac
+}}
+
+_prompts_refresh() {{
+    [[ -n $({_stale_check(data, manifest)}) ]] || return 0
+    {regenerate} >/dev/null 2>&1 && source {shlex.quote(script)}
+}}
+
+_prompts() {{
+    local cur=${{COMP_WORDS[COMP_CWORD]}} prev=${{COMP_WORDS[COMP_CWORD-1]}}
+    local cmd="" word values i
+    _prompts_refresh
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        word=${{COMP_WORDS[i]}}
+        if [[ " $(_prompts_words takes) " == *" $word "* ]]; then
+            ((i++))
+        elif [[ $word != -* ]]; then
+            cmd=$word
+            break
+        fi
+    done
+    if [[ " $(_prompts_words "takes${{cmd:+ $cmd}}") " == *" $prev "* ]]; then
+        values=$(_prompts_words "values${{cmd:+ $cmd}} $prev")
+    elif [[ $cur == -* ]]; then
+        values=$(_prompts_words "options${{cmd:+ $cmd}}")
+    elif [[ -z $cmd ]]; then
+        values=$(_prompts_words commands)
+    else
+        values=$(_prompts_words "arguments $cmd")
+    fi
+    COMPREPLY=($(compgen -W "$values" -- "$cur"))
+}}
+
+complete -o default -F _prompts prompts
+"""
+
+
+def _zsh_help(text: str) -> str:
+    """Escape a help text for the brackets of an `_arguments` spec."""
+    for char in "\\[]:":
+        text = text.replace(char, f"\\{char}")
+    return text
+
+
+def _zsh_specs(options: list[dict[str, Any]]) -> list[str]:
+    """Return the `_arguments` specs of options."""
+    specs: list[str] = []
+    for option in options:
+        flags: list[str] = option["flags"]
+        exclusive: str = f"({' '.join(flags)})" if len(flags) > 1 else ""
+        value: str = ""
+        if option["value"]:
+            name: str = flags[-1].lstrip("-")
+            choices: str = " ".join(option["choices"])
+            value = f":{name}:({choices})" if choices else f":{name}:_files"
+        for flag in flags:
+            spec: str = f"{exclusive}{flag}[{_zsh_help(option['help'])}]"
+            specs.append(shlex.quote(spec + value))
+    return specs
+
+
+def _zsh(
+    data: dict[str, Any], script: str, manifest: str, regenerate: str
+) -> str:
+    """Return the zsh completion script.
+
+    The script can be sourced, or autoloaded from a directory in `fpath`.
+    """
+    indent: str = " \\\n        "
+    commands: str = "\n        ".join(
+        shlex.quote(f"{name}:{command['help']}".rstrip(":"))
+        for name, command in data["commands"].items()
+    )
+    top: str = indent.join(_zsh_specs(data["options"]))
+    cases: list[str] = []
+    for name, command in data["commands"].items():
+        specs: list[str] = _zsh_specs(command["options"])
+        for i, argument in enumerate(command["arguments"], 1):
+            choices: str = " ".join(argument["choices"])
+            action: str = f"({choices})" if choices else "_files"
+            specs.append(shlex.quote(f"{i}:{argument['name']}:{action}"))
+        arguments: str = " \\\n                    ".join(specs)
+        cases.append(
+            f"            {shlex.quote(name)})\n"
+            f"                _arguments {arguments}\n"
+            "                ;;"
+        )
+    return f"""\
+#compdef prompts
+# Completion of prompts for zsh, generated by `prompts completions`.
+
+_prompts_refresh() {{
+    [[ -n $({_stale_check(data, manifest)}) ]] || return 1
+    {regenerate} >/dev/null 2>&1 && source {shlex.quote(script)}
+}}
+
+_prompts() {{
+    if [[ -z $_prompts_busy ]] && _prompts_refresh; then
+        local _prompts_busy=1
+        _prompts "$@"
+        return
+    fi
+    local curcontext=$curcontext state line
+    local -a commands
+    commands=(
+        {commands}
+    )
+    _arguments -C {top} \\
+        '1:command:->command' \\
+        '*::argument:->argument'
+    case $state in
+        command)
+            _describe -t commands command commands
+            ;;
+        argument)
+            case $words[1] in
+{chr(10).join(cases)}
+            esac
+            ;;
+    esac
+}}
+
+if (( $+functions[compdef] )); then
+    compdef _prompts prompts
+fi
+"""
+
+
+def _fish_quote(text: str) -> str:
+    """Quote a word for fish."""
+    return "'" + text.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _fish_options(condition: str, options: list[dict[str, Any]]) -> list[str]:
+    """Return the `complete` commands of options."""
+    lines: list[str] = []
+    for option in options:
+        parts: list[str] = ["complete -c prompts -n", _fish_quote(condition)]
+        for flag in option["flags"]:
+            if flag.startswith("--"):
+                parts += ["-l", flag[2:]]
+            else:
+                parts += ["-s", flag[1:]]
+        if option["choices"]:
+            parts += ["-x -a", _fish_quote(" ".join(option["choices"]))]
+        elif option["value"]:
+            parts.append("-r")
+        if option["help"]:
+            parts += ["-d", _fish_quote(option["help"])]
+        lines.append(" ".join(parts))
+    return lines
+
+
+def _fish(
+    data: dict[str, Any], script: str, manifest: str, regenerate: str
+) -> str:
+    """Return the fish completion script.
+
+    The check of the instruction tree runs as the condition of a completion
+    that never applies, as fish evaluates the conditions on each completion.
+    """
+    lines: list[str] = _fish_options("__fish_use_subcommand", data["options"])
+    for name, command in data["commands"].items():
+        line: str = "complete -c prompts -n __fish_use_subcommand -f -a "
+        line += _fish_quote(name)
+        if command["help"]:
+            line += f" -d {_fish_quote(command['help'])}"
+        lines.append(line)
+        condition: str = f"__fish_seen_subcommand_from {name}"
+        lines += _fish_options(condition, command["options"])
+        choices: list[str] = [
+            x for argument in command["arguments"] for x in argument["choices"]
+        ]
+        if choices:
+            lines.append(
+                f"complete -c prompts -n {_fish_quote(condition)} -f -a "
+                f"{_fish_quote(' '.join(choices))}"
+            )
+    completions: str = "\n".join(lines)
+    return f"""\
+# Completion of prompts for fish, generated by `prompts completions`.
+
+complete -c prompts -e
+
+function __prompts_refresh
+    set -l changed ({_stale_check(data, manifest)})
+    if test -n "$changed"
+        {regenerate} >/dev/null 2>&1; and source {_fish_quote(script)}
+    end
+    return 1
+end
+
+complete -c prompts -n __prompts_refresh
+{completions}
+"""
+
+
+_RENDERERS = {"bash": _bash, "zsh": _zsh, "fish": _fish}
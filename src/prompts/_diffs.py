@@ -0,0 +1,460 @@
+"""Split large diffs into prompts for the `commit` command.
+
+A diff that is too large for a single prompt is read line by line, e.g.,
+from `git diff`, and split into chunks per file and per hunk that stay
+within a size budget. A hunk that is larger than the budget is split as
+well, repeating its file and hunk header. Binary files and generated files,
+like lock files and minified assets, are not included; they are only listed
+in the overview with their number of changed lines.
+
+For each chunk a prompt is made with the `command` and `user` instructions
+of the `commit` command and the `chunk` template. Afterwards, a combining
+prompt is made with the `summaries` template, which contains the overview
+and, when the prompts are sent to an OpenAI-compatible endpoint, the replies
+to the chunk prompts. The templates are part of the package, in
+`_diff_instructions`, and not of the instructions directory, so they are not
+options of `prompts commit`.
+
+Only the current chunk and hunk are kept in memory, so the memory usage is
+bounded by the budget and not by the size of the diff.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack
+from fnmatch import fnmatch
+from functools import cache
+from os.path import join
+from typing import Any, TextIO
+
+from prompts import _parser, _paths
+from prompts._logger import logger
+from prompts._templates import Template
+from prompts.instructions import Instructions
+
+# Patterns of generated files, which are not included in the chunks.
+GENERATED: tuple[str, ...] = (
+    "*.lock",
+    "*-lock.json",
+    "*-lock.yaml",
+    "go.sum",
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*.pb.go",
+    "*_pb2.py",
+    "*_pb2_grpc.py",
+    "*.generated.*",
+    "node_modules/*",
+    "vendor/*",
+    "dist/*",
+)
+
+
+class FileStat:
+    """The changes of a file in the diff.
+
+    Attributes:
+        path: The path of the file.
+        added: The number of added lines.
+        removed: The number of removed lines.
+        skipped: Why the file is not included in the chunks, if it is not.
+    """
+
+    path: str
+    added: int
+    removed: int
+    skipped: str
+
+    def __init__(self, path: str) -> None:
+        """Initialize the statistics of a file without changes.
+
+        Args:
+            path: The path of the file.
+        """
+        self.path = path
+        self.added = 0
+        self.removed = 0
+        self.skipped = ""
+
+    def __str__(self) -> str:
+        """Return a line for the overview, e.g., "main.py (+3 -1)"."""
+        line: str = f"{self.path} (+{self.added} -{self.removed})"
+        return f"{line}, {self.skipped}" if self.skipped else line
+
+
+class Chunk:
+    """A part of the diff that fits within the budget.
+
+    Attributes:
+        index: The 1-based index of the chunk.
+        files: The paths of the files in the chunk.
+        text: The diff of the chunk.
+    """
+
+    index: int
+    files: list[str]
+    text: str
+
+    def __init__(self, index: int, files: list[str], text: str) -> None:
+        """Initialize the chunk.
+
+        Args:
+            index: The 1-based index of the chunk.
+            files: The paths of the files in the chunk.
+            text: The diff of the chunk.
+        """
+        self.index = index
+        self.files = files
+        self.text = text
+
+
+class Splitter:
+    """Split a unified diff into chunks, see the module docstring.
+
+    Attributes:
+        budget: The maximum number of characters per chunk.
+        skip: The glob patterns of files that are not included.
+        stats: The statistics of the files that were read so far.
+    """
+
+    budget: int
+    skip: tuple[str, ...]
+    stats: list[FileStat]
+    _count: int
+    _chunk: list[str]
+    _size: int
+    _files: list[str]
+    _header: list[str]
+    _hunk: list[str]
+    _hunk_size: int
+
+    def __init__(
+        self, budget: int = 24000, skip: Iterable[str] = GENERATED
+    ) -> None:
+        """Initialize the splitter.
+
+        Args:
+            budget: The maximum number of characters per chunk. Single lines
+                that are longer than the budget are not split.
+            skip: The glob patterns of files that are not included.
+        """
+        self.budget = budget
+        self.skip = tuple(skip)
+        self.stats = []
+        self._count = 0
+        self._chunk = []
+        self._size = 0
+        self._files = []
+        self._header = []
+        self._hunk = []
+        self._hunk_size = 0
+
+    def split(self, lines: Iterable[str]) -> Iterator[Chunk]:
+        """Split the lines of a unified diff into chunks.
+
+        Args:
+            lines: The lines of the diff, including their line endings.
+
+        Yields:
+            The chunks, in the order of the diff.
+        """
+        stat: FileStat | None = None
+        for line in lines:
+            if line.startswith("diff --git "):
+                yield from self._end_hunk()
+                stat = self._start_file(line)
+            elif stat is None:
+                continue
+            elif line.startswith("@@"):
+                yield from self._end_hunk()
+                self._hunk = [line]
+                self._hunk_size = len(line)
+            elif self._hunk:
+                self._count_line(stat, line)
+                if not stat.skipped:
+                    yield from self._add_line(line)
+            elif stat.skipped:
+                continue
+            elif line.startswith(("Binary files ", "GIT binary patch")):
+                stat.skipped = "binary"
+                self._header = []
+            else:
+                self._header.append(line)
+        yield from self._end_hunk()
+        if self._chunk:
+            yield self._flush()
+
+    def overview(self) -> str:
+        """Return an overview of the changed and skipped files."""
+        return "\n".join(f"- {stat}" for stat in self.stats)
+
+    def _start_file(self, line: str) -> FileStat:
+        """Start a new file section at its `diff --git` line."""
+        path: str = line.rstrip("\n").split(" b/", 1)[-1]
+        stat = FileStat(path)
+        self.stats.append(stat)
+        if any(fnmatch(path, x) or fnmatch(path, f"*/{x}") for x in self.skip):
+            stat.skipped = "generated"
+            self._header = []
+        else:
+            self._header = [line]
+        return stat
+
+    @staticmethod
+    def _count_line(stat: FileStat, line: str) -> None:
+        """Count an added or removed line of a hunk."""
+        if line.startswith("+"):
+            stat.added += 1
+        elif line.startswith("-"):
+            stat.removed += 1
+
+    def _add_line(self, line: str) -> Iterator[Chunk]:
+        """Add a line to the current hunk, splitting the hunk if needed."""
+        header: int = sum(len(x) for x in self._header)
+        if header + self._hunk_size + len(line) > self.budget:
+            continued: str = self._continued()
+            yield from self._end_hunk()
+            self._hunk = [continued]
+            self._hunk_size = len(continued)
+        self._hunk.append(line)
+        self._hunk_size += len(line)
+
+    def _continued(self) -> str:
+        """Return the header for the continuation of the current hunk."""
+        header: str = self._hunk[0].rstrip("\n")
+        if not header.endswith(" (continued)"):
+            header += " (continued)"
+        return f"{header}\n"
+
+    def _end_hunk(self) -> Iterator[Chunk]:
+        """Add the current hunk to the chunk, flushing the chunk if needed."""
+        if not self._hunk or not self._header:
+            self._hunk, self._hunk_size = [], 0
+            return
+        path: str = self.stats[-1].path
+        header: list[str] = [] if path in self._files else self._header
+        size: int = self._hunk_size + sum(len(x) for x in header)
+        if self._chunk and self._size + size > self.budget:
+            yield self._flush()
+            header = self._header
+            size = self._hunk_size + sum(len(x) for x in header)
+        if path not in self._files:
+            self._files.append(path)
+        self._chunk.extend(header)
+        self._chunk.extend(self._hunk)
+        self._size += size
+        self._hunk, self._hunk_size = [], 0
+
+    def _flush(self) -> Chunk:
+        """Return the current chunk and start a new one."""
+        self._count += 1
+        chunk = Chunk(self._count, self._files, "".join(self._chunk))
+        self._chunk, self._size, self._files = [], 0, []
+        return chunk
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of the `commit-chunks` subcommand.
+
+    Args:
+        parser: The subcommand parser to add options to.
+    """
+    parser.add_argument(
+        "revisions",
+        nargs="*",
+        help="Revisions and paths that are passed to `git diff`",
+    )
+    parser.add_argument(
+        "--cached",
+        action="store_true",
+        help="Split the staged changes, like `git diff --cached`",
+    )
+    parser.add_argument(
+        "-i",
+        "--input",
+        default="",
+        help="Read the diff from a file, or - for stdin, instead of git",
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=24000,
+        help="Maximum number of diff characters per chunk",
+    )
+    parser.add_argument(
+        "--skip",
+        action="append",
+        default=[],
+        help="Glob pattern of generated files to leave out (repeatable)",
+    )
+    parser.add_argument(
+        "-a",
+        "--action",
+        choices=["json", "openai"],
+        default="json",
+        help="Write the prompts as JSONL, or send them to an "
+        "OpenAI-compatible endpoint and print the commit message",
+    )
+    _parser.add_logging_options(parser)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Split the diff and write or send the prompts.
+
+    Args:
+        args: Parsed command-line arguments.
+    """
+    _parser.setup_logging(args)
+    instructions = Instructions(args.dir)
+    splitter = Splitter(args.budget, GENERATED + tuple(args.skip))
+    with ExitStack() as stack:
+        lines: Iterable[str] = _open_diff(stack, args)
+        records = generate(instructions, splitter, lines, args.action)
+        for record in records:
+            if args.action == "json":
+                sys.stdout.write(json.dumps(record) + "\n")
+
+
+def generate(
+    instructions: Instructions,
+    splitter: Splitter,
+    lines: Iterable[str],
+    action: str = "json",
+) -> Iterator[dict[str, Any]]:
+    """Make the chunk prompts and the combining prompt.
+
+    With the `openai` action, each chunk prompt is sent to the endpoint and
+    the replies are added to the combining prompt, whose reply is streamed
+    to stdout.
+
+    Args:
+        instructions: The instructions that make the prompts.
+        splitter: The splitter of the diff.
+        lines: The lines of the diff.
+        action: "json" or "openai".
+
+    Yields:
+        A record for each chunk and for the combining prompt.
+    """
+    replies: list[str] = []
+    count: int = 0
+    for chunk in splitter.split(lines):
+        count = chunk.index
+        prompt: str = _prompt(
+            instructions, "chunk", str(chunk.index), chunk.text
+        )
+        logger.info("Chunk %s: %s", chunk.index, ", ".join(chunk.files))
+        record = dict(kind="chunk", chunk=chunk.index, files=chunk.files)
+        if action == "openai":
+            reply: str = _send(prompt, sys.stderr)
+            replies.append(f"### Part {chunk.index}\n\n{reply.strip()}")
+        yield dict(record, prompt=prompt)
+
+    summaries: str = "\n\n".join(
+        ["### Overview", splitter.overview(), *replies]
+    )
+    prompt = _prompt(instructions, "summaries", summaries)
+    if action == "openai":
+        _send(prompt, sys.stdout)
+        sys.stdout.write("\n")
+    skipped = [x.path for x in splitter.stats if x.skipped]
+    yield dict(kind="combine", chunks=count, skipped=skipped, prompt=prompt)
+
+
+def _prompt(
+    instructions: Instructions, key: str, value: str, user: str = ""
+) -> str:
+    """Make a prompt of the `commit` command with a diff template.
+
+    Args:
+        instructions: The instructions of the `commit` command.
+        key: The template, "chunk" or "summaries", which follows the
+            `command` instruction.
+        value: The value of the template.
+        user: The value of the `user` instruction, which follows the
+            template, if any.
+
+    Returns:
+        The prompt.
+    """
+    fragments: list[str] = [
+        instructions.fragment("commit", "command"),
+        _template(key).render(**{key: value}),
+    ]
+    if user:
+        fragments.append(instructions.fragment("commit", "user", user))
+    return "\n".join(fragments)
+
+
+@cache
+def _template(key: str) -> Template:
+    """Return the template `_diff_instructions/<key>.md`."""
+    with open(
+        join(_paths.diff_instructions, f"{key}.md"), encoding="utf-8"
+    ) as file:
+        return Template(file.read())
+
+
+def _send(prompt: str, stream: TextIO) -> str:
+    """Send a prompt to the OpenAI-compatible endpoint.
+
+    Args:
+        prompt: The prompt.
+        stream: The stream to which the reply is written as it arrives.
+
+    Returns:
+        The reply.
+    """
+    from prompts import _http
+
+    def sink(token: str) -> None:
+        stream.write(token)
+        stream.flush()
+
+    reply: str = _http.chat(prompt, sink)
+    stream.write("\n")
+    return reply
+
+
+def _open_diff(stack: ExitStack, args: argparse.Namespace) -> Iterable[str]:
+    """Return the lines of the diff from the input or from `git diff`.
+
+    Args:
+        stack: The exit stack that closes the input.
+        args: Parsed command-line arguments.
+
+    Returns:
+        The lines of the diff.
+    """
+    if args.input == "-":
+        return sys.stdin
+    if args.input:
+        return stack.enter_context(open(args.input, encoding="utf-8"))
+
+    cmd: list[str] = ["git", "diff", "--no-color", "--no-ext-diff"]
+    if args.cached:
+        cmd.append("--cached")
+    cmd.extend(args.revisions)
+    logger.debug("Running command: %s", " ".join(cmd))
+    process = stack.enter_context(
+        subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, text=True, errors="replace"
+        )
+    )
+    stack.callback(_check, process, cmd)
+    assert process.stdout
+    return process.stdout
+
+
+def _check(process: subprocess.Popen[str], cmd: list[str]) -> None:
+    """Raise an error if `git diff` failed.
+
+    Raises:
+        subprocess.CalledProcessError: If the return code is not zero.
+    """
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd)
@@ -0,0 +1,387 @@
+"""Expansion of the `--files` option and detection of filetypes.
+
+The value of `--files` is a comma-separated list of items. Each item is:
+
+- A glob, e.g., `src/**/*.py`, which is matched against all files below the
+  part of the glob before its first wildcard. `*` and `?` do not match `/`,
+  and `**/` matches any number of directories.
+- A directory, which is replaced by all files below it.
+- Anything else, which is kept as is, e.g., a file that does not exist yet.
+
+The files below a directory are taken from the git index, including
+untracked files that are not ignored, when the directory is in a git work
+tree. Otherwise, the directory is walked with `os.scandir`, in parallel per
+subdirectory, skipping `.git` and the paths that are ignored by the
+`.gitignore` files (negated patterns are not supported).
+
+The filetype of a file is detected from its extension, using an index that
+maps extensions to the values of the `filetype` instruction, e.g., `py` to
+`python` if there is a `filetype/python.md`.
+"""
+
+import os
+import re
+import subprocess
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from os.path import isdir, join, splitext
+
+from prompts import profiling
+from prompts._logger import logger
+
+_WILDCARD: re.Pattern[str] = re.compile(r"[*?[]")
+
+# Extensions of the filetypes that are likely to have instructions. An
+# extension that equals the name of a filetype, like `lua`, is always
+# included in the index.
+_EXTENSIONS: dict[str, str] = {
+    "py": "python",
+    "pyi": "python",
+    "sh": "bash",
+    "bash": "bash",
+    "zsh": "zsh",
+    "h": "c",
+    "cc": "cpp",
+    "cxx": "cpp",
+    "hh": "cpp",
+    "hpp": "cpp",
+    "hxx": "cpp",
+    "yml": "yaml",
+    "js": "javascript",
+    "mjs": "javascript",
+    "jsx": "javascript",
+    "ts": "typescript",
+    "tsx": "typescript",
+    "rs": "rust",
+    "rb": "ruby",
+    "md": "markdown",
+    "kt": "kotlin",
+    "cs": "csharp",
+    "tf": "terraform",
+}
+
+
+class _Rule:
+    """A pattern of a `.gitignore` file.
+
+    Attributes:
+        directory: The directory of the `.gitignore` file, relative to the
+            walked directory.
+        regex: The compiled pattern.
+        anchored: Whether the pattern is matched against the path relative
+            to `directory`, instead of against the name of an entry.
+        only_dirs: Whether the pattern only matches directories.
+    """
+
+    directory: str
+    regex: re.Pattern[str]
+    anchored: bool
+    only_dirs: bool
+
+    def __init__(self, directory: str, pattern: str) -> None:
+        """Compile a pattern.
+
+        Args:
+            directory: The directory of the `.gitignore` file.
+            pattern: The pattern, without comments and whitespace.
+        """
+        self.directory = directory
+        self.only_dirs = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        self.anchored = "/" in pattern
+        self.regex = compile_glob(pattern.lstrip("/"))
+
+    def matches(self, relative: str, name: str, is_dir: bool) -> bool:
+        """Return True if the rule ignores an entry.
+
+        Args:
+            relative: The path of the entry relative to the walked directory.
+            name: The name of the entry.
+            is_dir: Whether the entry is a directory.
+        """
+        if self.only_dirs and not is_dir:
+            return False
+        if not self.anchored:
+            return self.regex.fullmatch(name) is not None
+        prefix: str = f"{self.directory}/" if self.directory else ""
+        if not relative.startswith(prefix):
+            return False
+        return self.regex.fullmatch(relative[len(prefix) :]) is not None
+
+
+def expand(value: str, root: str = "") -> list[str]:
+    """Expand the globs and directories of a `--files` value.
+
+    Args:
+        value: The comma-separated items, see the module docstring.
+        root: The directory that relative items are relative to. Defaults to
+            the working directory.
+
+    Returns:
+        The files, without duplicates, in the order of the items. The paths
+        of expanded items are relative to `root` if the item is.
+    """
+    root = root or os.getcwd()
+    listings: dict[str, list[str]] = {}
+    files: list[str] = []
+    with profiling.span("files.expand"):
+        for item in (x.strip() for x in value.split(",")):
+            if not item:
+                continue
+            if _WILDCARD.search(item):
+                pattern: str = _normalize(item)
+                regex = compile_glob(pattern)
+                base: str = _base(pattern)
+                listing: list[str] = _listing(listings, root, base)
+                files.extend(x for x in listing if regex.fullmatch(x))
+            elif isdir(join(root, item)):
+                files.extend(_listing(listings, root, _normalize(item)))
+            else:
+                files.append(item)
+    logger.debug("Expanded '%s' to %s files", value, len(files))
+    return list(dict.fromkeys(files))
+
+
+def extension_index(filetypes: Iterable[str]) -> dict[str, str]:
+    """Return the mapping of extensions to filetypes.
+
+    Args:
+        filetypes: The available filetypes, e.g., the names of the files in
+            the `filetype` directories of the instructions.
+
+    Returns:
+        The filetype of each extension, without the leading dot.
+    """
+    names: set[str] = set(filetypes)
+    index: dict[str, str] = {k: v for k, v in _EXTENSIONS.items() if v in names}
+    index.update((name, name) for name in names)
+    return index
+
+
+def detect(path: str, index: dict[str, str]) -> str:
+    """Return the filetype of a file, or "" if it is not known.
+
+    Args:
+        path: The path of the file.
+        index: The index of `extension_index`.
+    """
+    return index.get(splitext(path)[1][1:].lower(), "")
+
+
+def group(files: Iterable[str], index: dict[str, str]) -> dict[str, list[str]]:
+    """Group files by their filetype.
+
+    Args:
+        files: The files.
+        index: The index of `extension_index`.
+
+    Returns:
+        The files of each filetype, in the order of `files`. Files of an
+        unknown filetype are grouped under "".
+    """
+    groups: dict[str, list[str]] = {}
+    for path in files:
+        groups.setdefault(detect(path, index), []).append(path)
+    return groups
+
+
+def compile_glob(pattern: str) -> re.Pattern[str]:
+    """Compile a glob, see the module docstring.
+
+    Args:
+        pattern: The glob, with "/" as separator.
+
+    Returns:
+        The regular expression, which should be used with `fullmatch`.
+    """
+    parts: list[str] = []
+    i: int = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and (end := pattern.find("]", i + 2)) != -1:
+            content: str = pattern[i + 1 : end]
+            if content.startswith("!"):
+                content = f"^{content[1:]}"
+            content = content.replace("\\", "\\\\")
+            parts.append(f"[{content}]")
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(parts))
+
+
+def _normalize(item: str) -> str:
+    """Return an item without a leading "./" and trailing slashes."""
+    while item.startswith("./"):
+        item = item[2:]
+    return item.rstrip("/") or "."
+
+
+def _base(pattern: str) -> str:
+    """Return the directory of a glob before its first wildcard."""
+    match = _WILDCARD.search(pattern)
+    head: str = pattern[: match.start()] if match else pattern
+    return head.rpartition("/")[0] or ("/" if head.startswith("/") else ".")
+
+
+def _listing(listings: dict[str, list[str]], root: str, base: str) -> list[str]:
+    """Return the files below `base`, memoized in `listings`.
+
+    Args:
+        listings: The listings of the current expansion.
+        root: The directory that `base` is relative to.
+        base: The directory to list.
+
+    Returns:
+        The files, prefixed with `base` unless it is ".".
+    """
+    if base not in listings:
+        names: list[str] = list_files(join(root, base))
+        if base != ".":
+            prefix: str = base if base.endswith("/") else f"{base}/"
+            names = [f"{prefix}{x}" for x in names]
+        listings[base] = names
+    return listings[base]
+
+
+def list_files(directory: str) -> list[str]:
+    """Return the files below a directory, see the module docstring.
+
+    Args:
+        directory: The directory.
+
+    Returns:
+        The paths of the files relative to `directory`, with "/" as
+        separator.
+    """
+    cmd: list[str] = [
+        "git",
+        "-C",
+        directory,
+        "ls-files",
+        "-z",
+        "--cached",
+        "--others",
+        "--exclude-standard",
+    ]
+    try:
+        with profiling.span("files.git"):
+            result = subprocess.run(cmd, capture_output=True, check=False)
+    except OSError as error:
+        logger.debug("Could not run git: %s", error)
+    else:
+        if result.returncode == 0:
+            names = result.stdout.decode(errors="surrogateescape").split("\0")
+            return [x for x in names if x]
+        logger.debug("Not a git work tree: %s", directory)
+
+    with profiling.span("files.walk"):
+        return _walk_parallel(directory)
+
+
+def _walk_parallel(directory: str) -> list[str]:
+    """Walk a directory, with a thread per subdirectory of `directory`.
+
+    Args:
+        directory: The directory.
+
+    Returns:
+        The sorted paths of the files relative to `directory`, like the
+        output of git.
+    """
+    files, subdirs, rules = _scan(directory, "", ())
+    with ThreadPoolExecutor() as pool:
+        results = pool.map(lambda x: _walk(x[0], x[1], rules), subdirs)
+        for result in results:
+            files.extend(result)
+    files.sort()
+    return files
+
+
+def _walk(path: str, relative: str, rules: tuple[_Rule, ...]) -> list[str]:
+    """Walk a directory recursively.
+
+    Args:
+        path: The path of the directory.
+        relative: The path of the directory relative to the walked root.
+        rules: The ignore rules of the parent directories.
+
+    Returns:
+        The paths of the files relative to the walked root.
+    """
+    files, subdirs, rules = _scan(path, relative, rules)
+    for child_path, child in subdirs:
+        files.extend(_walk(child_path, child, rules))
+    return files
+
+
+def _scan(
+    path: str, relative: str, rules: tuple[_Rule, ...]
+) -> tuple[list[str], list[tuple[str, str]], tuple[_Rule, ...]]:
+    """Return the entries of a directory that are not ignored.
+
+    Args:
+        path: The path of the directory.
+        relative: The path of the directory relative to the walked root.
+        rules: The ignore rules of the parent directories.
+
+    Returns:
+        The relative paths of the files, the paths and relative paths of
+        the subdirectories, and the rules that apply to them.
+    """
+    try:
+        entries: list[os.DirEntry[str]] = list(os.scandir(path))
+    except OSError:
+        return [], [], rules
+    if any(x.name == ".gitignore" for x in entries):
+        rules = rules + _read_rules(join(path, ".gitignore"), relative)
+
+    files: list[str] = []
+    subdirs: list[tuple[str, str]] = []
+    for entry in entries:
+        if entry.name == ".git":
+            continue
+        child: str = f"{relative}/{entry.name}" if relative else entry.name
+        is_dir: bool = entry.is_dir(follow_symlinks=False)
+        if any(x.matches(child, entry.name, is_dir) for x in rules):
+            continue
+        if is_dir:
+            subdirs.append((entry.path, child))
+        else:
+            files.append(child)
+    return files, subdirs, rules
+
+
+def _read_rules(path: str, relative: str) -> tuple[_Rule, ...]:
+    """Read the rules of a `.gitignore` file.
+
+    Args:
+        path: The path of the file.
+        relative: The directory of the file relative to the walked root.
+
+    Returns:
+        The rules; negated patterns are skipped.
+    """
+    try:
+        with open(path, encoding="utf-8", errors="replace") as file:
+            lines: list[str] = file.read().splitlines()
+    except OSError:
+        return ()
+    patterns = (x.strip() for x in lines)
+    return tuple(
+        _Rule(relative, x)
+        for x in patterns
+        if x and not x.startswith(("#", "!"))
+    )
@@ -0,0 +1,276 @@
+"""Streaming client for OpenAI-compatible chat completion endpoints.
+
+Only the standard library is used. Connections are kept alive and reused by
+later requests to the same host, which matters when many prompts are sent
+from a single process, e.g., `prompts batch` or `prompts serve`.
+"""
+
+import http.client
+import json
+import os
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from functools import cache
+from typing import Any
+from urllib.parse import SplitResult, urlsplit
+
+from prompts._logger import logger
+
+# Errors that indicate that a reused keep-alive connection was closed by the
+# server, in which case the request is sent again on a new connection.
+_STALE: tuple[type[Exception], ...] = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class HTTPError(Exception):
+    """Raised when the endpoint responds with an error."""
+
+
+class ConnectionPool:
+    """Pool of keep-alive HTTP connections.
+
+    The number of requests that run at the same time is limited by
+    `concurrency`; other requests wait until a connection is released.
+
+    Attributes:
+        concurrency: Maximum number of concurrent requests.
+        timeout: Socket timeout in seconds.
+    """
+
+    concurrency: int
+    timeout: float
+    _idle: dict[tuple[str, str], list[http.client.HTTPConnection]]
+    _lock: threading.Lock
+    _semaphore: threading.BoundedSemaphore
+
+    def __init__(self, concurrency: int = 4, timeout: float = 600.0) -> None:
+        """Initialize an empty pool.
+
+        Args:
+            concurrency: Maximum number of concurrent requests.
+            timeout: Socket timeout in seconds.
+        """
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max(concurrency, 1))
+
+    @contextmanager
+    def connection(
+        self, url: SplitResult, fresh: bool = False
+    ) -> Iterator[http.client.HTTPConnection]:
+        """Borrow a connection to the host of `url`.
+
+        The connection is returned to the pool afterwards, unless an error
+        occurred or the server asked to close it.
+
+        Args:
+            url: The URL to connect to.
+            fresh: Do not reuse an idle connection.
+
+        Yields:
+            The connection.
+        """
+        key: tuple[str, str] = (url.scheme, url.netloc)
+        with self._semaphore:
+            connection = None if fresh else self._pop(key)
+            if connection is None:
+                connection = self._connect(url)
+            try:
+                yield connection
+            except BaseException:
+                connection.close()
+                raise
+            if connection.sock is None:
+                return
+            with self._lock:
+                self._idle.setdefault(key, []).append(connection)
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            connections = [x for xs in self._idle.values() for x in xs]
+            self._idle.clear()
+        for connection in connections:
+            connection.close()
+
+    def _pop(self, key: tuple[str, str]) -> http.client.HTTPConnection | None:
+        """Take an idle connection for `key`, if there is one."""
+        with self._lock:
+            idle = self._idle.get(key)
+            return idle.pop() if idle else None
+
+    def _connect(self, url: SplitResult) -> http.client.HTTPConnection:
+        """Create a new connection to the host of `url`."""
+        logger.debug("Connecting to %s://%s", url.scheme, url.netloc)
+        if url.scheme == "https":
+            return http.client.HTTPSConnection(url.netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(url.netloc, timeout=self.timeout)
+
+
+def chat(prompt: str, sink: Callable[[str], object]) -> str:
+    """Stream a reply from the endpoint that is configured by environment
+    variables, see `prompts.actions.OpenAI`.
+
+    Args:
+        prompt: The prompt, which is sent as a user message.
+        sink: Callable that receives the reply, token by token.
+
+    Returns:
+        The complete reply.
+
+    Raises:
+        HTTPError: If the endpoint responds with an error status or with an
+            invalid response stream.
+        OSError: If the endpoint cannot be reached.
+    """
+    return stream_chat(
+        default_pool(),
+        base_url(),
+        prompt,
+        sink,
+        model=os.environ.get("PROMPTS_OPENAI_MODEL", ""),
+        api_key=os.environ.get(
+            "PROMPTS_OPENAI_API_KEY", os.environ.get("OPENAI_API_KEY", "")
+        ),
+    )
+
+
+def base_url() -> str:
+    """Return the configured base URL of the API."""
+    return os.environ.get("PROMPTS_OPENAI_BASE_URL", "http://localhost:8080/v1")
+
+
+@cache
+def default_pool() -> ConnectionPool:
+    """Return the connection pool that is shared by this process."""
+    return ConnectionPool(
+        concurrency=int(os.environ.get("PROMPTS_OPENAI_CONCURRENCY", 4)),
+        timeout=float(os.environ.get("PROMPTS_OPENAI_TIMEOUT", 600)),
+    )
+
+
+def stream_chat(
+    pool: ConnectionPool,
+    base_url: str,
+    prompt: str,
+    sink: Callable[[str], object],
+    model: str = "",
+    api_key: str = "",
+) -> str:
+    """Send `prompt` to a chat completions endpoint and stream the reply.
+
+    Args:
+        pool: The connection pool.
+        base_url: The base URL of the API, e.g., "http://localhost:8080/v1".
+        prompt: The prompt, which is sent as a user message.
+        sink: Callable that receives the reply, token by token.
+        model: The model name. Omitted if empty.
+        api_key: The API key. Omitted if empty.
+
+    Returns:
+        The complete reply.
+
+    Raises:
+        HTTPError: If the endpoint responds with an error status or with an
+            invalid response stream.
+        OSError: If the endpoint cannot be reached.
+    """
+    url: SplitResult = urlsplit(f"{base_url.rstrip('/')}/chat/completions")
+    payload: dict[str, Any] = dict(
+        messages=[dict(role="user", content=prompt)], stream=True
+    )
+    if model:
+        payload["model"] = model
+    headers: dict[str, str] = {
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream",
+    }
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    body: bytes = json.dumps(payload).encode()
+
+    with pool.connection(url) as connection:
+        response = _request(connection, url.path, body, headers)
+        if response is not None:
+            return _read_stream(response, sink)
+
+    logger.debug("Keep-alive connection was closed, reconnecting")
+    with pool.connection(url, fresh=True) as connection:
+        connection.request("POST", url.path, body, headers)
+        return _read_stream(connection.getresponse(), sink)
+
+
+def _request(
+    connection: http.client.HTTPConnection,
+    path: str,
+    body: bytes,
+    headers: dict[str, str],
+) -> http.client.HTTPResponse | None:
+    """Send a POST request on a connection that may have been closed.
+
+    Args:
+        connection: The connection, which may be a reused one.
+        path: The request path.
+        body: The request body.
+        headers: The request headers.
+
+    Returns:
+        The response, or None if the server closed the connection before it
+        responded.
+    """
+    try:
+        connection.request("POST", path, body, headers)
+        return connection.getresponse()
+    except _STALE:
+        connection.close()
+        return None
+
+
+def _read_stream(
+    response: http.client.HTTPResponse, sink: Callable[[str], object]
+) -> str:
+    """Read the server-sent events of a streaming chat completion.
+
+    Args:
+        response: The HTTP response.
+        sink: Callable that receives the reply, token by token.
+
+    Returns:
+        The complete reply.
+
+    Raises:
+        HTTPError: If the response has an error status, is cut off, or is
+            not a valid event stream.
+    """
+    if response.status != 200:
+        detail: str = response.read().decode(errors="replace")
+        raise HTTPError(f"HTTP {response.status} {response.reason}: {detail}")
+
+    tokens: list[str] = []
+    try:
+        for raw in response:
+            line: str = raw.decode().strip()
+            if not line.startswith("data:"):
+                continue
+            data: str = line[len("data:") :].strip()
+            if data == "[DONE]":
+                break
+            for choice in json.loads(data).get("choices", []):
+                token: str | None = choice.get("delta", {}).get("content")
+                if token:
+                    tokens.append(token)
+                    sink(token)
+        response.read()
+        if response.length:
+            # The connection was closed before the whole body was read.
+            raise http.client.IncompleteRead(b"", response.length)
+    except (http.client.HTTPException, ValueError) as error:
+        response.close()
+        raise HTTPError(f"Invalid response stream: {error!r}") from error
+    return "".join(tokens)
@@ -0,0 +1,571 @@
+import hashlib
+import json
+import os
+import tempfile
+from os.path import abspath, join
+from typing import TYPE_CHECKING
+
+from prompts import _paths, _templates, profiling
+from prompts._logger import logger
+from prompts._templates import Template
+
+if TYPE_CHECKING:
+    from prompts._bundle import Bundle
+
+_VERSION: int = 1
+_loaded: dict[str, "Index"] = {}
+_overlays: dict[str, "Overlay"] = {}
+
+
+class Index:
+    """In-memory index of an instructions directory.
+
+    The directory tree is scanned once and stored as a mapping from relative
+    directory paths to their entries, together with the set of relative file
+    paths. Relative paths use "/" as separator, e.g.:
+
+    - `commands` -> `["ask", "commit", ...]`
+    - `commands/commit` -> `["command.md", "user.md"]`
+    - `default/filetype/python.md` is a file
+
+    This means that the command -> key -> file/dir/value structure of the
+    instructions can be answered without touching the filesystem again. The
+    index is persisted to a cache file and is invalidated when the mtime of
+    any of the scanned directories changes. Directory mtimes change when
+    entries are added, removed or renamed, which is exactly what the index
+    stores; changes to the contents of the files do not affect it.
+
+    Attributes:
+        directory: The absolute path of the indexed directory.
+    """
+
+    directory: str
+    _dirs: dict[str, list[str]]
+    _files: set[str]
+    _mtimes: dict[str, int]
+
+    def __init__(
+        self,
+        directory: str,
+        dirs: dict[str, list[str]],
+        files: set[str],
+        mtimes: dict[str, int],
+    ) -> None:
+        """Initialize the index.
+
+        Use `Index.load` or `Index.scan` instead of calling this directly.
+
+        Args:
+            directory: The absolute path of the indexed directory.
+            dirs: Mapping of relative directory paths to their entries.
+            files: Set of relative file paths.
+            mtimes: Mapping of relative directory paths to their mtime in
+                nanoseconds.
+        """
+        self.directory = directory
+        self._dirs = dirs
+        self._files = files
+        self._mtimes = mtimes
+
+    @classmethod
+    def load(cls, directory: str) -> "Index":
+        """Return a valid index for `directory`.
+
+        The index is taken from memory if it was loaded before by this
+        process, otherwise from the cache file. If neither is available, or
+        if the index is stale, the directory is scanned again and the cache
+        file is updated.
+
+        Args:
+            directory: The instructions directory.
+
+        Returns:
+            The index of the directory.
+        """
+        directory = abspath(directory)
+        with profiling.span("index.load"):
+            index: Index | None = _loaded.get(directory) or cls._read(directory)
+            stale: bool = index is None or index.is_stale()
+        if index is None or stale:
+            index = cls.scan(directory)
+            with profiling.span("index.write"):
+                index._write()
+        _loaded[directory] = index
+        return index
+
+    @classmethod
+    def scan(cls, directory: str) -> "Index":
+        """Build an index by scanning `directory` recursively.
+
+        Args:
+            directory: The instructions directory.
+
+        Returns:
+            The index of the directory.
+        """
+        directory = abspath(directory)
+        logger.debug("Scanning instructions directory: %s", directory)
+        index = cls(directory, {}, set(), {"": _mtime(directory)})
+        with profiling.span("index.scan"):
+            index._scan(directory, "")
+        return index
+
+    def _scan(self, path: str, relative: str) -> None:
+        """Add the entries of `path` to the index, recursively.
+
+        Args:
+            path: The absolute path of the directory to scan.
+            relative: The path of the directory relative to the root.
+        """
+        try:
+            entries = list(os.scandir(path))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+
+        self._dirs[relative] = sorted(entry.name for entry in entries)
+        for entry in entries:
+            child: str = f"{relative}/{entry.name}" if relative else entry.name
+            if entry.is_dir():
+                self._mtimes[child] = entry.stat().st_mtime_ns
+                self._scan(entry.path, child)
+            else:
+                self._files.add(child)
+
+    def is_stale(self) -> bool:
+        """Return True if the indexed directories changed on disk.
+
+        Returns:
+            Whether the index needs to be rebuilt.
+        """
+        return any(
+            _mtime(self.path(relative)) != mtime
+            for relative, mtime in self._mtimes.items()
+        )
+
+    def digest(self) -> str:
+        """Return a digest of the indexed files and their contents.
+
+        The digest changes when a file is added, removed or modified, i.e.,
+        when its size or mtime changes. This needs a `stat` of each file.
+
+        Returns:
+            The hexadecimal digest.
+        """
+        digest = hashlib.sha1(self.directory.encode())
+        for relative in sorted(self._files):
+            try:
+                stat = os.stat(self.path(relative))
+            except OSError:
+                continue
+            digest.update(f"\0{relative}\0{stat.st_mtime_ns}".encode())
+            digest.update(f"\0{stat.st_size}".encode())
+        return digest.hexdigest()
+
+    def path(self, relative: str) -> str:
+        """Return the absolute path for a relative path in the index.
+
+        Args:
+            relative: A "/" separated path relative to the directory.
+
+        Returns:
+            The absolute path.
+        """
+        if not relative:
+            return self.directory
+        return join(self.directory, *relative.split("/"))
+
+    def which(self, relative: str) -> str:
+        """Return the directory that serves `relative`, see `Overlay.which`.
+
+        Args:
+            relative: A "/" separated path relative to the directory.
+        """
+        return self.directory
+
+    def exists(self, relative: str) -> bool:
+        """Return True if `relative` is an indexed file or directory.
+
+        Args:
+            relative: A "/" separated path relative to the directory.
+        """
+        return relative in self._files or relative in self._dirs
+
+    def isfile(self, relative: str) -> bool:
+        """Return True if `relative` is an indexed file.
+
+        Args:
+            relative: A "/" separated path relative to the directory.
+        """
+        return relative in self._files
+
+    def listdir(self, relative: str) -> list[str]:
+        """Return the entries of an indexed directory.
+
+        Args:
+            relative: A "/" separated path relative to the directory.
+
+        Returns:
+            The names of the entries, like `os.listdir`.
+
+        Raises:
+            FileNotFoundError: If the directory is not in the index.
+        """
+        try:
+            return self._dirs[relative]
+        except KeyError as error:
+            raise FileNotFoundError(self.path(relative)) from error
+
+    def template(self, relative: str) -> Template:
+        """Return the parsed template of an indexed file.
+
+        Templates are taken from the shared `TemplateCache`, which validates
+        them by their mtime.
+
+        Args:
+            relative: A "/" separated path relative to the directory.
+
+        Returns:
+            The template.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        return _templates.cache.get(self.path(relative))
+
+    def _write(self) -> None:
+        """Persist the index to its cache file.
+
+        The file is written atomically, so concurrent processes never read a
+        partially written index. Failures are logged and otherwise ignored as
+        the cache is only an optimization.
+        """
+        data = dict(
+            version=_VERSION,
+            directory=self.directory,
+            dirs=self._dirs,
+            files=sorted(self._files),
+            mtimes=self._mtimes,
+        )
+        path: str = _cache_file(self.directory)
+        try:
+            os.makedirs(_paths.cache, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=_paths.cache, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+            os.replace(tmp, path)
+        except OSError as error:
+            logger.debug("Could not write index cache '%s': %s", path, error)
+
+    @classmethod
+    def _read(cls, directory: str) -> "Index | None":
+        """Read the index of `directory` from its cache file.
+
+        Args:
+            directory: The absolute path of the instructions directory.
+
+        Returns:
+            The cached index, or None if there is no usable cache file.
+        """
+        path: str = _cache_file(directory)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("version") != _VERSION:
+            return None
+        if data.get("directory") != directory:
+            return None
+
+        logger.debug("Index loaded from cache file '%s'", path)
+        return cls(directory, data["dirs"], set(data["files"]), data["mtimes"])
+
+
+class Overlay:
+    """Merged index of a stack of instruction layers.
+
+    Each layer is an `Index` or a `Bundle`. A path is served by the last
+    layer that contains it, so later layers override earlier ones, and the
+    entries of a directory are the union over all layers. The owner of each
+    path is computed once when the overlay is built, so a lookup costs the
+    same however many layers are stacked.
+
+    Attributes:
+        directory: The layers, separated by `os.pathsep`.
+        layers: The indexes of the layers, from bottom to top.
+    """
+
+    directory: str
+    layers: "tuple[Index | Bundle, ...]"
+    _owners: "dict[str, Index | Bundle]"
+    _dirs: dict[str, list[str]]
+
+    def __init__(self, layers: "tuple[Index | Bundle, ...]") -> None:
+        """Merge the indexes of the layers.
+
+        Use `load` instead of calling this directly.
+
+        Args:
+            layers: The indexes of the layers, from bottom to top.
+        """
+        self.directory = os.pathsep.join(x.directory for x in layers)
+        self.layers = layers
+        self._owners = {}
+        entries: dict[str, set[str]] = {}
+        for layer in layers:
+            for relative in _walk(layer):
+                self._owners[relative] = layer
+                if not layer.isfile(relative):
+                    entries.setdefault(relative, set()).update(
+                        layer.listdir(relative)
+                    )
+        self._dirs = {k: sorted(v) for k, v in entries.items()}
+
+    def which(self, relative: str) -> str:
+        """Return the layer that serves a relative path.
+
+        Args:
+            relative: A "/" separated path relative to the layers.
+
+        Returns:
+            The directory or bundle of the layer.
+
+        Raises:
+            FileNotFoundError: If no layer contains the path.
+        """
+        return self._owner(relative).directory
+
+    def digest(self) -> str:
+        """Return a digest of all layers, see `Index.digest`."""
+        digest = hashlib.sha1()
+        for layer in self.layers:
+            digest.update(f"{layer.digest()}\0".encode())
+        return digest.hexdigest()
+
+    def path(self, relative: str) -> str:
+        """Return the path in the layer that serves `relative`.
+
+        If no layer contains the path, it is joined to the top layer.
+
+        Args:
+            relative: A "/" separated path relative to the layers.
+
+        Returns:
+            The absolute path.
+        """
+        layer = self._owners.get(relative, self.layers[-1])
+        return layer.path(relative)
+
+    def exists(self, relative: str) -> bool:
+        """Return True if a layer contains `relative`.
+
+        Args:
+            relative: A "/" separated path relative to the layers.
+        """
+        return relative in self._owners
+
+    def isfile(self, relative: str) -> bool:
+        """Return True if `relative` is a file in the layer that serves it.
+
+        Args:
+            relative: A "/" separated path relative to the layers.
+        """
+        layer = self._owners.get(relative)
+        return layer is not None and layer.isfile(relative)
+
+    def listdir(self, relative: str) -> list[str]:
+        """Return the union of the entries of a directory in all layers.
+
+        Args:
+            relative: A "/" separated path relative to the layers.
+
+        Returns:
+            The names of the entries, like `os.listdir`.
+
+        Raises:
+            FileNotFoundError: If no layer contains the directory.
+        """
+        try:
+            return self._dirs[relative]
+        except KeyError as error:
+            raise FileNotFoundError(self.path(relative)) from error
+
+    def template(self, relative: str) -> Template:
+        """Return the template of a file from the layer that serves it.
+
+        Args:
+            relative: A "/" separated path relative to the layers.
+
+        Returns:
+            The template.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        return self._owner(relative).template(relative)
+
+    def _owner(self, relative: str) -> "Index | Bundle":
+        """Return the layer that serves `relative`.
+
+        Raises:
+            FileNotFoundError: If no layer contains the path.
+        """
+        try:
+            return self._owners[relative]
+        except KeyError as error:
+            raise FileNotFoundError(self.path(relative)) from error
+
+
+class Snapshot:
+    """Index whose instruction files are all read into memory.
+
+    The lookups are answered by the index that the snapshot was taken of,
+    which keeps its entries in memory as well, so a snapshot never touches
+    the filesystem after it is created. Changes to the instruction files
+    are therefore not picked up; take a new snapshot instead.
+
+    Attributes:
+        directory: The directory of the index.
+        source: The index that the snapshot was taken of.
+    """
+
+    directory: str
+    source: "Index | Bundle | Overlay"
+    _templates: dict[str, Template]
+
+    def __init__(self, source: "Index | Bundle | Overlay") -> None:
+        """Read all markdown files of an index.
+
+        Args:
+            source: The index to take a snapshot of.
+
+        Raises:
+            OSError: If a file cannot be read.
+        """
+        self.directory = source.directory
+        self.source = source
+        with profiling.span("index.snapshot"):
+            self._templates = {
+                relative: source.template(relative)
+                for relative in _walk(source)
+                if relative.endswith(".md") and source.isfile(relative)
+            }
+
+    def digest(self) -> str:
+        """Return the digest of the source, see `Index.digest`."""
+        return self.source.digest()
+
+    def path(self, relative: str) -> str:
+        """Return the path of `relative` in the source, see `Index.path`."""
+        return self.source.path(relative)
+
+    def which(self, relative: str) -> str:
+        """Return the layer that serves `relative`, see `Overlay.which`."""
+        return self.source.which(relative)
+
+    def exists(self, relative: str) -> bool:
+        """Return True if `relative` is a file or directory of the source."""
+        return self.source.exists(relative)
+
+    def isfile(self, relative: str) -> bool:
+        """Return True if `relative` is a file of the source."""
+        return self.source.isfile(relative)
+
+    def listdir(self, relative: str) -> list[str]:
+        """Return the entries of a directory, see `Index.listdir`."""
+        return self.source.listdir(relative)
+
+    def template(self, relative: str) -> Template:
+        """Return the template of a markdown file from memory.
+
+        Args:
+            relative: A "/" separated path relative to the directory.
+
+        Returns:
+            The template.
+
+        Raises:
+            FileNotFoundError: If the file is not in the snapshot.
+        """
+        try:
+            return self._templates[relative]
+        except KeyError as error:
+            raise FileNotFoundError(self.path(relative)) from error
+
+
+def load(directory: str) -> "Index | Bundle | Overlay":
+    """Return the index of the instructions in `directory`.
+
+    Args:
+        directory: The instructions directory, the path of a bundle that was
+            created with `prompts bundle`, or several of them separated by
+            `os.pathsep`, in which case the later layers override the
+            earlier ones.
+
+    Returns:
+        An `Index` for a directory, a `Bundle` for a file, or an `Overlay`
+        for several layers. The overlay is only rebuilt when one of its
+        layers changed.
+    """
+    paths: list[str] = [x for x in directory.split(os.pathsep) if x]
+    if len(paths) > 1:
+        layers = tuple(_load_layer(x) for x in paths)
+        overlay: Overlay | None = _overlays.get(directory)
+        if overlay is None or any(
+            x is not y for x, y in zip(overlay.layers, layers)
+        ):
+            with profiling.span("index.overlay"):
+                overlay = _overlays[directory] = Overlay(layers)
+        return overlay
+    return _load_layer(paths[0] if paths else directory)
+
+
+def _load_layer(directory: str) -> "Index | Bundle":
+    """Return the index of a single instructions directory or bundle."""
+    if os.path.isfile(directory):
+        from prompts._bundle import Bundle
+
+        return Bundle.load(directory)
+    return Index.load(directory)
+
+
+def _walk(index: "Index | Bundle") -> list[str]:
+    """Return the relative paths of all files and directories of an index.
+
+    The root directory is included as an empty string, unless it is missing.
+    """
+    if not index.exists(""):
+        return []
+    paths: list[str] = [""]
+    for relative in paths:
+        if relative and index.isfile(relative):
+            continue
+        for name in index.listdir(relative):
+            paths.append(f"{relative}/{name}" if relative else name)
+    return paths
+
+
+def _cache_file(directory: str) -> str:
+    """Return the path of the cache file for an instructions directory.
+
+    Args:
+        directory: The absolute path of the instructions directory.
+
+    Returns:
+        The path of the cache file.
+    """
+    digest: str = hashlib.sha1(directory.encode()).hexdigest()[:16]
+    return join(_paths.cache, f"index-{digest}.json")
+
+
+def _mtime(path: str) -> int:
+    """Return the mtime of `path` in nanoseconds, or -1 if it is missing.
+
+    Args:
+        path: The path to stat.
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
@@ -0,0 +1,661 @@
+"""Resumable queue of actions, stored in SQLite.
+
+Sweeps like `prompts fix --files src --action aider-code` can run for hours.
+With `--queue`, a job is recorded per file before any action runs: the
+command, the file, the action, the prompt and a hash of the prompt. Workers
+then drain the queue, at most `PROMPTS_JOBS_WORKERS` (default: 1) at the
+same time, and record the status, the duration and the exit code of each
+job. A failing job does not stop the other jobs.
+
+The jobs are stored in `_paths.jobs`, next to the log file in the state
+directory, so they survive a crash:
+
+- `prompts jobs list` shows the jobs and their status.
+- `prompts jobs resume` runs the jobs that did not finish, including jobs
+  whose process died while they were running.
+- `prompts jobs retry` runs the failed jobs again.
+
+Queueing the same sweep again skips the jobs that are already done with the
+same prompt, so only the unfinished work is redone. The prompt is stored
+with the job, so values that were read from stdin are not needed to resume.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any
+
+from prompts import _parser, _paths, _sources, profiling
+from prompts._logger import logger
+from prompts.exceptions import JobError
+
+if TYPE_CHECKING:
+    from prompts.builder import PromptBuilder
+
+STATUSES: tuple[str, ...] = ("pending", "running", "done", "failed")
+
+_VERSION: int = 1
+
+# Seconds to wait for a lock on the database held by another process.
+_TIMEOUT: float = 30.0
+
+_SCHEMA: str = f"""
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    command TEXT NOT NULL,
+    files TEXT NOT NULL,
+    action TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    pid INTEGER,
+    created REAL NOT NULL,
+    duration REAL NOT NULL DEFAULT 0,
+    exitcode INTEGER,
+    error TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (command, files, action, hash);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+PRAGMA user_version = {_VERSION};
+"""
+
+# The columns of a `Job`, without the prompt and the values.
+_FIELDS: tuple[str, ...] = (
+    "id",
+    "command",
+    "files",
+    "action",
+    "status",
+    "attempts",
+    "duration",
+    "exitcode",
+    "error",
+)
+_COLUMNS: str = ", ".join(_FIELDS)
+
+
+class Job:
+    """A queued action, see the module docstring.
+
+    Attributes:
+        id: The id of the job in the store.
+        command: The command name.
+        files: The comma-separated files of the job, or "".
+        action: The name of the action.
+        status: One of `STATUSES`.
+        attempts: The number of times the job was started.
+        duration: The duration of the last attempt in seconds.
+        exitcode: The exit code of the last attempt, or None if the job did
+            not finish yet.
+        error: The error of the last attempt, or "".
+        prompt: The prompt, only set when the job is claimed.
+        kwargs: The values of the instructions, only set when the job is
+            claimed.
+        metadata: The metadata of the action, only set when the job is
+            claimed.
+    """
+
+    id: int
+    command: str
+    files: str
+    action: str
+    status: str
+    attempts: int
+    duration: float
+    exitcode: int | None
+    error: str
+    prompt: str
+    kwargs: dict[str, str]
+    metadata: dict[str, Any]
+
+    def __init__(
+        self,
+        id: int,
+        command: str,
+        files: str,
+        action: str,
+        status: str = "pending",
+        attempts: int = 0,
+        duration: float = 0.0,
+        exitcode: int | None = None,
+        error: str = "",
+    ) -> None:
+        """Initialize a job from the columns of the store.
+
+        Args:
+            id: The id of the job.
+            command: The command name.
+            files: The comma-separated files of the job.
+            action: The name of the action.
+            status: One of `STATUSES`.
+            attempts: The number of times the job was started.
+            duration: The duration of the last attempt in seconds.
+            exitcode: The exit code of the last attempt.
+            error: The error of the last attempt.
+        """
+        self.id = id
+        self.command = command
+        self.files = files
+        self.action = action
+        self.status = status
+        self.attempts = attempts
+        self.duration = duration
+        self.exitcode = exitcode
+        self.error = error
+        self.prompt = ""
+        self.kwargs = {}
+        self.metadata = {}
+
+    def report(self) -> dict[str, Any]:
+        """Return the columns of the job, e.g., for JSON."""
+        return dict(
+            id=self.id,
+            command=self.command,
+            files=self.files,
+            action=self.action,
+            status=self.status,
+            attempts=self.attempts,
+            duration=self.duration,
+            exitcode=self.exitcode,
+            error=self.error,
+        )
+
+
+class JobStore:
+    """SQLite database of jobs that is shared by processes and threads.
+
+    Each operation uses its own connection and transaction, so workers in
+    several threads or processes can claim jobs from the same store.
+
+    Attributes:
+        path: The path of the database.
+    """
+
+    path: str
+
+    def __init__(self, path: str = "") -> None:
+        """Open the store, creating the database if it does not exist.
+
+        Args:
+            path: The path of the database. Defaults to `_paths.jobs`.
+        """
+        self.path = path or _paths.jobs
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection in autocommit mode and close it afterwards."""
+        connection = sqlite3.connect(
+            self.path, timeout=_TIMEOUT, isolation_level=None
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA synchronous = NORMAL")
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection with a write transaction, see `_connect`."""
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def add(
+        self,
+        action: str,
+        items: Iterable[tuple[str, dict[str, str], dict[str, Any]]],
+    ) -> list[int]:
+        """Queue jobs in one transaction, except those that are done or run.
+
+        A job is the same as a queued job if it has the same command, files,
+        action and prompt. A failed or interrupted job is queued again.
+
+        Args:
+            action: The name of the action.
+            items: The prompt, the values of the instructions, including the
+                command, and the metadata of the action of each job.
+
+        Returns:
+            The ids of the pending jobs.
+        """
+        ids: list[int] = []
+        with self._transaction() as connection:
+            for prompt, kwargs, metadata in items:
+                job_id: int | None = self._add(
+                    connection, action, prompt, kwargs, metadata
+                )
+                if job_id is not None:
+                    ids.append(job_id)
+        return ids
+
+    @staticmethod
+    def _add(
+        connection: sqlite3.Connection,
+        action: str,
+        prompt: str,
+        kwargs: dict[str, str],
+        metadata: dict[str, Any],
+    ) -> int | None:
+        """Queue a single job, see `add`.
+
+        Returns:
+            The id of the pending job, or None if it is done or running.
+        """
+        key: tuple[str, str, str, str] = (
+            kwargs["command"],
+            kwargs.get("files", ""),
+            action,
+            hashlib.sha256(prompt.encode()).hexdigest(),
+        )
+        row: sqlite3.Row | None = connection.execute(
+            "SELECT id, status, pid FROM jobs WHERE command = ? "
+            "AND files = ? AND action = ? AND hash = ? "
+            "ORDER BY id DESC LIMIT 1",
+            key,
+        ).fetchone()
+        if row is None:
+            cursor: sqlite3.Cursor = connection.execute(
+                "INSERT INTO jobs (command, files, action, hash, prompt, "
+                "kwargs, metadata, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    *key,
+                    prompt,
+                    json.dumps(kwargs),
+                    json.dumps(metadata),
+                    time.time(),
+                ),
+            )
+            return cursor.lastrowid
+        if row["status"] == "done":
+            logger.info("Skipping job %s, which is done", row["id"])
+            return None
+        if row["status"] == "running" and _alive(row["pid"]):
+            logger.warning(
+                "Skipping job %s, which runs in process %s",
+                row["id"],
+                row["pid"],
+            )
+            return None
+        connection.execute(
+            "UPDATE jobs SET status = 'pending', pid = NULL WHERE id = ?",
+            (row["id"],),
+        )
+        return row["id"]
+
+    def claim(self, job_id: int) -> Job | None:
+        """Mark a pending job as running in this process.
+
+        Args:
+            job_id: The id of the job.
+
+        Returns:
+            The job with its prompt, or None if it is not pending, e.g.,
+            because another worker claimed it.
+        """
+        with self._transaction() as connection:
+            cursor: sqlite3.Cursor = connection.execute(
+                "UPDATE jobs SET status = 'running', pid = ?, "
+                "attempts = attempts + 1 WHERE id = ? AND status = 'pending'",
+                (os.getpid(), job_id),
+            )
+            if not cursor.rowcount:
+                return None
+            row: sqlite3.Row = connection.execute(
+                f"SELECT {_COLUMNS}, prompt, kwargs, metadata FROM jobs "
+                "WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        job = Job(*(row[x] for x in _FIELDS))
+        job.prompt = row["prompt"]
+        job.kwargs = json.loads(row["kwargs"])
+        job.metadata = json.loads(row["metadata"])
+        return job
+
+    def finish(self, job: Job) -> None:
+        """Store the status, the duration, the exit code and the error.
+
+        Args:
+            job: The job that ran.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, duration = ?, exitcode = ?, "
+                "error = ?, pid = NULL WHERE id = ?",
+                (job.status, job.duration, job.exitcode, job.error, job.id),
+            )
+
+    def jobs(self, status: str = "") -> list[Job]:
+        """Return the jobs, without their prompts.
+
+        Args:
+            status: Only return the jobs with this status, if given.
+
+        Returns:
+            The jobs, in the order in which they were queued.
+        """
+        query: str = f"SELECT {_COLUMNS} FROM jobs"
+        params: tuple[str, ...] = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        with self._connect() as connection:
+            rows = connection.execute(f"{query} ORDER BY id", params)
+            return [Job(*row) for row in rows]
+
+    def requeue(self, status: str, ids: list[int] | None = None) -> list[int]:
+        """Mark jobs with a status as pending again.
+
+        Running jobs are only requeued if their process is not alive.
+
+        Args:
+            status: The status of the jobs, e.g., "failed".
+            ids: Only requeue these jobs, if given.
+
+        Returns:
+            The ids of the pending jobs.
+        """
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT id, pid FROM jobs WHERE status = ? ORDER BY id",
+                (status,),
+            ).fetchall()
+            requeued: list[int] = [
+                row["id"]
+                for row in rows
+                if (ids is None or row["id"] in ids)
+                and (status != "running" or not _alive(row["pid"]))
+            ]
+            connection.executemany(
+                "UPDATE jobs SET status = 'pending', pid = NULL WHERE id = ?",
+                [(x,) for x in requeued],
+            )
+        return requeued
+
+    def pending(self, ids: list[int] | None = None) -> list[int]:
+        """Return the ids of the pending jobs.
+
+        Args:
+            ids: Only return these jobs, if given.
+        """
+        return [
+            x.id for x in self.jobs("pending") if ids is None or x.id in ids
+        ]
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of the `jobs` subcommand.
+
+    Args:
+        parser: The subcommand parser to add options to.
+    """
+    parser.add_argument(
+        "operation",
+        choices=["list", "resume", "retry"],
+        help="Show the jobs, run the unfinished jobs, or run the failed "
+        "jobs again",
+    )
+    parser.add_argument(
+        "ids",
+        nargs="*",
+        type=int,
+        help="Only resume or retry these jobs",
+    )
+    parser.add_argument(
+        "-s",
+        "--status",
+        choices=STATUSES,
+        default="",
+        help="Only list the jobs with this status",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="List the jobs as JSON lines",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=_workers(),
+        help="Number of jobs that run at the same time",
+    )
+    _parser.add_logging_options(parser)
+
+
+def run(args: argparse.Namespace) -> None:
+    """List, resume or retry the jobs.
+
+    Args:
+        args: Parsed command-line arguments.
+
+    Raises:
+        JobError: If a job that was resumed or retried failed.
+    """
+    _parser.setup_logging(args)
+    store = JobStore()
+    if args.operation == "list":
+        for job in store.jobs(args.status):
+            print(json.dumps(job.report()) if args.json else _format(job))
+        return
+
+    ids: list[int] | None = args.ids or None
+    if args.operation == "retry":
+        pending: list[int] = store.requeue("failed", ids)
+    else:
+        store.requeue("running", ids)
+        pending = store.pending(ids)
+    _drain(store, pending, args.workers)
+
+
+def submit(
+    args: argparse.Namespace,
+    builder: "PromptBuilder",
+    groups: list[dict[str, Any]],
+) -> None:
+    """Queue a job per file and run the jobs.
+
+    Args:
+        args: Parsed command-line arguments.
+        builder: The builder of the instructions.
+        groups: The values of the instructions per group of files, see
+            `_parser.execute`.
+
+    Raises:
+        JobError: If a job failed.
+    """
+    # Sources like stdin can only be streamed once, so they are read upfront.
+    for value in args.__dict__.values():
+        if isinstance(value, _sources.Source):
+            value.read()
+
+    store = JobStore()
+    with profiling.span("jobs.submit"):
+        items = [
+            _parser.render(args, builder, kwargs)
+            for group in groups
+            for kwargs in _per_file(group)
+        ]
+        ids: list[int] = store.add(args.action, items)
+    logger.info("Queued %s jobs in '%s'", len(ids), store.path)
+    _drain(store, ids, _workers())
+
+
+def work(store: JobStore, ids: list[int], workers: int = 1) -> list[Job]:
+    """Run the pending jobs of `ids` with at most `workers` at a time.
+
+    Each worker claims the next pending job until no job is left, so jobs
+    that are claimed by another process are skipped.
+
+    Args:
+        store: The store of the jobs.
+        ids: The ids of the jobs, in the order in which they run.
+        workers: The maximum number of jobs that run at the same time.
+
+    Returns:
+        The jobs that ran.
+    """
+    todo: queue.SimpleQueue[int] = queue.SimpleQueue()
+    for job_id in ids:
+        todo.put(job_id)
+    done: list[Job] = []
+    lock = threading.Lock()
+
+    def loop() -> None:
+        while True:
+            try:
+                job_id: int = todo.get_nowait()
+            except queue.Empty:
+                return
+            job: Job | None = store.claim(job_id)
+            if job is None:
+                logger.info("Skipping job %s, which is not pending", job_id)
+                continue
+            _run_job(store, job)
+            with lock:
+                done.append(job)
+
+    workers = max(min(workers, len(ids)), 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(loop) for _ in range(workers)]:
+            future.result()
+    return sorted(done, key=lambda x: x.id)
+
+
+def summary(jobs: list[Job]) -> str:
+    """Return a human-readable summary of the jobs that ran.
+
+    Args:
+        jobs: The jobs.
+
+    Returns:
+        One line per job and a total.
+    """
+    lines: list[str] = [_format(job) for job in jobs]
+    succeeded: int = sum(x.status == "done" for x in jobs)
+    total: float = sum(x.duration for x in jobs)
+    lines.append(f"{succeeded} of {len(jobs)} jobs succeeded in {total:.2f}s")
+    return "\n".join(lines)
+
+
+def _drain(store: JobStore, ids: list[int], workers: int) -> None:
+    """Run the jobs and print their summary, see `work`.
+
+    Raises:
+        JobError: If a job failed.
+    """
+    if not ids:
+        print("No jobs to run", file=sys.stderr)
+        return
+    jobs: list[Job] = work(store, ids, workers)
+    print(summary(jobs), file=sys.stderr)
+    failed: list[str] = [str(x.id) for x in jobs if x.status == "failed"]
+    if failed:
+        raise JobError(
+            f"Failed jobs: {', '.join(failed)}. Retry them with: "
+            "prompts jobs retry"
+        )
+
+
+def _run_job(store: JobStore, job: Job) -> None:
+    """Execute the action of a job and store its outcome.
+
+    The exit code of a failed job is the return code of the tool, e.g., of
+    aider, or 1 if the error has none.
+
+    Args:
+        store: The store of the job.
+        job: The claimed job, which is updated.
+    """
+    from prompts.actions import ActionFactory
+
+    logger.info("Running job %s: %s %s", job.id, job.command, job.files)
+    start: float = time.perf_counter()
+    try:
+        with profiling.span(f"job.{job.command}"):
+            action = ActionFactory(job.action).create(job.prompt, **job.kwargs)
+            action.metadata = job.metadata
+            action()
+    except Exception as error:
+        logger.error("Job %s failed: %s", job.id, error)
+        returncode: int | None = getattr(error, "returncode", None)
+        job.status, job.exitcode = "failed", returncode or 1
+        job.error = f"{type(error).__name__}: {error}"
+    else:
+        job.status, job.exitcode, job.error = "done", 0, ""
+    finally:
+        job.duration = time.perf_counter() - start
+        store.finish(job)
+
+
+def _per_file(kwargs: dict[str, Any]) -> list[dict[str, Any]]:
+    """Split the values of the instructions into the values of each file.
+
+    Args:
+        kwargs: The values of the instructions.
+
+    Returns:
+        The values per file, or `kwargs` if there are no files.
+    """
+    files: Any = kwargs.get("files")
+    if not isinstance(files, str) or not files:
+        return [kwargs]
+    return [{**kwargs, "files": x} for x in files.split(",") if x]
+
+
+def _format(job: Job) -> str:
+    """Return a line with the columns of a job."""
+    line: str = (
+        f"{job.id:>5}  {job.status:<7}  {job.command}  "
+        f"{job.files or '-'}  {job.duration:.2f}s"
+    )
+    if job.exitcode is not None:
+        line += f"  exit {job.exitcode}"
+    if job.error:
+        line += f"  {job.error}"
+    return line
+
+
+def _workers() -> int:
+    """Return the number of workers of `PROMPTS_JOBS_WORKERS`."""
+    return int(os.environ.get("PROMPTS_JOBS_WORKERS", 1))
+
+
+def _alive(pid: int | None) -> bool:
+    """Return whether a process is alive.
+
+    Args:
+        pid: The process id, or None.
+    """
+    if pid is None:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
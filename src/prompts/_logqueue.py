@@ -0,0 +1,362 @@
+"""Non-blocking logging of the package logger.
+
+Log records are not written by the thread that logs them. Instead, the
+logger has a `QueueHandler` that puts the records on a bounded queue, and a
+`QueueListener` thread writes them to stderr and the log file. The handlers
+are flushed once the queue is drained, instead of after each record, so a
+burst of records, like the output of aider, is written in one batch.
+
+Logging never blocks the action:
+
+- Arguments and messages that are longer than `PROMPTS_LOG_MAX_CHARS`
+  characters (default: 2000) are truncated, and the SHA-1 of the full value
+  is added, so large prompts are never formatted in full.
+- When the queue is full, the oldest records are dropped. The number of
+  dropped records is logged as a warning.
+
+Forked child processes do not open the log file again. Their records are
+sent to the parent through a pipe, which is created before the first fork,
+and written by the listener of the parent.
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import sys
+import threading
+from contextlib import suppress
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import TYPE_CHECKING, TextIO
+
+from prompts._logger import logger
+
+if TYPE_CHECKING:
+    import multiprocessing
+
+FORMAT: str = (
+    "%(asctime)s - %(levelname)s - %(name)s@%(module)s.%(funcName)s:"
+    "%(lineno)d - %(message)s"
+)
+_QUEUE_SIZE: int = 10000
+_lock = threading.Lock()
+_listener: "_Listener | None" = None
+_handler: "_Handler | None" = None
+_config: tuple[str, str] | None = None
+_forwarded: "multiprocessing.SimpleQueue[logging.LogRecord | None] | None" = (
+    None
+)
+_forwarder: threading.Thread | None = None
+
+
+class _DroppingQueue(queue.Queue[logging.LogRecord]):
+    """Bounded queue that drops its oldest record when it is full.
+
+    Attributes:
+        dropped: The number of dropped records.
+    """
+
+    dropped: int
+
+    def __init__(self, maxsize: int) -> None:
+        """Initialize an empty queue.
+
+        Args:
+            maxsize: The maximum number of records in the queue.
+        """
+        super().__init__(maxsize)
+        self.dropped = 0
+
+    def put(
+        self,
+        item: logging.LogRecord,
+        block: bool = True,
+        timeout: float | None = None,
+    ) -> None:
+        """Add a record, dropping the oldest record if the queue is full.
+
+        This never blocks; `block` and `timeout` are ignored.
+        """
+        while True:
+            try:
+                super().put(item, block=False)
+                return
+            except queue.Full:
+                try:
+                    self.get_nowait()
+                except queue.Empty:
+                    continue
+                self.task_done()
+                self.dropped += 1
+
+
+class _Handler(QueueHandler):
+    """Queue handler that truncates large payloads before they are queued.
+
+    Attributes:
+        max_chars: The maximum length of arguments and messages.
+    """
+
+    max_chars: int
+
+    def __init__(self, records: _DroppingQueue, max_chars: int) -> None:
+        """Initialize the handler.
+
+        Args:
+            records: The queue of the listener.
+            max_chars: The maximum length of arguments and messages.
+        """
+        super().__init__(records)
+        self.max_chars = max_chars
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Truncate the arguments of a record, or its message if it has none.
+
+        The message is formatted in the logging thread, so it only contains
+        the truncated arguments.
+        """
+        if not record.args:
+            record.msg = self._shorten(record.msg)
+        elif isinstance(record.args, tuple):
+            record.args = tuple(self._shorten(x) for x in record.args)
+        return super().prepare(record)
+
+    def _shorten(self, value: object) -> object:
+        """Return `value`, truncated if it is long.
+
+        Other values than strings and numbers, like an `argparse.Namespace`
+        that holds a large diff, are truncated by their `repr`.
+        """
+        if isinstance(value, int | float | None):
+            return value
+        text: str = value if isinstance(value, str) else repr(value)
+        if len(text) <= self.max_chars:
+            return value
+        digest: str = hashlib.sha1(text.encode(errors="replace")).hexdigest()
+        return (
+            f"{text[: self.max_chars]}... [{len(text)} characters, "
+            f"sha1 {digest[:12]}]"
+        )
+
+
+class _ChildHandler(_Handler):
+    """Handler of a forked child that sends its records to the parent."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Send a record to the listener of the parent process."""
+        self.queue.put(record)
+
+
+class _Batched(logging.StreamHandler):
+    """Stream handler that is only flushed by `flush_batch`."""
+
+    def flush(self) -> None:
+        """Do not flush after each record, see `flush_batch`."""
+
+    def flush_batch(self) -> None:
+        """Flush the records that were written since the last batch."""
+        super().flush()
+
+
+class _Stderr(_Batched):
+    """Batched handler that writes to the current `sys.stderr`.
+
+    The stream is looked up for each record, so a replaced or closed
+    `sys.stderr` is never written to after it was replaced.
+    """
+
+    @property
+    def stream(self) -> TextIO:
+        """Return the current standard error stream."""
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value: object) -> None:
+        """Ignore the stream that is set by `logging.StreamHandler`."""
+
+
+class _FileHandler(_Batched, RotatingFileHandler):
+    """Rotating file handler that is only flushed by `flush_batch`."""
+
+
+class _Listener(QueueListener):
+    """Queue listener that flushes its handlers when the queue is drained."""
+
+    _records: _DroppingQueue
+    _batched: tuple[_Batched, ...]
+    _reported: int
+
+    def __init__(self, records: _DroppingQueue, *handlers: _Batched) -> None:
+        """Initialize the listener.
+
+        Args:
+            records: The queue of the handler.
+            *handlers: The handlers that write the records.
+        """
+        super().__init__(records, *handlers, respect_handler_level=True)
+        self._records = records
+        self._batched = handlers
+        self._reported = 0
+
+    def handle(self, record: logging.LogRecord) -> None:
+        """Write a record and flush the handlers if no records are left."""
+        dropped: int = self._records.dropped
+        if dropped > self._reported:
+            super().handle(_dropped(dropped - self._reported))
+            self._reported = dropped
+        super().handle(record)
+        if self._records.empty():
+            self.flush()
+
+    def flush(self) -> None:
+        """Flush all handlers."""
+        for handler in self._batched:
+            handler.flush_batch()
+
+
+def setup(filename: str, loglevel: str | int) -> None:
+    """Configure the package logger to log through the queue.
+
+    Calling this again with the same arguments does nothing, so the handlers
+    are not duplicated when it is called for each command.
+
+    Args:
+        filename: The log file, which is rotated at 10 MB.
+        loglevel: The level of the logger and its handlers.
+    """
+    global _listener, _handler, _config
+    config: tuple[str, str] = (filename, str(loglevel))
+    with _lock:
+        if _config == config:
+            return
+        _stop()
+
+        filename = os.path.expandvars(os.path.expanduser(filename))
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        handlers: list[_Batched] = [
+            _Stderr(),
+            _FileHandler(filename, maxBytes=10 * 1024 * 1024, backupCount=5),
+        ]
+        for handler in handlers:
+            handler.setLevel(loglevel)
+            handler.setFormatter(logging.Formatter(FORMAT))
+
+        records = _DroppingQueue(_QUEUE_SIZE)
+        max_chars: int = int(os.environ.get("PROMPTS_LOG_MAX_CHARS", 2000))
+        _handler = _Handler(records, max_chars)
+        _listener = _Listener(records, *handlers)
+        _listener.start()
+        _config = config
+
+        logger.propagate = False
+        logger.setLevel(loglevel)
+        logger.addHandler(_handler)
+    logger.debug("Logging to '%s' at level %s", filename, loglevel)
+
+
+def stop() -> None:
+    """Write the queued records and stop the listener thread."""
+    global _config
+    with _lock:
+        _stop()
+        _config = None
+
+
+def _stop() -> None:
+    """Stop the listener and close its handlers, see `stop`.
+
+    The streams may already be closed when this runs at exit, so errors while
+    flushing and closing them are ignored.
+    """
+    global _listener, _handler, _forwarded, _forwarder
+    if _handler is not None:
+        logger.removeHandler(_handler)
+        _handler = None
+    if _forwarder is not None and _forwarded is not None:
+        _forwarded.put(None)
+        _forwarder.join()
+        _forwarded.close()
+    _forwarded, _forwarder = None, None
+    if _listener is not None:
+        _listener.stop()
+        with suppress(OSError, ValueError):
+            _listener.flush()
+        for handler in _listener.handlers:
+            with suppress(OSError, ValueError):
+                handler.close()
+        _listener = None
+
+
+def _forward(
+    forwarded: "multiprocessing.SimpleQueue[logging.LogRecord | None]",
+    records: _DroppingQueue,
+) -> None:
+    """Put the records of forked children on the queue of the listener.
+
+    Args:
+        forwarded: The pipe that the children send their records to. The
+            forwarding stops when `None` is received.
+        records: The queue of the listener.
+    """
+    while (record := forwarded.get()) is not None:
+        records.put(record)
+
+
+def _dropped(count: int) -> logging.LogRecord:
+    """Return a warning about `count` records that were dropped."""
+    return logging.LogRecord(
+        logger.name,
+        logging.WARNING,
+        __file__,
+        0,
+        "Dropped %s log records because the queue was full",
+        (count,),
+        None,
+        func="_dropped",
+    )
+
+
+def _before_fork() -> None:
+    """Create the pipe that forked children send their records through.
+
+    The pipe and its thread are only created when the process forks, so
+    processes that do not fork do not pay for them.
+    """
+    global _forwarded, _forwarder
+    import multiprocessing
+
+    with _lock:
+        if _listener is None or _forwarded is not None:
+            return
+        _forwarded = multiprocessing.SimpleQueue()
+        _forwarder = threading.Thread(
+            target=_forward, args=(_forwarded, _listener._records), daemon=True
+        )
+        _forwarder.start()
+
+
+def _after_fork() -> None:
+    """Send the records of a forked child process to the parent.
+
+    The listener thread does not exist in the child, and the queue may have
+    been locked by it. Opening the log file again in each child would rotate
+    it from several processes, so the child sends its records to the
+    listener of the parent instead. The configuration is kept, so calling
+    `setup` again with the same arguments does nothing in the child.
+    """
+    global _lock, _listener, _handler, _forwarder
+    _lock = threading.Lock()
+    if _handler is not None:
+        logger.removeHandler(_handler)
+        max_chars: int = _handler.max_chars
+        _handler = None
+        if _forwarded is not None:
+            _handler = _ChildHandler(_forwarded, max_chars)
+            logger.addHandler(_handler)
+    _listener, _forwarder = None, None
+
+
+# Write the queued records when the interpreter exits.
+atexit.register(stop)
+os.register_at_fork(before=_before_fork, after_in_child=_after_fork)
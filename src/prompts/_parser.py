@@ -1,56 +1,243 @@
 import argparse
+import importlib
+import os
+import sys
+from collections.abc import Callable, Iterator, Sequence
 from contextlib import suppress
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, NoReturn, override
 
-import pygeneral.log
-
-from prompts import _paths
-from prompts.actions import ActionFactory
+from prompts import _paths, _sources, profiling
+from prompts._logger import logger
 from prompts.instructions import Instructions
 
 if TYPE_CHECKING:
-    from prompts.actions import AbstractAction
+    from prompts._tokens import Budget
+    from prompts.actions import AbstractAction, ActionFactory
+    from prompts.builder import PromptBuilder
+
+# Builtin subcommands that do not correspond to an instruction command. They
+# map the subcommand name to the module that implements it and a help text.
+# The module must define `add_arguments(parser)` and `run(args)` functions and
+# is only imported when the subcommand needs to be configured. A module that
+# also needs the instructions to add its options defines
+# `add_instruction_options(parser, instructions)`.
+_BUILTINS: dict[str, tuple[str, str]] = {
+    "batch": ("prompts._batch", "Generate prompts for JSONL requests."),
+    "bundle": ("prompts._bundle", "Pack the instructions into a bundle."),
+    "cache": ("prompts._cache", "Show or clear the prompt cache."),
+    "completions": (
+        "prompts._completions",
+        "Write static shell completion scripts.",
+    ),
+    "commit-chunks": (
+        "prompts._diffs",
+        "Split a large diff into commit prompts.",
+    ),
+    "jobs": ("prompts._jobs", "List, resume or retry queued jobs."),
+    "prefix-report": (
+        "prompts._prefixes",
+        "Report the static prompt prefix per command.",
+    ),
+    "run": ("prompts._pipeline", "Run several commands over the same files."),
+    "serve": ("prompts._server", "Serve prompts over a Unix socket."),
+}
 
 
-def setup() -> argparse.ArgumentParser:
+def setup(
+    lazy: bool = False, argv: Sequence[str] | None = None
+) -> argparse.ArgumentParser:
     """Setup the argument parser with subcommands and options.
 
+    In lazy mode, the command is pre-parsed from the command line and only
+    the subparser of that command is added. Without a known command, or
+    with `--help` before it, all commands are added without options, so
+    they show up in the help message and can be validated by argparse. The
+    other commands are also added when parsing fails, so the usage in the
+    error message lists all of them.
+
+    Args:
+        lazy: Only configure the subparser of the command that is given on
+            the command line.
+        argv: The command-line arguments that are pre-parsed. Defaults to
+            `sys.argv[1:]`.
+
     Returns:
         The configured argument parser.
     """
-    parser = argparse.ArgumentParser(
+    parser = _Parser(
         description="Return prompts for LLMs.",
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
     parser.add_argument(
         "-v",
         "--version",
-        action="version",
-        version=f"%(prog)s {__import__('prompts').__version__}",
+        action=_VersionAction,
+        help="show program's version number and exit",
     )
     parser.add_argument(
         "--dir",
         default=_paths.instructions,
-        help="Set a custom directory for instructions",
-    )
-    directory: str = _preparse_directory()
-    parser.epilog = _make_epilog()
-    subparsers = parser.add_subparsers(dest="command", required=True)
-    for command in Instructions(directory).list_commands():
-        subparser = subparsers.add_parser(command)
-        _add_options(subparser, command, directory)
-        subparser.set_defaults(func=_func)
+        help="Set a custom directory for instructions. Multiple layers are "
+        f"separated by '{os.pathsep}'; later layers override earlier ones.",
+    )
+    add_profile_options(parser)
+    with profiling.span("setup.instructions"):
+        instructions = Instructions(_preparse_directory(argv))
+    selected: str = _preparse_command(argv) if lazy else ""
+    commands: list[str] = []
+    for command in instructions.list_commands():
+        if command in _BUILTINS:
+            logger.warning("Command '%s' is shadowed by a builtin", command)
+        else:
+            commands.append(command)
+
+    with profiling.span("setup.subparsers"):
+        subparsers = parser.add_subparsers(
+            dest="command",
+            required=True,
+            parser_class=argparse.ArgumentParser,
+        )
+
+        def add(name: str) -> None:
+            """Add the subparser of a command, with options if selected."""
+            if name not in _BUILTINS:
+                subparser = subparsers.add_parser(name)
+                subparser.set_defaults(func=_func)
+                if not lazy or name == selected:
+                    add_command_options(subparser, instructions, name)
+                return
+            module, description = _BUILTINS[name]
+            subparser = subparsers.add_parser(name, help=description)
+            if lazy and name != selected:
+                return
+            builtin = importlib.import_module(module)
+            builtin.add_arguments(subparser)
+            if hasattr(builtin, "add_instruction_options"):
+                builtin.add_instruction_options(subparser, instructions)
+            subparser.set_defaults(func=builtin.run)
+
+        def complete() -> None:
+            """Add the commands that are not added yet."""
+            for name in [*commands, *_BUILTINS]:
+                if name not in subparsers.choices:
+                    add(name)
+            parser.epilog = _make_epilog(instructions)
+
+        known: bool = selected in _BUILTINS or selected in commands
+        if known and not _help_before(selected, argv):
+            add(selected)
+            parser.complete = complete
+        else:
+            complete()
     return parser
 
 
-def _make_epilog(directory: str = _paths.instructions) -> str:
+class _Parser(argparse.ArgumentParser):
+    """Argument parser that adds all commands before reporting an error.
+
+    In lazy mode, only the subparser of the selected command is added, see
+    `setup`. When parsing fails, `complete` adds the other commands, so the
+    usage in the error message is the same as in full mode.
+
+    Attributes:
+        complete: Callable that adds the commands that are not added yet,
+            or None if all commands are added.
+    """
+
+    complete: Callable[[], None] | None
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Initialize the parser with all commands added."""
+        super().__init__(*args, **kwargs)
+        self.complete = None
+
+    @override
+    def error(self, message: str) -> NoReturn:
+        """Add the remaining commands and report the error."""
+        if self.complete is not None:
+            complete, self.complete = self.complete, None
+            complete()
+        super().error(message)
+
+
+def _help_before(command: str, argv: Sequence[str] | None = None) -> bool:
+    """Return whether `--help` is given before the command.
+
+    Args:
+        command: The pre-parsed command name.
+        argv: The list of command-line arguments. Defaults to `sys.argv[1:]`.
+    """
+    args: list[str] = list(sys.argv[1:] if argv is None else argv)
+    before: list[str] = args[: args.index(command)] if command in args else []
+    return "-h" in before or "--help" in before
+
+
+class _VersionAction(argparse.Action):
+    """Print the version of the package and exit.
+
+    Unlike argparse's builtin version action, the version is only looked up
+    when the option is given.
+    """
+
+    def __init__(
+        self,
+        option_strings: Sequence[str],
+        dest: str = argparse.SUPPRESS,
+        default: str = argparse.SUPPRESS,
+        help: str | None = None,
+    ) -> None:
+        """Initialize the action as a flag without arguments."""
+        super().__init__(
+            option_strings=option_strings,
+            dest=dest,
+            default=default,
+            nargs=0,
+            help=help,
+        )
+
+    def __call__(
+        self,
+        parser: argparse.ArgumentParser,
+        namespace: argparse.Namespace,
+        values: Any,
+        option_string: str | None = None,
+    ) -> None:
+        """Print the version and exit."""
+        print(f"{parser.prog} {__import__('prompts').__version__}")
+        parser.exit()
+
+
+class _ActionNames:
+    """Lazy container of the available action names.
+
+    Used as the `choices` of the `--action` option. The names are taken from
+    the action registry, so no action is imported to validate or list them.
+    The option has a metavar, so the names are only listed in its help.
+    """
+
+    def __contains__(self, name: object) -> bool:
+        """Return True if `name` is an available action."""
+        from prompts._registry import registry
+
+        return name in registry
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the available action names."""
+        from prompts._registry import registry
+
+        return iter(registry.names())
+
+
+def _make_epilog(instructions: Instructions) -> str:
     """Generate the epilog for the argument parser.
 
+    Args:
+        instructions: The instructions used to list the options.
+
     Returns:
         The epilog string.
 
     """
-    instructions = Instructions(directory)
     cmds: set[str] = {f"--{cmd}" for cmd in instructions.list()}
     return (
         "The following options are available to all commands:\n"
@@ -61,42 +248,171 @@ def _make_epilog(directory: str = _paths.instructions) -> str:
     )
 
 
-def _preparse_directory() -> str:
+def _preparse_directory(argv: Sequence[str] | None = None) -> str:
     """Parse initial arguments without adding subcommand parsers.
 
     Only the --dir <value> or --dir=<value> is parsed in order to be able to
     modify the instructions directory.
 
     Args:
-        argv: The list of command-line arguments.
+        argv: The list of command-line arguments. Defaults to `sys.argv[1:]`.
 
     Returns:
         The parsed arguments.
     """
     parser = argparse.ArgumentParser(add_help=False)
     parser.add_argument("--dir", default=_paths.instructions)
-    args, _ = parser.parse_known_args()
+    args, _ = parser.parse_known_args(argv)
     return args.dir
 
 
-def _add_options(
+def add_profile_options(parser: argparse.ArgumentParser) -> None:
+    """Add the profiling options to a parser.
+
+    The options are parsed before the parser is set up, see
+    `preparse_profile`, so the setup itself is profiled as well.
+
+    Args:
+        parser: The parser to add options to.
+    """
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a JSON timing breakdown of each stage to stderr",
+    )
+    parser.add_argument(
+        "--profile-output",
+        default="",
+        help="Write the timing breakdown to a file instead of stderr",
+    )
+    parser.add_argument(
+        "--cprofile",
+        default="",
+        help="Write a cProfile profile to a file, see `pstats`",
+    )
+
+
+def preparse_profile(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    """Parse the profiling options without adding subcommand parsers.
+
+    Args:
+        argv: The list of command-line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        The parsed profiling options.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    add_profile_options(parser)
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def _preparse_command(argv: Sequence[str] | None = None) -> str:
+    """Parse the command name without adding subcommand parsers.
+
+    Args:
+        argv: The list of command-line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        The command name, or an empty string if no command is given.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--dir", default=_paths.instructions)
+    add_profile_options(parser)
+    parser.add_argument("command", nargs="?", default="")
+    args, _ = parser.parse_known_args(argv)
+    return args.command
+
+
+def add_command_options(
     parser: argparse.ArgumentParser,
-    command: str,
-    directory: str = _paths.instructions,
+    instructions: Instructions,
+    *commands: str,
 ) -> None:
     """Add common options to a subcommand parser.
 
     Args:
         parser: The subcommand parser to add options to.
-        command: The name of the command being configured.
+        instructions: The instructions used to find the dynamic options.
+        *commands: The names of the commands being configured. The dynamic
+            options of all of them are added.
     """
     parser.add_argument(
         "-a",
         "--action",
-        choices=ActionFactory.names(),
+        choices=_ActionNames(),
         default="print",
-        help="Apply the generated prompt to a tool.",
+        metavar="ACTION",
+        help="Apply the generated prompt to a tool: %(choices)s. The aider "
+        "actions split the files into shards of $PROMPTS_AIDER_SHARD_SIZE "
+        "files, which run in $PROMPTS_AIDER_WORKERS processes (default: 4) "
+        "and are retried $PROMPTS_AIDER_RETRIES times (default: 0).",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["given", "stable"],
+        default="given",
+        help="Order the instructions as given, or static text first to "
+        "maximize prompt caching.",
+    )
+    parser.add_argument(
+        "--cache-breakpoints",
+        action="store_true",
+        help="Add the end of the static prompt prefix to the json output.",
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=bool(os.environ.get("PROMPTS_CACHE")),
+        help="Read and write the prompt cache on disk. Defaults to on if "
+        "PROMPTS_CACHE is set.",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=0,
+        help="Fit the prompt into this number of tokens, see --overflow.",
+    )
+    parser.add_argument(
+        "--overflow",
+        choices=["truncate", "drop", "error"],
+        default="truncate",
+        help="Fit a prompt that exceeds --max-tokens by truncating the "
+        "largest values, dropping the largest instructions, or failing.",
+    )
+    parser.add_argument(
+        "--priority",
+        default="",
+        help="Comma-separated instructions that are truncated or dropped "
+        "last, most important first.",
     )
+    parser.add_argument(
+        "--tokenizer",
+        default="",
+        help="Count tokens with 'estimate', 'tiktoken[:<encoding>]' or "
+        "'<module>:<function>'. Defaults to $PROMPTS_TOKENIZER or 'estimate'.",
+    )
+    parser.add_argument(
+        "--queue",
+        action="store_true",
+        help="Queue a job per file and run the jobs, see 'prompts jobs'.",
+    )
+    parser.add_argument(
+        "--count-tokens",
+        action="store_true",
+        help="Add the number of tokens of each instruction to the json output.",
+    )
+    add_logging_options(parser)
+    for command in commands:
+        _add_dynamic_options(parser, command, instructions)
+
+
+def add_logging_options(parser: argparse.ArgumentParser) -> None:
+    """Add the logging options to a subcommand parser.
+
+    Args:
+        parser: The subcommand parser to add options to.
+    """
     parser.add_argument(
         "-l",
         "--loglevel",
@@ -109,26 +425,31 @@ def _add_options(
         default="~/.local/state/bartste-prompts.log",
         help="Path to log file",
     )
-    _add_dynamic_options(parser, command, directory)
 
 
 def _add_dynamic_options(
     parser: argparse.ArgumentParser,
     command: str,
-    directory: str = _paths.instructions,
+    instructions: Instructions,
 ) -> None:
     """Add dynamic options to a subcommand parser based on available
     instructions.
 
+    The values of the options may be read from a file, stdin or a file
+    descriptor, see `prompts._sources`.
+
     Args:
         parser: The subcommand parser to add options to.
         command: The name of the command being configured.
+        instructions: The instructions used to find the dynamic options.
     """
-    paths: Instructions = Instructions(directory)
-    for instruction in (x for x in paths.list(command) if x != "command"):
+    names: set[str] = instructions.list(command)
+    for instruction in (x for x in names if x != "command"):
         # Duplicates arguments may occur and can be ignored
         with suppress(argparse.ArgumentError):
-            parser.add_argument(f"--{instruction}", default="")
+            parser.add_argument(
+                f"--{instruction}", default="", type=_sources.parse
+            )
 
 
 def _func(args: argparse.Namespace) -> None:
@@ -137,23 +458,275 @@ def _func(args: argparse.Namespace) -> None:
     Args:
         args: Parsed command-line arguments.
     """
-    logger = pygeneral.log.setup(
-        "bartste-prompts",
-        filename=args.logfile,
-        loglevel=args.loglevel,
-    )
-    logger.debug("Parsed arguments: %s", args)
+    setup_logging(args)
+    execute(args)
+
+
+def setup_logging(args: argparse.Namespace) -> None:
+    """Configure the package logger from the logging options.
 
-    instructions = Instructions()
+    Args:
+        args: Parsed command-line arguments.
+    """
+    from prompts import _logqueue
+
+    _logqueue.setup(args.logfile, args.loglevel)
+
+
+def execute(
+    args: argparse.Namespace,
+    builder: "PromptBuilder | None" = None,
+    expand: bool = True,
+) -> None:
+    """Generate the prompt for a command and execute the selected action.
+
+    If `--files` contains globs or directories, they are expanded, see
+    `prompts._files`. When the command has a `filetype` instruction that is
+    not given, the files are grouped by their filetype and the action is
+    executed once per group. With `--queue`, a job is queued per file
+    instead, see `prompts._jobs`.
+
+    Args:
+        args: Parsed command-line arguments.
+        builder: The builder of the instructions, which can be shared by
+            several commands. Defaults to a builder of `args.dir`.
+        expand: Whether to expand `--files`. If False, it is a list of
+            paths that was already expanded, so paths that contain glob
+            characters, like `app/[id].tsx`, are kept as is.
+    """
+    from prompts.builder import PromptBuilder
+
+    logger.debug("Parsed arguments: %s", args)
+    if builder is None:
+        builder = PromptBuilder(args.dir, preload=False, validate=False)
+    instructions: Instructions = builder.instructions
     kwargs = {
         x: getattr(args, x)
         for x in instructions.list(args.command)
         if hasattr(args, x)
     }
-    prompt: str = instructions.make_prompt(**kwargs)
-    logger.debug("Generated prompt: %s", prompt)
+    files: Any = kwargs.get("files")
+    groups: list[dict[str, Any]] = [kwargs]
+    if isinstance(files, str) and files:
+        groups = _group_files(instructions, args.command, kwargs, expand)
+    if getattr(args, "queue", False):
+        from prompts import _jobs
+
+        _jobs.submit(args, builder, groups)
+        return
+    for group in groups:
+        _execute(args, builder, group)
+
+
+def _group_files(
+    instructions: Instructions,
+    command: str,
+    kwargs: dict[str, Any],
+    expand: bool = True,
+) -> list[dict[str, Any]]:
+    """Expand the `files` value and group the files by their filetype.
+
+    Args:
+        instructions: The instructions of the command.
+        command: The command name.
+        kwargs: The values of the instructions, with a non-empty `files`.
+        expand: Whether to expand `files`, see `execute`.
+
+    Returns:
+        The values of each group, in the order in which the filetypes first
+        appear. A single group if the filetype is given or not an
+        instruction of the command, or if no files match.
+    """
+    from prompts import _files, _sessions
+
+    files: list[str] = [x for x in kwargs["files"].split(",") if x]
+    if expand:
+        files = _files.expand(kwargs["files"], _sessions.getcwd())
+    if not files:
+        logger.warning("No files match '%s'", kwargs["files"])
+        return [kwargs]
+    if "filetype" not in kwargs or kwargs["filetype"]:
+        return [{**kwargs, "files": ",".join(files)}]
 
-    factory: ActionFactory = ActionFactory(args.action)
-    action: "AbstractAction" = factory.create(prompt, **kwargs)
+    filetypes: set[str] = instructions.values(command, "filetype")
+    groups = _files.group(files, _files.extension_index(filetypes))
+    logger.debug("Files grouped by filetype: %s", list(groups))
+    return [
+        {**kwargs, "files": ",".join(paths), "filetype": filetype}
+        for filetype, paths in groups.items()
+    ]
+
+
+def _execute(
+    args: argparse.Namespace, builder: "PromptBuilder", kwargs: dict[str, Any]
+) -> None:
+    """Generate a single prompt and execute the selected action, see `execute`.
+
+    Args:
+        args: Parsed command-line arguments.
+        builder: The builder of the instructions.
+        kwargs: The values of the instructions.
+    """
+    from prompts.actions import ActionFactory
+
+    factory: "ActionFactory" = ActionFactory(args.action)
+    if _streamable(args, factory, kwargs):
+        instructions: Instructions = builder.instructions
+        kwargs, metadata = _prepare(args, instructions, kwargs)
+        action: "AbstractAction" = factory.create("", **kwargs)
+        action.metadata = metadata
+        logger.debug("Streaming prompt to action: %s", args.action)
+        with profiling.span(f"action.{args.action}"):
+            action.stream(instructions.iter_prompt(**kwargs))
+        return
+
+    prompt, kwargs, metadata = render(args, builder, kwargs)
+    action = factory.create(prompt, **kwargs)
+    action.metadata = metadata
     logger.debug("Executing action: %s", args.action)
-    action()
+    with profiling.span(f"action.{args.action}"):
+        action()
+
+
+def render(
+    args: argparse.Namespace, builder: "PromptBuilder", kwargs: dict[str, Any]
+) -> tuple[str, dict[str, str], dict[str, Any]]:
+    """Generate the prompt of the values of the instructions.
+
+    The layout, the prompt cache and the token budget of the options are
+    applied.
+
+    Args:
+        args: Parsed command-line arguments.
+        builder: The builder of the instructions.
+        kwargs: The values of the instructions, including the command.
+
+    Returns:
+        The prompt, the values as strings, and the metadata of the action.
+    """
+    instructions: Instructions = builder.instructions
+    kwargs, metadata = _prepare(args, instructions, kwargs)
+    cached: bool = getattr(args, "cache", False)
+    if cached and _sources.has_sources(kwargs):
+        logger.debug("Not caching a prompt with values from sources")
+        cached = False
+    budget: "Budget | None" = _budget(args)
+    if budget is not None:
+        logger.debug("Not caching a prompt with a token budget")
+        cached = False
+
+    values: dict[str, str] = {key: str(value) for key, value in kwargs.items()}
+    with profiling.span("make_prompt"):
+        if budget is not None:
+            prompt: str = _fit(instructions, budget, values, metadata)
+        elif cached:
+            from prompts._cache import PromptCache
+
+            prompt = PromptCache().make_prompt(instructions, **values)
+        else:
+            prompt = builder.render(**values)
+    logger.debug("Generated prompt: %s", prompt)
+    return prompt, values, metadata
+
+
+def _prepare(
+    args: argparse.Namespace, instructions: Instructions, kwargs: dict[str, Any]
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Apply the layout to the values and return the metadata of the action.
+
+    Args:
+        args: Parsed command-line arguments.
+        instructions: The instructions of the command.
+        kwargs: The values of the instructions, including the command.
+
+    Returns:
+        The values in the order of the layout, and the metadata.
+    """
+    if getattr(args, "layout", "given") == "stable":
+        kwargs = instructions.arrange(args.command, kwargs)
+    metadata: dict[str, Any] = {}
+    if getattr(args, "cache_breakpoints", False):
+        prefix: str = instructions.static_prefix(**kwargs)
+        metadata["cache_breakpoints"] = [len(prefix)] if prefix else []
+    return kwargs, metadata
+
+
+def _streamable(
+    args: argparse.Namespace, factory: "ActionFactory", kwargs: dict[str, Any]
+) -> bool:
+    """Return whether the prompt can be streamed to the action.
+
+    Only actions that override `AbstractAction.stream` are streamed to;
+    the default joins the chunks anyway. A prompt is rendered in full when
+    it is read from the prompt cache or fitted into a token budget.
+
+    Args:
+        args: Parsed command-line arguments.
+        factory: The factory of the action.
+        kwargs: The values of the instructions.
+    """
+    if not factory.streaming:
+        return False
+    if getattr(args, "max_tokens", 0) or getattr(args, "count_tokens", False):
+        return False
+    return not getattr(args, "cache", False) or _sources.has_sources(kwargs)
+
+
+def _budget(args: argparse.Namespace) -> "Budget | None":
+    """Return the token budget of the options, if tokens are counted.
+
+    Args:
+        args: Parsed command-line arguments.
+
+    Returns:
+        The budget, or None if neither `--max-tokens` nor `--count-tokens`
+        is given.
+    """
+    max_tokens: int = getattr(args, "max_tokens", 0)
+    if not max_tokens and not getattr(args, "count_tokens", False):
+        return None
+    from prompts._tokens import Budget
+
+    priority: list[str] = [x for x in args.priority.split(",") if x]
+    return Budget(max_tokens, args.overflow, priority, args.tokenizer)
+
+
+def _fit(
+    instructions: Instructions,
+    budget: "Budget",
+    kwargs: dict[str, str],
+    metadata: dict[str, Any],
+) -> str:
+    """Render a prompt that fits into a token budget.
+
+    The number of tokens of each instruction is added to the metadata, and
+    the cache breakpoint, if any, is moved to the end of the static prefix
+    that is left after fitting.
+
+    Args:
+        instructions: The instructions that render the prompt.
+        budget: The token budget.
+        kwargs: The values of the instructions, including the command.
+        metadata: The metadata of the action, which is updated.
+
+    Returns:
+        The prompt.
+
+    Raises:
+        TokenBudgetError: If the prompt does not fit.
+    """
+    from prompts import _tokens
+
+    fragments: list[_tokens.Fragment] = budget.fit(instructions, **kwargs)
+    metadata["tokens"] = [x.report() for x in fragments]
+    metadata["total_tokens"] = _tokens.count(fragments)
+    if "cache_breakpoints" in metadata:
+        command: str = kwargs["command"]
+        static: list[_tokens.Fragment] = []
+        for fragment in fragments:
+            if instructions.volatility(command, fragment.key) > 1:
+                break
+            static.append(fragment)
+        prefix: str = _tokens.join(static)
+        metadata["cache_breakpoints"] = [len(prefix)] if prefix else []
+    return _tokens.join(fragments)
@@ -1,4 +1,17 @@
-from os.path import abspath, dirname, join, normpath
+import os
+from os.path import abspath, dirname, expanduser, join, normpath
 
 root: str = normpath(abspath(join(dirname(__file__))))
 instructions: str = join(root, "_instructions")
+diff_instructions: str = join(root, "_diff_instructions")
+cache: str = join(
+    os.environ.get("XDG_CACHE_HOME") or expanduser(join("~", ".cache")),
+    "bartste-prompts",
+)
+state: str = os.environ.get("XDG_STATE_HOME") or expanduser(
+    join("~", ".local", "state")
+)
+jobs: str = os.environ.get("PROMPTS_JOBS") or join(state, "bartste-prompts.db")
+socket: str = os.environ.get("PROMPTS_SOCKET") or join(
+    os.environ.get("XDG_RUNTIME_DIR") or cache, "bartste-prompts.sock"
+)
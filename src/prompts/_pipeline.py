@@ -0,0 +1,251 @@
+"""Run several commands over the same files in one process.
+
+`prompts run docstrings,typehints,unittests --files src` is like running the
+three commands one after another, but the command line is parsed once, the
+instructions are scanned once and shared by all stages, and the globs and
+directories of `--files` are expanded once.
+
+The `aider`, `aider-code` and `aider-ask` actions are replaced by their
+session counterparts, see `AiderSession`, so all stages are sent to a single
+aider process, which is closed when the pipeline is done.
+
+The duration and the outcome of each stage are printed to stderr. A failed
+stage stops the pipeline, unless `--keep-going` is given.
+"""
+
+import argparse
+import sys
+import time
+from typing import TYPE_CHECKING
+
+from prompts import _parser, _sources, profiling
+from prompts._logger import logger
+from prompts.exceptions import PipelineError
+from prompts.instructions import Instructions
+
+if TYPE_CHECKING:
+    from prompts.builder import PromptBuilder
+
+# Actions that start an aider process per prompt, mapped to the action that
+# sends the prompts to a long-lived aider process instead.
+_SESSIONS: dict[str, str] = {
+    "aider": "aider-session",
+    "aider-code": "aider-session-code",
+    "aider-ask": "aider-session-ask",
+}
+
+
+class Stage:
+    """A command of a pipeline.
+
+    Attributes:
+        command: The command name.
+        duration: The duration of the stage in seconds.
+        error: The error of the stage, or None if it succeeded or did not
+            run.
+        done: Whether the stage ran.
+    """
+
+    command: str
+    duration: float
+    error: Exception | None
+    done: bool
+
+    def __init__(self, command: str) -> None:
+        """Initialize a stage that did not run yet.
+
+        Args:
+            command: The command name.
+        """
+        self.command = command
+        self.duration = 0.0
+        self.error = None
+        self.done = False
+
+    @property
+    def ok(self) -> bool:
+        """Whether the stage ran and succeeded."""
+        return self.done and self.error is None
+
+    @property
+    def status(self) -> str:
+        """The outcome of the stage: "ok", "failed" or "skipped"."""
+        if not self.done:
+            return "skipped"
+        return "ok" if self.error is None else "failed"
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of the `run` subcommand.
+
+    Args:
+        parser: The subcommand parser to add options to.
+    """
+    parser.add_argument(
+        "--keep-going",
+        action="store_true",
+        help="Run the remaining stages after a stage fails",
+    )
+
+
+def add_instruction_options(
+    parser: argparse.ArgumentParser, instructions: Instructions
+) -> None:
+    """Add the commands and the options of all commands.
+
+    Args:
+        parser: The subcommand parser to add options to.
+        instructions: The instructions used to find the commands and their
+            options.
+    """
+    commands: list[str] = sorted(instructions.list_commands())
+    parser.add_argument(
+        "commands",
+        type=lambda x: _split(x, commands),
+        help=f"Comma-separated commands to run in order: {', '.join(commands)}",
+    )
+    _parser.add_command_options(parser, instructions, *commands)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Run the stages of the pipeline and print their summary.
+
+    Args:
+        args: Parsed command-line arguments.
+
+    Raises:
+        PipelineError: If a stage failed.
+    """
+    _parser.setup_logging(args)
+    stages: list[Stage] = execute(args)
+    print(summary(stages), file=sys.stderr)
+    failed: list[str] = [x.command for x in stages if x.status == "failed"]
+    if failed:
+        raise PipelineError(f"Failed stages: {', '.join(failed)}")
+
+
+def execute(args: argparse.Namespace) -> list[Stage]:
+    """Run the commands of `args.commands` with the same values.
+
+    Args:
+        args: Parsed command-line arguments, with the values of the options
+            of all commands.
+
+    Returns:
+        The stages, in the order of the commands.
+    """
+    from prompts import _files, _sessions
+    from prompts.builder import PromptBuilder
+
+    builder = PromptBuilder(args.dir, preload=False, validate=False)
+    stages: list[Stage] = [Stage(x) for x in args.commands]
+    values: dict[str, object] = vars(args).copy()
+
+    # Sources like stdin can only be streamed once, so they are read upfront.
+    for value in values.values():
+        if isinstance(value, _sources.Source):
+            value.read()
+
+    # The stages must not expand the paths again: a path like app/[id].tsx
+    # would be taken as a glob.
+    expand: bool = True
+    files: object = values.get("files")
+    if isinstance(files, str) and files:
+        expanded: list[str] = _files.expand(files, _sessions.getcwd())
+        if expanded:
+            values["files"] = ",".join(expanded)
+            expand = False
+
+    session: str | None = _SESSIONS.get(args.action)
+    if session is not None:
+        logger.info("Using action '%s' for all stages", session)
+        values["action"] = session
+
+    try:
+        for stage in stages:
+            namespace = argparse.Namespace(**values)
+            _run_stage(stage, builder, namespace, expand)
+            if not stage.ok and not args.keep_going:
+                break
+    finally:
+        if session is not None:
+            _sessions.pool.close()
+    return stages
+
+
+def summary(stages: list[Stage]) -> str:
+    """Return a human-readable summary of the stages.
+
+    Args:
+        stages: The stages of the pipeline.
+
+    Returns:
+        One line per stage and a total.
+    """
+    width: int = max(len(x.command) for x in stages)
+    lines: list[str] = []
+    for stage in stages:
+        line: str = f"{stage.command:<{width}}  {stage.status:<7}"
+        if stage.done:
+            line += f"  {stage.duration:.2f}s"
+        if stage.error is not None:
+            line += f"  {type(stage.error).__name__}: {stage.error}"
+        lines.append(line)
+    succeeded: int = sum(x.ok for x in stages)
+    total: float = sum(x.duration for x in stages)
+    lines.append(
+        f"{succeeded} of {len(stages)} stages succeeded in {total:.2f}s"
+    )
+    return "\n".join(lines)
+
+
+def _run_stage(
+    stage: Stage,
+    builder: "PromptBuilder",
+    args: argparse.Namespace,
+    expand: bool = True,
+) -> None:
+    """Run a stage and record its duration and error.
+
+    Args:
+        stage: The stage.
+        builder: The builder that is shared by the stages.
+        args: The values of the options, without the command.
+        expand: Whether the stage expands `--files`, see `_parser.execute`.
+    """
+    args.command = stage.command
+    logger.info("Running stage '%s'", stage.command)
+    start: float = time.perf_counter()
+    try:
+        with profiling.span(f"stage.{stage.command}"):
+            _parser.execute(args, builder, expand)
+    except Exception as error:
+        logger.error("Stage '%s' failed: %s", stage.command, error)
+        stage.error = error
+    finally:
+        stage.duration = time.perf_counter() - start
+        stage.done = True
+
+
+def _split(value: str, commands: list[str]) -> list[str]:
+    """Parse the comma-separated commands of a pipeline.
+
+    Args:
+        value: The commands, e.g., "docstrings,typehints".
+        commands: The available commands.
+
+    Returns:
+        The commands, in the given order.
+
+    Raises:
+        argparse.ArgumentTypeError: If a command does not exist.
+    """
+    names: list[str] = [x.strip() for x in value.split(",") if x.strip()]
+    unknown: list[str] = [x for x in names if x not in commands]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown commands: {', '.join(unknown)}"
+        )
+    if not names:
+        raise argparse.ArgumentTypeError("no commands given")
+    return names
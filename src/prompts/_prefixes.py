@@ -0,0 +1,125 @@
+"""Report the static prompt prefix of each command.
+
+Providers and local KV caches only reuse the exact prefix that prompts have
+in common. With `--layout stable`, a prompt starts with the static text of
+its command, followed by the instructions that are selected by their value,
+like `filetype/python.md`. This report shows how long that prefix is for
+each command, and for each selectable value, which is the part of the
+prompt that can be served from a cache.
+
+The number of tokens is estimated as one token per four characters.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any
+
+from prompts import _parser, _tokens
+from prompts._logger import logger
+from prompts.instructions import Instructions
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of the `prefix-report` subcommand.
+
+    Args:
+        parser: The subcommand parser to add options to.
+    """
+    parser.add_argument(
+        "commands",
+        nargs="*",
+        help="Commands to report on; all commands if omitted",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Write the report as JSONL instead of a table",
+    )
+    _parser.add_logging_options(parser)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Write the prefix report of the commands.
+
+    Args:
+        args: Parsed command-line arguments.
+    """
+    _parser.setup_logging(args)
+    instructions = Instructions(args.dir)
+    commands: list[str] = args.commands or sorted(instructions.list_commands())
+    rows: list[dict[str, Any]] = [
+        row for command in commands for row in report(instructions, command)
+    ]
+    if args.json:
+        for row in rows:
+            sys.stdout.write(json.dumps(row) + "\n")
+        return
+
+    width: int = max([len("prefix"), *(len(_label(x)) for x in rows)])
+    sys.stdout.write(f"{'prefix':<{width}}  {'chars':>7}  {'tokens':>7}\n")
+    for row in rows:
+        label: str = _label(row)
+        sys.stdout.write(
+            f"{label:<{width}}  {row['chars']:>7}  {row['tokens']:>7}\n"
+        )
+
+
+def report(instructions: Instructions, command: str) -> list[dict[str, Any]]:
+    """Return the static prefixes of a command.
+
+    The first row is the prefix of the command alone. Then, a row follows
+    for each value of the instructions that select a file, e.g., each
+    `filetype`, and for each instruction without placeholders.
+
+    Args:
+        instructions: The instructions.
+        command: The command name.
+
+    Returns:
+        The rows, with the command, the instruction key and value, and the
+        number of characters and estimated tokens of the prefix.
+    """
+    rows: list[dict[str, Any]] = [_row(instructions, command)]
+    for key in sorted(instructions.list(command) - {"command"}):
+        if instructions.volatility(command, key) > 1:
+            continue
+        values: set[str] = instructions.values(command, key)
+        if not values:
+            rows.append(_row(instructions, command, key, key))
+        for value in sorted(values):
+            rows.append(_row(instructions, command, key, value))
+    logger.debug("Prefix report of '%s': %s", command, rows)
+    return rows
+
+
+def _row(
+    instructions: Instructions, command: str, key: str = "", value: str = ""
+) -> dict[str, Any]:
+    """Return the row of the prefix for a value of an instruction.
+
+    Args:
+        instructions: The instructions.
+        command: The command name.
+        key: The instruction key, or "" for the command alone.
+        value: The value of the instruction.
+
+    Returns:
+        The row, see `report`.
+    """
+    kwargs: dict[str, str] = {key: value} if key else {}
+    prefix: str = instructions.static_prefix(command, **kwargs)
+    return dict(
+        command=command,
+        key=key,
+        value=value,
+        chars=len(prefix),
+        tokens=_tokens.estimate(prefix),
+    )
+
+
+def _label(row: dict[str, Any]) -> str:
+    """Return the label of a row in the table, e.g., "fix filetype=python"."""
+    if not row["key"]:
+        return row["command"]
+    return f"{row['command']} {row['key']}={row['value']}"
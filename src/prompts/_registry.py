@@ -0,0 +1,178 @@
+"""Registry of the actions that can be selected with `--action`.
+
+Actions are registered by name with a reference of the form
+`module:attribute`, which is only imported when the action is used, so
+listing or validating names never imports an action, and an action with a
+heavy client does not slow down the others.
+
+Besides the builtin actions, other packages can provide actions through the
+`bartste_prompts.actions` entry point group, e.g., in their
+`pyproject.toml`:
+
+```toml
+[project.entry-points."bartste_prompts.actions"]
+shout = "my_package.actions:Shout"
+```
+
+The object must be callable as `(prompt, command, **kwargs)` and return an
+`AbstractAction`, e.g., a subclass of it. The entry points, and
+`importlib.metadata`, are only loaded when a name is not a builtin action,
+or when all names are listed.
+"""
+
+import importlib
+import threading
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+from prompts._logger import logger
+
+if TYPE_CHECKING:
+    from prompts.actions import AbstractAction
+
+GROUP: str = "bartste_prompts.actions"
+
+# The builtin actions, mapped to their `module:attribute` reference.
+_BUILTINS: dict[str, str] = {
+    "print": "prompts.actions:Print",
+    "json": "prompts.actions:Json",
+    "aider": "prompts.actions:Aider",
+    "aider-code": "prompts.actions:Aider.code",
+    "aider-ask": "prompts.actions:Aider.ask",
+    "aider-commit": "prompts.actions:Aider.commit",
+    "aider-session": "prompts.actions:AiderSession",
+    "aider-session-code": "prompts.actions:AiderSession.code",
+    "aider-session-ask": "prompts.actions:AiderSession.ask",
+    "openai": "prompts.actions:OpenAI",
+}
+
+Factory = Callable[..., "AbstractAction"]
+
+
+class Registry:
+    """Mapping of action names to their factories, see the module docstring.
+
+    The registry is built once per process and is safe to use from multiple
+    threads.
+    """
+
+    _references: dict[str, str]
+    _factories: dict[str, Factory]
+    _discovered: bool
+    _lock: threading.Lock
+
+    def __init__(self, builtins: dict[str, str] = _BUILTINS) -> None:
+        """Initialize the registry with the builtin actions.
+
+        Args:
+            builtins: The builtin actions, mapped to their `module:attribute`
+                reference.
+        """
+        self._references = dict(builtins)
+        self._factories = {}
+        self._discovered = False
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: object) -> bool:
+        """Return True if an action named `name` is registered."""
+        if name in self._references or name in self._factories:
+            return True
+        self._discover()
+        return name in self._references
+
+    def names(self) -> list[str]:
+        """Return the names of all actions, including those of plugins."""
+        self._discover()
+        return list(dict.fromkeys([*self._references, *self._factories]))
+
+    def register(self, name: str, target: str | Factory) -> None:
+        """Register an action.
+
+        Args:
+            name: The name of the action.
+            target: The factory of the action, or its `module:attribute`
+                reference, which is imported when the action is used.
+        """
+        with self._lock:
+            self._factories.pop(name, None)
+            if isinstance(target, str):
+                self._references[name] = target
+            else:
+                self._references.pop(name, None)
+                self._factories[name] = target
+
+    def load(self, name: str) -> Factory:
+        """Return the factory of an action, importing its module if needed.
+
+        Args:
+            name: The name of the action.
+
+        Returns:
+            The factory, which creates the action from the prompt, the
+            command and the values of the instructions.
+
+        Raises:
+            ValueError: If no action is named `name`, or if its module cannot
+                be imported.
+        """
+        factory: Factory | None = self._factories.get(name)
+        if factory is not None:
+            return factory
+        if name not in self:
+            raise ValueError(f"No tool available named '{name}'")
+
+        reference: str = self._references[name]
+        logger.debug("Loading action '%s' from '%s'", name, reference)
+        try:
+            factory = resolve(reference)
+        except (ImportError, AttributeError) as error:
+            raise ValueError(
+                f"Could not load action '{name}' from '{reference}': {error}"
+            ) from error
+        with self._lock:
+            self._factories[name] = factory
+        return factory
+
+    def _discover(self) -> None:
+        """Add the actions of the entry point group, once.
+
+        Plugins do not replace builtin actions.
+        """
+        if self._discovered:
+            return
+        from importlib.metadata import entry_points
+
+        with self._lock:
+            if self._discovered:
+                return
+            for entry in entry_points(group=GROUP):
+                if entry.name in _BUILTINS:
+                    if entry.value != _BUILTINS[entry.name]:
+                        logger.warning(
+                            "Action '%s' is shadowed by a builtin", entry.name
+                        )
+                    continue
+                self._references.setdefault(entry.name, entry.value)
+            self._discovered = True
+
+
+def resolve(reference: str) -> Any:
+    """Import the object of a `module:attribute` reference.
+
+    Args:
+        reference: The reference, where the attribute may be dotted, e.g.,
+            "prompts.actions:Aider.code".
+
+    Returns:
+        The object.
+    """
+    module, _, attributes = reference.partition(":")
+    target: Any = importlib.import_module(module.strip())
+    for attribute in attributes.strip().split("."):
+        if attribute:
+            target = getattr(target, attribute)
+    return target
+
+
+# Registry that is shared by the whole process.
+registry = Registry()
@@ -0,0 +1,343 @@
+"""Server that keeps the prompt generation warm behind a Unix socket.
+
+The protocol is line based. The client sends a single JSON object with its
+command-line arguments and working directory:
+
+```json
+{"argv": ["fix", "--files", "main.py"], "cwd": "/home/user/project"}
+```
+
+The server answers with a stream of JSON objects, one per line, that contain
+either output for the client (`{"stdout": "..."}` or `{"stderr": "..."}`),
+the final exit status (`{"exit": 0}`), or a request to run the command
+locally instead (`{"fallback": true}`). The latter is used for commands and
+actions whose output cannot be sent back over the socket.
+"""
+
+import argparse
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, suppress
+from os.path import dirname, join
+from typing import TYPE_CHECKING, Any, TextIO, override
+
+from prompts import _index, _parser, _paths, _sessions, _sources
+from prompts._logger import logger
+
+if TYPE_CHECKING:
+    from prompts._bundle import Bundle
+    from prompts._index import Index, Overlay
+
+# Actions that write their result to stdout, which is sent to the client.
+ACTIONS: set[str] = {
+    "print",
+    "json",
+    "openai",
+    "aider-session",
+    "aider-session-code",
+    "aider-session-ask",
+}
+
+Send = Callable[[dict[str, Any]], None]
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of the `serve` subcommand.
+
+    Args:
+        parser: The subcommand parser to add options to.
+    """
+    parser.add_argument(
+        "--socket",
+        default=_paths.socket,
+        help="Path of the Unix socket to listen on",
+    )
+    _parser.add_logging_options(parser)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Run the server until it is interrupted or terminated.
+
+    Args:
+        args: Parsed command-line arguments.
+    """
+    _parser.setup_logging(args)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with Server(args.socket) as server:
+        logger.info("Serving prompts on '%s'", args.socket)
+        with suppress(KeyboardInterrupt):
+            server.serve_forever()
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    """Threaded Unix socket server that generates prompts.
+
+    A parser is built once per instructions directory and is reused as long
+    as the index of that directory is valid. Output that is written to
+    stdout and stderr while handling a request is sent to the client of that
+    request.
+
+    Attributes:
+        path: The path of the Unix socket.
+    """
+
+    daemon_threads = True
+    path: str
+    _parsers: dict[
+        str, tuple["Index | Bundle | Overlay", argparse.ArgumentParser]
+    ]
+    _lock: threading.Lock
+
+    def __init__(self, path: str) -> None:
+        """Bind the server to `path`.
+
+        A socket file that is left behind by a server that is not running
+        anymore is removed first.
+
+        Args:
+            path: The path of the Unix socket.
+
+        Raises:
+            OSError: If another server is listening on `path`.
+        """
+        self.path = path
+        self._parsers = {}
+        self._lock = threading.Lock()
+        _remove_stale_socket(path)
+        os.makedirs(dirname(path) or ".", exist_ok=True)
+        super().__init__(path, _Handler)
+        _Output.install()
+
+    @override
+    def server_close(self) -> None:
+        """Close the server, its aider sessions and remove its socket file."""
+        super().server_close()
+        _sessions.pool.close()
+        _Output.uninstall()
+        with suppress(FileNotFoundError):
+            os.remove(self.path)
+
+    def respond(self, request: dict[str, Any], send: Send) -> None:
+        """Handle a single request.
+
+        Args:
+            request: The decoded request of the client.
+            send: Callable that sends a message to the client.
+        """
+        argv: list[str] = request.get("argv", [])
+        cwd: str = request.get("cwd", os.getcwd())
+        directory: str = os.pathsep.join(
+            join(cwd, x)
+            for x in _parser._preparse_directory(argv).split(os.pathsep)
+        )
+        parser: argparse.ArgumentParser = self.parser(directory)
+        with _Output.redirect(send):
+            status: int | None = self._execute(parser, argv, directory, cwd)
+        send(dict(fallback=True) if status is None else dict(exit=status))
+
+    def _execute(
+        self,
+        parser: argparse.ArgumentParser,
+        argv: list[str],
+        directory: str,
+        cwd: str,
+    ) -> int | None:
+        """Parse the arguments and execute the command.
+
+        Args:
+            parser: The parser for the instructions directory.
+            argv: The command-line arguments of the client.
+            directory: The absolute instructions directory.
+            cwd: The working directory of the client.
+
+        Returns:
+            The exit status, or None if the client has to run the command
+            itself.
+        """
+        try:
+            args = parser.parse_args(argv)
+        except SystemExit as error:
+            return _exit_status(error)
+
+        if getattr(args, "func", None) is not _parser._func:
+            return None
+        if args.action not in ACTIONS:
+            return None
+        if _sources.has_sources(vars(args)):
+            # Sources refer to the stdin, files or descriptors of the client.
+            return None
+
+        args.dir = directory
+        try:
+            with _sessions.workdir(cwd):
+                _parser.execute(args)
+        except Exception as error:
+            logger.exception("Request failed: %s", argv)
+            print(f"{parser.prog}: error: {error}", file=sys.stderr)
+            return 1
+        return 0
+
+    def parser(self, directory: str) -> argparse.ArgumentParser:
+        """Return a fully configured parser for an instructions directory.
+
+        Args:
+            directory: The absolute instructions directory.
+
+        Returns:
+            The parser, which is rebuilt when the directory changed.
+        """
+        with self._lock:
+            index: "Index | Bundle | Overlay" = _index.load(directory)
+            cached = self._parsers.get(directory)
+            if cached is None or cached[0] is not index:
+                logger.info("Building parser for '%s'", directory)
+                parser = _parser.setup(argv=["--dir", directory])
+                parser.prog = "prompts"
+                cached = self._parsers[directory] = (index, parser)
+            return cached[1]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Handle a connection from a client."""
+
+    server: Server
+
+    @override
+    def handle(self) -> None:
+        """Read the request and stream the response to the client."""
+        try:
+            request: dict[str, Any] = json.loads(self.rfile.readline())
+        except ValueError:
+            logger.error("Received an invalid request")
+            return
+
+        with suppress(BrokenPipeError):
+            self.server.respond(request, self._send)
+
+    def _send(self, message: dict[str, Any]) -> None:
+        """Send a message to the client.
+
+        Args:
+            message: The message, which is encoded as a JSON line.
+        """
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+        self.wfile.flush()
+
+
+class _Output(io.TextIOBase):
+    """Stream that replaces stdout or stderr while the server runs.
+
+    Writes from a thread that handles a request are sent to the client of
+    that request. Writes from any other thread are passed on to the
+    original stream.
+    """
+
+    _local = threading.local()
+    _name: str
+    _stream: TextIO
+
+    def __init__(self, name: str, stream: TextIO) -> None:
+        """Initialize the stream.
+
+        Args:
+            name: Either "stdout" or "stderr".
+            stream: The original stream.
+        """
+        super().__init__()
+        self._name = name
+        self._stream = stream
+
+    @override
+    def write(self, text: str) -> int:
+        """Write `text` to the client of this thread or the original stream.
+
+        Args:
+            text: The text to write.
+
+        Returns:
+            The number of characters written.
+        """
+        send: Send | None = getattr(self._local, "send", None)
+        if send is None:
+            return self._stream.write(text)
+        if text:
+            send({self._name: text})
+        return len(text)
+
+    @override
+    def flush(self) -> None:
+        """Flush the original stream."""
+        self._stream.flush()
+
+    @classmethod
+    def install(cls) -> None:
+        """Replace stdout and stderr, if this was not done before."""
+        if not isinstance(sys.stdout, cls):
+            sys.stdout = cls("stdout", sys.stdout)
+        if not isinstance(sys.stderr, cls):
+            sys.stderr = cls("stderr", sys.stderr)
+
+    @classmethod
+    def uninstall(cls) -> None:
+        """Restore the original stdout and stderr."""
+        if isinstance(sys.stdout, cls):
+            sys.stdout = sys.stdout._stream
+        if isinstance(sys.stderr, cls):
+            sys.stderr = sys.stderr._stream
+
+    @classmethod
+    @contextmanager
+    def redirect(cls, send: Send) -> Iterator[None]:
+        """Send the output of the current thread to a client.
+
+        Args:
+            send: Callable that sends a message to the client.
+        """
+        cls._local.send = send
+        try:
+            yield
+        finally:
+            cls._local.send = None
+
+
+def _exit_status(error: SystemExit) -> int:
+    """Return the exit status that corresponds to a SystemExit.
+
+    Args:
+        error: The raised SystemExit.
+    """
+    if error.code is None:
+        return 0
+    if isinstance(error.code, int):
+        return error.code
+    print(error.code, file=sys.stderr)
+    return 1
+
+
+def _remove_stale_socket(path: str) -> None:
+    """Remove the socket file at `path` if no server is listening on it.
+
+    Args:
+        path: The path of the Unix socket.
+
+    Raises:
+        OSError: If a server is listening on `path`.
+    """
+    if not os.path.exists(path):
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except OSError:
+            logger.info("Removing stale socket '%s'", path)
+            os.remove(path)
+            return
+    raise OSError(f"A server is already listening on '{path}'")
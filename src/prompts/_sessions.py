@@ -0,0 +1,455 @@
+"""Pool of long-lived aider processes.
+
+Starting aider is slow: it builds a repository map and connects to the
+model before it handles the first message. A `Session` keeps an interactive
+aider process running and sends messages to it over stdin, so successive
+prompts for the same working tree skip the startup. Sessions are kept in a
+`Pool`, which evicts sessions that are idle for too long and replaces
+sessions whose process died.
+
+The pool only outlives a single prompt in a long-running process, like
+`prompts serve`. It is configured with environment variables, which are read
+when the pool is first used:
+
+- `PROMPTS_AIDER_IDLE`: seconds after which an idle session is closed
+  (default: 600).
+- `PROMPTS_AIDER_TIMEOUT`: seconds to wait for aider to be ready for the
+  next message before the session is closed (default: 1800).
+"""
+
+import codecs
+import os
+import re
+import select
+import subprocess
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import IO
+
+from prompts._logger import logger
+
+# Aider is ready for the next message when it prints its input prompt, e.g.
+# "> " or "ask> ", at the start of a line.
+READY: re.Pattern[str] = re.compile(r"^[\w-]*> $")
+
+# Tag that delimits multi-line messages, see aider's `{tag ... tag}` syntax.
+_TAG: str = "prompts"
+
+_local = threading.local()
+
+Sink = Callable[[str], object]
+
+
+class SessionError(Exception):
+    """Raised when an aider session is not usable anymore.
+
+    Attributes:
+        returncode: The return code of aider if it exited, otherwise None.
+    """
+
+    returncode: int | None
+
+    def __init__(self, message: str, returncode: int | None = None) -> None:
+        """Initialize the error.
+
+        Args:
+            message: The error message.
+            returncode: The return code of aider, if it exited.
+        """
+        super().__init__(message)
+        self.returncode = returncode
+
+
+class Session:
+    """An interactive aider process for a working tree.
+
+    Attributes:
+        tree: The working tree in which aider runs.
+        files: The files that were added to the chat.
+        last_used: The `time.monotonic` timestamp of the last message.
+        timeout: Seconds to wait for aider to be ready, or None to wait
+            without a deadline.
+    """
+
+    tree: str
+    files: set[str]
+    last_used: float
+    timeout: float | None
+    _process: subprocess.Popen[bytes]
+    _stdin: IO[bytes]
+    _stdout: IO[bytes]
+    _fd: int
+    _decoder: codecs.IncrementalDecoder
+
+    def __init__(
+        self,
+        tree: str,
+        executable: str = "aider",
+        timeout: float | None = None,
+    ) -> None:
+        """Start aider and wait until it is ready.
+
+        Args:
+            tree: The working tree in which aider runs.
+            executable: The aider executable.
+            timeout: Seconds to wait for aider to be ready, or None to wait
+                without a deadline.
+
+        Raises:
+            SessionError: If aider exits or times out before it is ready.
+        """
+        self.tree = tree
+        self.files = set()
+        self.timeout = timeout
+        cmd: list[str] = [
+            executable,
+            "--yes-always",
+            "--no-check-update",
+            "--no-suggest-shell-commands",
+            "--no-pretty",
+            "--no-fancy-input",
+        ]
+        logger.info("Starting aider session in '%s'", tree)
+        self._process = subprocess.Popen(
+            cmd,
+            cwd=tree,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        assert self._process.stdin and self._process.stdout
+        self._stdin = self._process.stdin
+        self._stdout = self._process.stdout
+        self._fd = self._stdout.fileno()
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        try:
+            self._read_until_ready(logger.debug)
+        except SessionError:
+            self.close(timeout=0)
+            raise
+        self.last_used = time.monotonic()
+
+    @property
+    def pid(self) -> int:
+        """The process id of aider."""
+        return self._process.pid
+
+    def is_alive(self) -> bool:
+        """Return True if the aider process is still running."""
+        return self._process.poll() is None
+
+    def add(self, files: list[str], sink: Sink) -> None:
+        """Add files to the chat that were not added before.
+
+        Paths with whitespace are quoted, like aider expects them.
+
+        Args:
+            files: The files to add.
+            sink: Callable that receives the output of aider, line by line.
+        """
+        new: list[str] = [x for x in files if x not in self.files]
+        if new:
+            self._write(f"/add {' '.join(_quote(x) for x in new)}\n")
+            self._read_until_ready(sink)
+            self.files.update(new)
+
+    def send(self, message: str, sink: Sink) -> None:
+        """Send a message to aider and stream its response.
+
+        Args:
+            message: The message, which may span multiple lines.
+            sink: Callable that receives the output of aider, line by line.
+
+        Raises:
+            SessionError: If aider exits before it is ready again.
+        """
+        self._write(f"{{{_TAG}\n{message}\n{_TAG}}}\n")
+        self._read_until_ready(sink)
+        self.last_used = time.monotonic()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the aider process.
+
+        Args:
+            timeout: Seconds to wait for aider to exit before it is killed.
+        """
+        logger.info("Closing aider session %s in '%s'", self.pid, self.tree)
+        try:
+            self._stdin.close()
+        except OSError:
+            pass
+        try:
+            self._process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self._stdout.close()
+
+    def _write(self, text: str) -> None:
+        """Write `text` to the stdin of aider.
+
+        Raises:
+            SessionError: If aider does not accept input anymore.
+        """
+        try:
+            self._stdin.write(text.encode())
+            self._stdin.flush()
+        except OSError as error:
+            raise SessionError(f"Aider session {self.pid} closed") from error
+
+    def _read_until_ready(self, sink: Sink) -> None:
+        """Pass the output of aider to `sink` until it waits for input.
+
+        Args:
+            sink: Callable that receives the output of aider, line by line.
+
+        Raises:
+            SessionError: If aider exits before it is ready, or is not ready
+                within `timeout` seconds.
+        """
+        deadline: float | None = (
+            None if self.timeout is None else time.monotonic() + self.timeout
+        )
+        buffer: str = ""
+        while True:
+            self._wait_readable(deadline)
+            chunk: bytes = os.read(self._fd, 65536)
+            if not chunk:
+                self._process.wait()
+                raise SessionError(
+                    f"Aider session {self.pid} exited with return code "
+                    f"{self._process.returncode}",
+                    self._process.returncode,
+                )
+            buffer += self._decoder.decode(chunk)
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                sink(f"{line}\n")
+            if READY.match(buffer):
+                return
+
+    def _wait_readable(self, deadline: float | None) -> None:
+        """Wait until the output of aider can be read.
+
+        Args:
+            deadline: The `time.monotonic` timestamp to wait until, or None to
+                wait without a deadline.
+
+        Raises:
+            SessionError: If no output is available before the deadline.
+        """
+        if deadline is None:
+            return
+        remaining: float = max(deadline - time.monotonic(), 0.0)
+        readable, _, _ = select.select([self._fd], [], [], remaining)
+        if not readable:
+            raise SessionError(
+                f"Aider session {self.pid} was not ready within "
+                f"{self.timeout} seconds"
+            )
+
+
+class Pool:
+    """Pool of idle aider sessions per working tree.
+
+    A session is taken from the pool while it handles a message, so a session
+    is never used by two callers at the same time. When no idle session is
+    available for a working tree, a new one is started.
+
+    Attributes:
+        size: Maximum number of idle sessions that are kept per working tree.
+        executable: The aider executable.
+    """
+
+    size: int
+    executable: str
+    _max_idle: float | None
+    _timeout: float | None
+    _idle: dict[str, list[Session]]
+    _lock: threading.Lock
+    _reaper: threading.Thread | None
+
+    def __init__(
+        self,
+        max_idle: float | None = None,
+        size: int = 2,
+        executable: str = "aider",
+        timeout: float | None = None,
+    ) -> None:
+        """Initialize an empty pool.
+
+        Args:
+            max_idle: Seconds after which an idle session is closed. Defaults
+                to `PROMPTS_AIDER_IDLE`.
+            size: Maximum number of idle sessions per working tree.
+            executable: The aider executable.
+            timeout: Seconds to wait for a session to be ready. Defaults to
+                `PROMPTS_AIDER_TIMEOUT`.
+        """
+        self._max_idle = max_idle
+        self._timeout = timeout
+        self.size = size
+        self.executable = executable
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    @property
+    def max_idle(self) -> float:
+        """Seconds after which an idle session is closed."""
+        if self._max_idle is None:
+            self._max_idle = _getenv_seconds("PROMPTS_AIDER_IDLE", 600.0)
+        return self._max_idle
+
+    @property
+    def timeout(self) -> float:
+        """Seconds to wait for a session to be ready."""
+        if self._timeout is None:
+            self._timeout = _getenv_seconds("PROMPTS_AIDER_TIMEOUT", 1800.0)
+        return self._timeout
+
+    @contextmanager
+    def session(self, tree: str) -> Iterator[Session]:
+        """Borrow a healthy session for `tree`.
+
+        The session is returned to the pool afterwards, unless an error
+        occurred, in which case it is closed.
+
+        Args:
+            tree: The working tree.
+
+        Yields:
+            The session.
+        """
+        session: Session = self._acquire(os.path.abspath(tree))
+        try:
+            yield session
+        except BaseException:
+            session.close()
+            raise
+        self._release(session)
+
+    def evict_idle(self) -> int:
+        """Close sessions that are idle for longer than `max_idle`.
+
+        Returns:
+            The number of closed sessions.
+        """
+        deadline: float = time.monotonic() - self.max_idle
+        expired: list[Session] = []
+        with self._lock:
+            for tree, sessions in list(self._idle.items()):
+                for session in sessions:
+                    if session.last_used < deadline or not session.is_alive():
+                        expired.append(session)
+                sessions[:] = [x for x in sessions if x not in expired]
+                if not sessions:
+                    del self._idle[tree]
+        for session in expired:
+            session.close()
+        return len(expired)
+
+    def close(self) -> None:
+        """Close all idle sessions."""
+        with self._lock:
+            sessions = [x for xs in self._idle.values() for x in xs]
+            self._idle.clear()
+        for session in sessions:
+            session.close()
+
+    def _acquire(self, tree: str) -> Session:
+        """Take a healthy idle session for `tree` or start a new one."""
+        self._start_reaper()
+        while True:
+            with self._lock:
+                idle: list[Session] = self._idle.get(tree, [])
+                session: Session | None = idle.pop() if idle else None
+            if session is None:
+                return Session(tree, self.executable, self.timeout)
+            if session.is_alive():
+                logger.debug("Reusing aider session %s", session.pid)
+                return session
+            logger.info("Aider session %s died", session.pid)
+            session.close()
+
+    def _release(self, session: Session) -> None:
+        """Return a session to the pool, or close it if the pool is full."""
+        with self._lock:
+            idle: list[Session] = self._idle.setdefault(session.tree, [])
+            if session.is_alive() and len(idle) < self.size:
+                idle.append(session)
+                return
+        session.close()
+
+    def _start_reaper(self) -> None:
+        """Start a daemon thread that evicts idle sessions periodically."""
+        with self._lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap, daemon=True)
+            self._reaper.start()
+
+    def _reap(self) -> None:
+        """Evict idle sessions until the process exits."""
+        while True:
+            time.sleep(max(self.max_idle / 2, 1.0))
+            self.evict_idle()
+
+
+@contextmanager
+def workdir(path: str) -> Iterator[None]:
+    """Use `path` as working tree for sessions started by this thread.
+
+    This is used by `prompts serve`, which handles requests from clients in
+    other working directories.
+
+    Args:
+        path: The working tree.
+    """
+    previous: str | None = getattr(_local, "workdir", None)
+    _local.workdir = path
+    try:
+        yield
+    finally:
+        _local.workdir = previous
+
+
+def getcwd() -> str:
+    """Return the working tree of this thread, see `workdir`."""
+    return getattr(_local, "workdir", None) or os.getcwd()
+
+
+def _quote(path: str) -> str:
+    """Quote `path` for an aider command if it contains whitespace."""
+    return f'"{path}"' if re.search(r"\s", path) else path
+
+
+def _getenv_seconds(name: str, default: float) -> float:
+    """Return a number of seconds from an environment variable.
+
+    Args:
+        name: The name of the environment variable.
+        default: The value if the variable is not set, empty or malformed.
+
+    Returns:
+        The value of the environment variable.
+    """
+    value: str = os.environ.get(name, "")
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(
+            "Ignoring %s='%s', which is not a number; using %s",
+            name,
+            value,
+            default,
+        )
+        return default
+
+
+# Pool that is shared by the AiderSession actions of this process.
+pool = Pool()
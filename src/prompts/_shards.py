@@ -0,0 +1,212 @@
+"""Split the files of a tool invocation into shards that run concurrently.
+
+The aider actions use this when `PROMPTS_AIDER_SHARD_SIZE` is set to a
+positive number, see `prompts.actions.Aider`:
+
+- `PROMPTS_AIDER_SHARD_SIZE`: maximum number of files per shard.
+- `PROMPTS_AIDER_WORKERS`: number of shards that run at the same time
+  (default: 4).
+- `PROMPTS_AIDER_RETRIES`: number of times a failing shard is retried
+  (default: 0).
+
+The shards run in a thread pool, or concurrently on the event loop for the
+async actions. The output of each shard is prefixed with its name, and
+`summary` lists the result and the files of each shard.
+"""
+
+import threading
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TextIO
+
+from prompts._logger import logger
+
+_lock = threading.Lock()
+
+
+class Shard:
+    """A group of files that is processed by a single tool invocation.
+
+    Attributes:
+        index: The 1-based index of the shard.
+        total: The total number of shards.
+        files: The files of the shard.
+        returncode: The return code of the last attempt, or None if the shard
+            did not run yet.
+        attempts: The number of times the shard was run.
+    """
+
+    index: int
+    total: int
+    files: list[str]
+    returncode: int | None
+    attempts: int
+
+    def __init__(self, index: int, total: int, files: list[str]) -> None:
+        """Initialize a shard that did not run yet.
+
+        Args:
+            index: The 1-based index of the shard.
+            total: The total number of shards.
+            files: The files of the shard.
+        """
+        self.index = index
+        self.total = total
+        self.files = files
+        self.returncode = None
+        self.attempts = 0
+
+    @property
+    def name(self) -> str:
+        """The name of the shard, e.g., "shard 2/5"."""
+        return f"shard {self.index}/{self.total}"
+
+    @property
+    def ok(self) -> bool:
+        """Whether the last attempt succeeded."""
+        return self.returncode == 0
+
+
+def split(files: list[str], size: int) -> list[Shard]:
+    """Split `files` into shards of at most `size` files.
+
+    Args:
+        files: The files to split.
+        size: The maximum number of files per shard.
+
+    Returns:
+        The shards, in the order of `files`.
+    """
+    groups = [files[i : i + size] for i in range(0, len(files), size)]
+    return [Shard(i, len(groups), group) for i, group in enumerate(groups, 1)]
+
+
+def run(
+    shards: list[Shard],
+    func: Callable[[Shard], int],
+    workers: int = 1,
+    retries: int = 0,
+) -> list[Shard]:
+    """Run `func` for each shard concurrently and collect the return codes.
+
+    A failing shard does not stop the other shards. It is run again, up to
+    `retries` times, after which its last return code is kept. Exceptions
+    raised by `func` are logged and count as a failure.
+
+    Args:
+        shards: The shards to run.
+        func: Callable that processes a shard and returns its return code.
+        workers: The maximum number of shards that run at the same time.
+        retries: The number of times a failing shard is run again.
+
+    Returns:
+        The shards, with their return codes and attempts updated.
+    """
+
+    def attempt(shard: Shard) -> None:
+        while shard.attempts <= retries:
+            shard.attempts += 1
+            try:
+                shard.returncode = func(shard)
+            except Exception:
+                logger.exception("Failed to run %s", shard.name)
+                shard.returncode = -1
+            if _done(shard):
+                return
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        list(pool.map(attempt, shards))
+    return shards
+
+
+async def arun(
+    shards: list[Shard],
+    func: Callable[[Shard], Awaitable[int]],
+    workers: int = 1,
+    retries: int = 0,
+) -> list[Shard]:
+    """Run the coroutine `func` for each shard concurrently, see `run`.
+
+    Args:
+        shards: The shards to run.
+        func: Coroutine function that processes a shard and returns its
+            return code.
+        workers: The maximum number of shards that run at the same time.
+        retries: The number of times a failing shard is run again.
+
+    Returns:
+        The shards, with their return codes and attempts updated.
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max(workers, 1))
+
+    async def attempt(shard: Shard) -> None:
+        async with semaphore:
+            while shard.attempts <= retries:
+                shard.attempts += 1
+                try:
+                    shard.returncode = await func(shard)
+                except Exception:
+                    logger.exception("Failed to run %s", shard.name)
+                    shard.returncode = -1
+                if _done(shard):
+                    return
+
+    await asyncio.gather(*(attempt(shard) for shard in shards))
+    return shards
+
+
+def _done(shard: Shard) -> bool:
+    """Return True if a shard succeeded, otherwise log its failure."""
+    if shard.ok:
+        return True
+    logger.warning(
+        "%s failed with return code %s (attempt %s)",
+        shard.name,
+        shard.returncode,
+        shard.attempts,
+    )
+    return False
+
+
+def summary(shards: list[Shard]) -> str:
+    """Return a human-readable summary of the shard results.
+
+    Args:
+        shards: The shards that ran.
+
+    Returns:
+        One line per shard and a total.
+    """
+    failed: int = sum(not shard.ok for shard in shards)
+    lines: list[str] = [
+        f"{shard.name}: {'ok' if shard.ok else 'failed'} "
+        f"(return code {shard.returncode}, attempts {shard.attempts}, "
+        f"files {','.join(shard.files)})"
+        for shard in shards
+    ]
+    lines.append(f"{len(shards) - failed} of {len(shards)} shards succeeded")
+    return "\n".join(lines)
+
+
+def prefixed(stream: TextIO, prefix: str) -> Callable[[str], None]:
+    """Return a sink that writes lines to `stream` with a prefix.
+
+    Writes of all sinks are serialized, so lines of concurrent shards are
+    never interleaved.
+
+    Args:
+        stream: The stream to write to.
+        prefix: The prefix of each line.
+
+    Returns:
+        Callable that writes a line.
+    """
+
+    def write(line: str) -> None:
+        with _lock:
+            stream.write(f"{prefix}{line}")
+            stream.flush()
+
+    return write
@@ -0,0 +1,138 @@
+"""Option values that are read from a file, stdin or a file descriptor.
+
+Large values, like a git diff, do not have to be passed on the command line.
+Instead, the value of any instruction option can refer to its source:
+
+- `@path`: the contents of the file at `path`.
+- `@-`: the contents of stdin.
+- `@fd:N`: the contents of file descriptor `N`, e.g., `--user @fd:3` with
+  `3< <(git diff)` in bash.
+- `@@text`: the literal value `@text`.
+
+The source is only read when the prompt is written, in chunks, so the
+`print` and `json` actions never hold the whole value in memory.
+"""
+
+import argparse
+import os
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TextIO
+
+_CHUNK: int = 65536
+
+
+class Source:
+    """Value of an option that is read when it is used.
+
+    Attributes:
+        spec: The value as given on the command line, e.g., "@-".
+    """
+
+    spec: str
+    _text: str | None
+
+    def __init__(self, spec: str) -> None:
+        """Initialize a source that was not read yet.
+
+        Args:
+            spec: The value as given on the command line.
+        """
+        self.spec = spec
+        self._text = None
+
+    def __repr__(self) -> str:
+        """Return the representation of the source, without reading it."""
+        return f"Source({self.spec!r})"
+
+    def __str__(self) -> str:
+        """Return the whole value, see `read`."""
+        return self.read()
+
+    def read(self) -> str:
+        """Read the whole value.
+
+        The value is kept, so the source can be used again afterwards, even
+        if it is stdin or a file descriptor.
+
+        Returns:
+            The value.
+        """
+        if self._text is None:
+            self._text = "".join(self.chunks())
+        return self._text
+
+    def chunks(self, size: int = _CHUNK) -> Iterator[str]:
+        """Read the value in chunks.
+
+        Unless the value was read with `read` before, stdin and file
+        descriptors can only be read once.
+
+        Args:
+            size: The maximum number of characters per chunk.
+
+        Yields:
+            The chunks of the value.
+        """
+        if self._text is not None:
+            yield self._text
+            return
+        with self._open() as file:
+            while chunk := file.read(size):
+                yield chunk
+
+    @contextmanager
+    def _open(self) -> Iterator[TextIO]:
+        """Open the file, stdin or file descriptor of the source."""
+        target: str = self.spec[1:]
+        if target == "-":
+            yield sys.stdin
+        elif target.startswith("fd:"):
+            fd: int = int(target[len("fd:") :])
+            with open(fd, "r", encoding="utf-8", closefd=False) as file:
+                yield file
+        else:
+            with open(target, "r", encoding="utf-8") as file:
+                yield file
+
+
+def parse(value: str) -> str | Source:
+    """Parse the value of an instruction option, see the module docstring.
+
+    Used as the `type` of the options, so invalid sources are reported by
+    argparse.
+
+    Args:
+        value: The value as given on the command line.
+
+    Returns:
+        The value itself, or a Source if it refers to one.
+
+    Raises:
+        argparse.ArgumentTypeError: If the source does not exist.
+    """
+    if not value.startswith("@"):
+        return value
+    if value.startswith("@@"):
+        return value[1:]
+
+    target: str = value[1:]
+    if target == "-":
+        return Source(value)
+    if target.startswith("fd:"):
+        if not target[len("fd:") :].isdigit():
+            raise argparse.ArgumentTypeError(
+                f"invalid file descriptor: '{value}'"
+            )
+        return Source(value)
+    if not os.path.isfile(target):
+        raise argparse.ArgumentTypeError(
+            f"no such file: '{target}' (use '@{value}' for a literal '@')"
+        )
+    return Source(value)
+
+
+def has_sources(values: dict[str, object]) -> bool:
+    """Return True if any of `values` is a Source."""
+    return any(isinstance(x, Source) for x in values.values())
@@ -0,0 +1,189 @@
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from string import Formatter
+from typing import TYPE_CHECKING, NamedTuple
+
+from prompts import profiling
+from prompts._logger import logger
+
+if TYPE_CHECKING:
+    from prompts._sources import Source
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of a TemplateCache, like `functools.lru_cache`."""
+
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class Template:
+    """An instruction file that is parsed once and formatted many times.
+
+    The placeholders are extracted when the template is created. Rendering a
+    template with only plain placeholders, like `{files}`, is done by joining
+    the literal text and the values. For anything else, e.g., format specs or
+    attribute access, `str.format` is used, so the result is always the same
+    as formatting the source.
+
+    Attributes:
+        source: The contents of the instruction file.
+        fields: The names of the placeholders.
+    """
+
+    source: str
+    fields: frozenset[str]
+    _parts: list[tuple[str, str | None]]
+    _simple: bool
+
+    def __init__(self, source: str) -> None:
+        """Parse the template.
+
+        Args:
+            source: The contents of the instruction file.
+        """
+        self.source = source
+        try:
+            parsed = list(Formatter().parse(source))
+        except ValueError:
+            # Let `str.format` raise the error when the template is rendered.
+            self._parts, self.fields, self._simple = [], frozenset(), False
+            return
+
+        self._parts = [(literal, field) for literal, field, _, _ in parsed]
+        self.fields = frozenset(field for _, field, _, _ in parsed if field)
+        self._simple = all(
+            field is None or (field.isidentifier() and not spec and not conv)
+            for _, field, spec, conv in parsed
+        )
+
+    def render(self, **values: str) -> str:
+        """Replace the placeholders with `values`.
+
+        Args:
+            **values: The values of the placeholders.
+
+        Returns:
+            The formatted template.
+
+        Raises:
+            KeyError: If a placeholder has no value.
+        """
+        with profiling.span("template.format"):
+            if not self._simple:
+                return self.source.format(**values)
+            return "".join(
+                literal if field is None else literal + values[field]
+                for literal, field in self._parts
+            )
+
+    def stream(self, **values: "str | Source") -> Iterator[str]:
+        """Replace the placeholders with `values`, in chunks.
+
+        Values that are a `Source` are read in chunks, so they are not held
+        in memory at once. Templates that are not plain are rendered with
+        `render`, which reads the sources completely.
+
+        Args:
+            **values: The values of the placeholders.
+
+        Yields:
+            The literal text and the values, in order.
+
+        Raises:
+            KeyError: If a placeholder has no value.
+        """
+        if not self._simple:
+            yield self.render(**{k: str(v) for k, v in values.items()})
+            return
+        for literal, field in self._parts:
+            yield literal
+            if field is None:
+                continue
+            value = values[field]
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value.chunks()
+
+
+class TemplateCache:
+    """Bounded LRU cache of parsed templates.
+
+    Templates are cached by path and are only valid as long as the mtime of
+    the file is unchanged, so edits to instruction files are picked up
+    without restarting a long-running process.
+    """
+
+    maxsize: int
+    _entries: OrderedDict[str, tuple[int, Template]]
+    _lock: threading.Lock
+    _hits: int
+    _misses: int
+
+    def __init__(self, maxsize: int = 256) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            maxsize: The maximum number of cached templates.
+        """
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, path: str) -> Template:
+        """Return the template of the file at `path`.
+
+        Args:
+            path: The path of the instruction file.
+
+        Returns:
+            The parsed template.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        mtime: int = os.stat(path).st_mtime_ns
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == mtime:
+                self._hits += 1
+                self._entries.move_to_end(path)
+                return entry[1]
+            self._misses += 1
+
+        with profiling.span("template.read"):
+            with open(path, "r", encoding="utf-8") as file:
+                logger.debug("Reading instruction from '%s'", path)
+                template = Template(file.read())
+
+        with self._lock:
+            self._entries[path] = (mtime, template)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return template
+
+    def cache_info(self) -> CacheInfo:
+        """Return the hit and miss statistics of the cache."""
+        with self._lock:
+            return CacheInfo(
+                self._hits, self._misses, self.maxsize, len(self._entries)
+            )
+
+    def clear(self) -> None:
+        """Remove all templates and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+# Cache that is shared by all Instructions instances.
+cache = TemplateCache()
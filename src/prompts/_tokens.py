@@ -0,0 +1,327 @@
+"""Token counting and fitting prompts into a token budget.
+
+A prompt that is too long for the context of a model is only rejected after
+a slow and expensive call. With a `Budget`, the number of tokens of each
+instruction of a prompt is counted before it is sent, and a prompt that
+exceeds the budget is fitted by one of these policies:
+
+- `truncate`: the values of the least important instructions, like a large
+  `--user` diff, are cut off and end with a note on the truncated tokens.
+- `drop`: the least important instructions are left out completely.
+- `error`: a `TokenBudgetError` is raised.
+
+The command itself is never truncated or dropped. The largest instructions
+are truncated or dropped first, except for the keys in `priority`, which are
+kept as long as possible, most important first.
+
+Tokens are counted by a tokenizer, which is selected by name, see `load`.
+The default `estimate` does not need a model or a download, and counts a
+value of 10 MB within milliseconds.
+"""
+
+import os
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from prompts._logger import logger
+from prompts.exceptions import TokenBudgetError
+from prompts.instructions import Instructions
+
+# Counts the tokens of a text.
+Tokenizer = Callable[[str], int]
+
+POLICIES: tuple[str, ...] = ("truncate", "drop", "error")
+
+# Characters per token of ASCII text, which is typical for English and code.
+_CHARS_PER_TOKEN: int = 4
+
+# The maximum number of attempts to truncate a value to the budget.
+_ATTEMPTS: int = 8
+
+
+def estimate(text: str) -> int:
+    """Estimate the number of tokens of a text.
+
+    ASCII text is counted as one token per four characters. Characters that
+    are encoded in several bytes, like CJK or emoji, are mostly a token of
+    their own, so they are counted by their additional bytes. Only builtin
+    string operations are used, so large values are counted quickly.
+
+    Args:
+        text: The text.
+
+    Returns:
+        The estimated number of tokens, rounded up.
+    """
+    tokens: int = -(-len(text) // _CHARS_PER_TOKEN)
+    if text.isascii():
+        return tokens
+    size: int = len(text.encode("utf-8", errors="surrogatepass"))
+    return tokens + (size - len(text)) // 2
+
+
+def load(name: str = "") -> Tokenizer:
+    """Return a tokenizer by name.
+
+    Args:
+        name: One of:
+            - "estimate": see `estimate`.
+            - "tiktoken" or "tiktoken:<encoding>": an encoding of the
+              optional `tiktoken` package, by default "cl100k_base".
+            - "<module>:<function>": a function that returns the number of
+              tokens of a text.
+            Defaults to `PROMPTS_TOKENIZER`, or "estimate" if that is not
+            set.
+
+    Returns:
+        The tokenizer.
+
+    Raises:
+        ValueError: If the tokenizer cannot be loaded.
+    """
+    name = name or os.environ.get("PROMPTS_TOKENIZER", "") or "estimate"
+    if name == "estimate":
+        return estimate
+
+    kind, _, argument = name.partition(":")
+    if kind == "tiktoken":
+        try:
+            import tiktoken
+        except ImportError as error:
+            raise ValueError(
+                f"Tokenizer '{name}' requires the tiktoken package"
+            ) from error
+        encoding = tiktoken.get_encoding(argument or "cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+    from prompts._registry import resolve
+
+    try:
+        tokenizer: Any = resolve(name)
+    except (ImportError, AttributeError, ValueError) as error:
+        raise ValueError(
+            f"Could not load tokenizer '{name}': {error}"
+        ) from error
+    if not callable(tokenizer):
+        raise ValueError(f"Tokenizer '{name}' is not callable")
+    return tokenizer
+
+
+class Fragment:
+    """The instruction of a key in a prompt and its number of tokens.
+
+    Attributes:
+        key: The instruction key, e.g., "command" or "user".
+        text: The text of the instruction in the prompt.
+        tokens: The number of tokens of `text`.
+        original: The number of tokens before the prompt was fitted.
+        status: "kept", "truncated" or "dropped".
+    """
+
+    key: str
+    text: str
+    tokens: int
+    original: int
+    status: str
+
+    def __init__(self, key: str, text: str, tokens: int) -> None:
+        """Initialize a fragment that is kept as is.
+
+        Args:
+            key: The instruction key.
+            text: The text of the instruction.
+            tokens: The number of tokens of `text`.
+        """
+        self.key = key
+        self.text = text
+        self.tokens = tokens
+        self.original = tokens
+        self.status = "kept"
+
+    def report(self) -> dict[str, Any]:
+        """Return the key, the tokens and the status, e.g., for JSON."""
+        report: dict[str, Any] = dict(key=self.key, tokens=self.tokens)
+        if self.status != "kept":
+            report.update(original=self.original, status=self.status)
+        return report
+
+
+class Budget:
+    """Maximum number of tokens of a prompt, see the module docstring.
+
+    Attributes:
+        max_tokens: The maximum number of tokens, or 0 to only count them.
+        policy: How a prompt that exceeds the budget is fitted, see
+            `POLICIES`.
+        priority: The keys that are truncated or dropped last, most
+            important first.
+        tokenizer: The tokenizer that counts the tokens.
+    """
+
+    max_tokens: int
+    policy: str
+    priority: list[str]
+    tokenizer: Tokenizer
+
+    def __init__(
+        self,
+        max_tokens: int = 0,
+        policy: str = "truncate",
+        priority: Iterable[str] = (),
+        tokenizer: str | Tokenizer = "",
+    ) -> None:
+        """Initialize the budget.
+
+        Args:
+            max_tokens: The maximum number of tokens, or 0 for no maximum.
+            policy: One of `POLICIES`.
+            priority: The keys that are truncated or dropped last.
+            tokenizer: The tokenizer or its name, see `load`.
+
+        Raises:
+            ValueError: If the policy or the tokenizer is invalid.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown token budget policy '{policy}'")
+        self.max_tokens = max_tokens
+        self.policy = policy
+        self.priority = list(priority)
+        if isinstance(tokenizer, str):
+            tokenizer = load(tokenizer)
+        self.tokenizer = tokenizer
+
+    def fit(
+        self, instructions: Instructions, command: str, **kwargs: str
+    ) -> list[Fragment]:
+        """Count the tokens of a prompt and fit it into the budget.
+
+        Args:
+            instructions: The instructions that render the prompt.
+            command: The command name.
+            **kwargs: The values of the instructions, see `make_prompt`.
+
+        Returns:
+            The fragments of the prompt, including the dropped ones; the
+            prompt is `join(fragments)`.
+
+        Raises:
+            TokenBudgetError: If the prompt does not fit.
+        """
+        fragments: list[Fragment] = [
+            Fragment(key, text, self.tokenizer(text))
+            for key, text in instructions.fragments(command, **kwargs)
+        ]
+        total: int = count(fragments)
+        logger.debug(
+            "Tokens of '%s': %s", command, [x.report() for x in fragments]
+        )
+        if not self.max_tokens or total <= self.max_tokens:
+            return fragments
+        if self.policy == "error":
+            raise TokenBudgetError(self._message(command, total))
+
+        for fragment in self._least_important(fragments):
+            excess: int = total - self.max_tokens
+            if excess <= 0:
+                break
+            value: str = str(kwargs.get(fragment.key, ""))
+            if self.policy == "truncate":
+                if instructions.volatility(command, fragment.key) < 2:
+                    continue
+                self._truncate(instructions, command, fragment, value, excess)
+            if self.policy == "drop" or not fragment.tokens:
+                fragment.text, fragment.tokens = "", 0
+                fragment.status = "dropped"
+            total = count(fragments)
+
+        if total > self.max_tokens:
+            raise TokenBudgetError(self._message(command, total))
+        logger.warning(
+            "Fitted the prompt of '%s' into %s tokens: %s",
+            command,
+            self.max_tokens,
+            [x.report() for x in fragments if x.status != "kept"],
+        )
+        return fragments
+
+    def _least_important(self, fragments: list[Fragment]) -> list[Fragment]:
+        """Return the fragments except the command, least important first.
+
+        Fragments that are not in `priority` come first, largest first.
+        """
+        ranks: dict[str, int] = {k: i for i, k in enumerate(self.priority)}
+        candidates = [x for x in fragments if x.key != "command"]
+        return sorted(
+            candidates,
+            key=lambda x: (ranks.get(x.key, len(ranks)), x.tokens),
+            reverse=True,
+        )
+
+    def _truncate(
+        self,
+        instructions: Instructions,
+        command: str,
+        fragment: Fragment,
+        value: str,
+        excess: int,
+    ) -> None:
+        """Truncate the value of a fragment by at least `excess` tokens.
+
+        The length of the value is scaled to the number of tokens that is
+        left, and reduced further until the fragment fits. If nothing of the
+        value can be kept, the fragment is left empty.
+
+        Args:
+            instructions: The instructions that render the fragment.
+            command: The command name.
+            fragment: The fragment, which is updated.
+            value: The value of the fragment.
+            excess: The number of tokens to remove.
+        """
+        target: int = fragment.tokens - excess
+        ratio: float = max(target, 0) / max(fragment.tokens, 1)
+        length: int = int(len(value) * ratio)
+        tokens: int = self.tokenizer(value)
+        for _ in range(_ATTEMPTS):
+            if length <= 0:
+                break
+            kept: str = value[:length]
+            removed: int = tokens - self.tokenizer(kept)
+            text: str = instructions.fragment(
+                command,
+                fragment.key,
+                f"{kept}\n[... truncated {removed} tokens]",
+            )
+            size: int = self.tokenizer(text)
+            if size <= target:
+                fragment.text, fragment.tokens = text, size
+                fragment.status = "truncated"
+                return
+            length = int(length * target / size * 0.95)
+        fragment.text, fragment.tokens = "", 0
+
+    def _message(self, command: str, total: int) -> str:
+        """Return the error message of a prompt that does not fit."""
+        return (
+            f"The prompt of '{command}' has {total} tokens, which exceeds the "
+            f"budget of {self.max_tokens} tokens (policy '{self.policy}')"
+        )
+
+
+def count(fragments: list[Fragment]) -> int:
+    """Return the number of tokens of a prompt, including the separators.
+
+    Args:
+        fragments: The fragments of the prompt.
+    """
+    kept: list[int] = [x.tokens for x in fragments if x.text]
+    return sum(kept) + max(len(kept) - 1, 0)
+
+
+def join(fragments: list[Fragment]) -> str:
+    """Return the prompt of the fragments, like `Instructions.make_prompt`.
+
+    Args:
+        fragments: The fragments of the prompt.
+    """
+    return "\n".join(x.text for x in fragments if x.text)
@@ -4,17 +4,18 @@ Defines AbstractAction and concrete action classes for invoking tools, as well
 as ActionFactory.
 """
 
-from prompts._logger import logger
+import json
 import os
 import sys
 from abc import ABC, abstractmethod
-from collections.abc import Callable
-from pprint import pp
-from typing import Self, override
+from collections.abc import Callable, Iterable
+from typing import Any, Self, override
 
 from pygeneral import process
 
-from prompts.exceptions import AiderActionError
+from prompts import _registry, _shards, profiling
+from prompts._logger import logger
+from prompts.exceptions import AiderActionError, OpenAIActionError
 
 
 class AbstractAction(ABC):
@@ -26,10 +27,13 @@ class AbstractAction(ABC):
         files: Set of file paths for the action.
         filetype: The type of files to process.
         user: The user-provided prompt text.
+        metadata: Information about the prompt, like its cache breakpoints,
+            that actions may add to their output.
     """
 
     prompt: str
     command: str
+    metadata: dict[str, Any]
     _kwargs: dict[str, str]
 
     def __init__(self, prompt: str, command: str, **kwargs: str) -> None:
@@ -44,12 +48,36 @@ class AbstractAction(ABC):
         """
         self.prompt = prompt
         self.command = command
+        self.metadata = {}
         self._kwargs = kwargs
 
     @abstractmethod
     def __call__(self) -> None:
         """Execute the tool's action."""
 
+    def stream(self, chunks: Iterable[str]) -> None:
+        """Execute the action for a prompt that is given in chunks.
+
+        By default, the chunks are joined into the prompt and the action is
+        executed with it. Actions that override this write the chunks as they
+        arrive instead of building the prompt first.
+
+        Args:
+            chunks: The chunks of the prompt, see `Instructions.iter_prompt`.
+        """
+        self.prompt = "".join(chunks)
+        self()
+
+    async def acall(self) -> None:
+        """Execute the action without blocking the event loop.
+
+        By default, the action is executed in a thread. Actions that wait
+        for a subprocess override this to wait in the event loop instead.
+        """
+        import asyncio
+
+        await asyncio.to_thread(self)
+
 
 class Print(AbstractAction):
     """Action that prints the prompt to standard output."""
@@ -59,19 +87,43 @@ class Print(AbstractAction):
         """Print the prompt to stdout."""
         print(self.prompt)
 
+    @override
+    def stream(self, chunks: Iterable[str]) -> None:
+        """Write the chunks of the prompt to stdout as they arrive."""
+        write = sys.stdout.write
+        for chunk in chunks:
+            write(chunk)
+        write("\n")
+
 
 class Json(AbstractAction):
-    """Action that outputs the prompt as a JSON string."""
+    """Action that outputs the prompt as a JSON string.
+
+    The object contains the command, the prompt, the values of the
+    instructions and the metadata. Values that are read from a file, stdin
+    or a file descriptor are written as given on the command line, e.g.,
+    "@-", as they are already part of the prompt.
+    """
 
     @override
     def __call__(self) -> None:
         """Print the prompt as a json string to stdout."""
-        result: dict[str, str | list[str]] = dict(
-            command=self.command,
-            prompt=self.prompt,
-            **self._kwargs,
-        )
-        pp(result)
+        self.stream([self.prompt])
+
+    @override
+    def stream(self, chunks: Iterable[str]) -> None:
+        """Write the JSON object to stdout, escaping the prompt in chunks."""
+        write = sys.stdout.write
+        write(f'{{"command": {json.dumps(self.command)}, "prompt": "')
+        for chunk in chunks:
+            write(json.dumps(chunk)[1:-1])
+        write('"')
+        for key, value in self._kwargs.items():
+            value = getattr(value, "spec", value)
+            write(f", {json.dumps(key)}: {json.dumps(value)}")
+        for key, value in self.metadata.items():
+            write(f", {json.dumps(key)}: {json.dumps(value)}")
+        write("}\n")
 
 
 class Aider(AbstractAction):
@@ -81,6 +133,17 @@ class Aider(AbstractAction):
     By calling the instructor, aider will be called as is. When calling the
     class methods code or ask, aider will be called with a special command
     string prepended to the prompt, e.g., "/code" or "/ask", respectively.
+
+    When the environment variable `PROMPTS_AIDER_SHARD_SIZE` is set to a
+    positive number, the files are split into shards of that size, which are
+    processed by separate aider processes. The following environment
+    variables configure this mode:
+
+    - `PROMPTS_AIDER_SHARD_SIZE`: maximum number of files per aider process.
+    - `PROMPTS_AIDER_WORKERS`: number of aider processes that run at the
+      same time. Defaults to 4.
+    - `PROMPTS_AIDER_RETRIES`: number of times a failing shard is retried.
+      Defaults to 0.
     """
 
     @classmethod
@@ -135,8 +198,163 @@ class Aider(AbstractAction):
     @override
     def __call__(self) -> None:
         """Execute the aider command with the prompt and files."""
-        files: list[str] = self._kwargs.get("files", "").split(",")
-        cmd: list[str] = [
+        files: list[str] = self._files()
+        shard_size: int = _getenv_int("PROMPTS_AIDER_SHARD_SIZE", 0)
+        if 0 < shard_size < len(files):
+            self._call_sharded(_shards.split(files, shard_size))
+            return
+
+        cmd: list[str] = self._make_cmd(files)
+        logger.debug("Running command: %s", " ".join(cmd))
+        with profiling.span("aider.subprocess"):
+            return_code: int = process.stream_subprocess(
+                cmd,
+                stdout=[sys.stdout, logger.info],
+                stderr=[sys.stderr, logger.info],
+            )
+        if return_code != 0:
+            raise AiderActionError(
+                f"Aider command failed: {' '.join(cmd)}. "
+                "Check logs for details.",
+                return_code,
+            )
+
+    @override
+    async def acall(self) -> None:
+        """Execute the aider command in the event loop, see `__call__`.
+
+        The output of aider is streamed as it arrives. When the task is
+        cancelled, the aider processes are terminated.
+
+        Raises:
+            AiderActionError: If aider fails.
+        """
+        from prompts import _aio
+
+        files: list[str] = self._files()
+        shard_size: int = _getenv_int("PROMPTS_AIDER_SHARD_SIZE", 0)
+        if 0 < shard_size < len(files):
+            shards = _shards.split(files, shard_size)
+            await _shards.arun(
+                shards,
+                self._acall_shard,
+                workers=_getenv_int("PROMPTS_AIDER_WORKERS", 4),
+                retries=_getenv_int("PROMPTS_AIDER_RETRIES", 0),
+            )
+            self._check_shards(shards)
+            return
+
+        cmd: list[str] = self._make_cmd(files)
+        logger.debug("Running command: %s", " ".join(cmd))
+        with profiling.span("aider.subprocess"):
+            return_code: int = await _aio.stream_subprocess(
+                cmd,
+                stdout=[sys.stdout.write, logger.info],
+                stderr=[sys.stderr.write, logger.info],
+            )
+        if return_code != 0:
+            raise AiderActionError(
+                f"Aider command failed: {' '.join(cmd)}. "
+                "Check logs for details.",
+                return_code,
+            )
+
+    async def _acall_shard(self, shard: _shards.Shard) -> int:
+        """Execute the aider command for a single shard, see `_call_shard`.
+
+        Args:
+            shard: The shard to process.
+
+        Returns:
+            The return code of aider.
+        """
+        from prompts import _aio
+
+        cmd: list[str] = self._make_cmd(shard.files)
+        logger.debug("Running command for %s: %s", shard.name, " ".join(cmd))
+        prefix: str = f"[{shard.name}] "
+        return await _aio.stream_subprocess(
+            cmd,
+            stdout=[_shards.prefixed(sys.stdout, prefix), logger.info],
+            stderr=[_shards.prefixed(sys.stderr, prefix), logger.info],
+        )
+
+    def _call_sharded(self, shards: list[_shards.Shard]) -> None:
+        """Execute an aider command for each shard concurrently.
+
+        The output of each shard is prefixed with the shard name. All shards
+        are run, even if some of them fail; a summary is printed to stderr
+        afterwards.
+
+        Args:
+            shards: The shards to process.
+
+        Raises:
+            AiderActionError: If one or more shards failed.
+        """
+        _shards.run(
+            shards,
+            self._call_shard,
+            workers=_getenv_int("PROMPTS_AIDER_WORKERS", 4),
+            retries=_getenv_int("PROMPTS_AIDER_RETRIES", 0),
+        )
+        self._check_shards(shards)
+
+    @staticmethod
+    def _check_shards(shards: list[_shards.Shard]) -> None:
+        """Print the summary of the shards and raise if any of them failed.
+
+        Args:
+            shards: The shards that ran.
+
+        Raises:
+            AiderActionError: If one or more shards failed.
+        """
+        print(_shards.summary(shards), file=sys.stderr)
+        failed: list[str] = [x for s in shards if not s.ok for x in s.files]
+        if failed:
+            returncode: int | None = next(
+                (s.returncode for s in shards if not s.ok), None
+            )
+            raise AiderActionError(
+                "Aider failed for one or more shards. Retry them with: "
+                f"--files {','.join(failed)}",
+                returncode,
+            )
+
+    def _call_shard(self, shard: _shards.Shard) -> int:
+        """Execute the aider command for a single shard.
+
+        Args:
+            shard: The shard to process.
+
+        Returns:
+            The return code of aider.
+        """
+        cmd: list[str] = self._make_cmd(shard.files)
+        logger.debug("Running command for %s: %s", shard.name, " ".join(cmd))
+        prefix: str = f"[{shard.name}] "
+        with profiling.span("aider.subprocess"):
+            return process.stream_subprocess(
+                cmd,
+                stdout=[_shards.prefixed(sys.stdout, prefix), logger.info],
+                stderr=[_shards.prefixed(sys.stderr, prefix), logger.info],
+            )
+
+    def _files(self) -> list[str]:
+        """Return the files of the `files` instruction as a list."""
+        return [x for x in self._kwargs.get("files", "").split(",") if x]
+
+    def _make_cmd(self, files: list[str]) -> list[str]:
+        """Return the aider command for the prompt and files.
+
+        Args:
+            files: The files to pass to aider.
+
+        Returns:
+            The command as a list of arguments.
+        """
+        return [
             "aider",
             "--yes-always",
             "--no-check-update",
@@ -145,27 +363,144 @@ class Aider(AbstractAction):
             f"{self.prompt}",
             *files,
         ]
-        logger.debug("Running command: %s", " ".join(cmd))
-        return_code: int = process.stream_subprocess(
-            cmd,
-            stdout=[sys.stdout, logger.info],
-            stderr=[sys.stderr, logger.info],
-        )
-        if return_code != 0:
+
+
+class OpenAI(AbstractAction):
+    """Action that sends the prompt to an OpenAI-compatible endpoint.
+
+    The reply is streamed to stdout as it arrives. Connections are kept
+    alive and shared by all prompts that are sent by the same process. The
+    endpoint is configured with the following environment variables:
+
+    - `PROMPTS_OPENAI_BASE_URL`: the base URL of the API. Defaults to
+      `http://localhost:8080/v1`, the default of the llama.cpp server.
+    - `PROMPTS_OPENAI_MODEL`: the model name, if the server requires one.
+    - `PROMPTS_OPENAI_API_KEY`: the API key. Defaults to `OPENAI_API_KEY`.
+    - `PROMPTS_OPENAI_TIMEOUT`: the socket timeout in seconds. Defaults to
+      600.
+    - `PROMPTS_OPENAI_CONCURRENCY`: the maximum number of concurrent
+      requests per process. Defaults to 4.
+    """
+
+    @override
+    def __call__(self) -> None:
+        """Send the prompt and stream the reply to stdout."""
+        from prompts import _http
+
+        def sink(token: str) -> None:
+            sys.stdout.write(token)
+            sys.stdout.flush()
+
+        logger.debug("Sending prompt to %s", _http.base_url())
+        try:
+            with profiling.span("openai.request"):
+                reply: str = _http.chat(self.prompt, sink)
+        except (OSError, _http.HTTPError) as error:
+            raise OpenAIActionError(
+                f"Request to {_http.base_url()} failed: {error}"
+            ) from error
+        print()
+        logger.info("Reply: %s", reply)
+
+
+class AiderSession(Aider):
+    """Action that sends the prompt to a long-lived aider process.
+
+    Instead of starting aider for each prompt, an interactive aider process
+    is taken from a pool of sessions for the current working tree. The files
+    are added to its chat and the prompt is sent over stdin. The session is
+    kept alive afterwards, so this is only faster than the `aider` action
+    when it is used by a long-running process like `prompts serve`.
+
+    Idle sessions are closed after `PROMPTS_AIDER_IDLE` seconds, which
+    defaults to 600. A session that is not ready for the next message within
+    `PROMPTS_AIDER_TIMEOUT` seconds, which defaults to 1800, is closed and
+    the action fails.
+    """
+
+    @override
+    def __call__(self) -> None:
+        """Send the prompt to an aider session and stream its output."""
+        from prompts import _sessions
+
+        self._send(_sessions.getcwd())
+
+    @override
+    async def acall(self) -> None:
+        """Send the prompt to an aider session in a thread, see `__call__`.
+
+        Unlike `Aider.acall`, no aider process is started for the prompt, so
+        the sessions of the pool are shared with the synchronous calls. The
+        working tree is resolved before the thread starts, because it is
+        local to the calling thread, see `_sessions.workdir`.
+        """
+        import asyncio
+
+        from prompts import _sessions
+
+        await asyncio.to_thread(self._send, _sessions.getcwd())
+
+    def _send(self, tree: str) -> None:
+        """Send the prompt to a session of `tree` and stream its output.
+
+        Args:
+            tree: The working tree of the session.
+
+        Raises:
+            AiderActionError: If the session fails.
+        """
+        from prompts import _sessions
+
+        def sink(line: str) -> None:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+            logger.info(line.rstrip("\n"))
+
+        try:
+            with _sessions.pool.session(tree) as session:
+                with profiling.span("aider.session"):
+                    session.add(self._files(), sink)
+                    session.send(self.prompt, sink)
+        except OSError as error:
+            raise AiderActionError(f"Aider session failed: {error}") from error
+        except _sessions.SessionError as error:
             raise AiderActionError(
-                f"Aider command failed: {' '.join(cmd)}. Check logs for details."
-            )
+                f"Aider session failed: {error}", error.returncode
+            ) from error
+
+
+def _getenv_int(name: str, default: int) -> int:
+    """Return an integer environment variable.
+
+    Args:
+        name: The name of the environment variable.
+        default: The value if the variable is not set or empty.
+
+    Returns:
+        The value of the environment variable.
+
+    Raises:
+        ValueError: If the variable is not an integer.
+    """
+    value: str = os.environ.get(name, "")
+    try:
+        return int(value) if value else default
+    except ValueError as error:
+        raise ValueError(f"{name} must be an integer, got '{value}'") from error
 
 
 class ActionFactory:
     """Factory class to create tool instances based on a tool name.
 
+    The tools are looked up in the registry of `prompts._registry`, which
+    also contains the actions of plugins.
+
     Attributes:
         name (str): The name of the tool.
     """
 
     name: str
-    _cls: type[AbstractAction]
+    _cls: Callable[..., AbstractAction]
 
     def __init__(self, name: str) -> None:
         """Initialize the ActionFactory with the given tool name.
@@ -174,11 +509,21 @@ class ActionFactory:
             ValueError: If no tool is available named '{name}'.
         """
         self.name = name
-        tools: dict[str, type[AbstractAction]] = self.all()
-        try:
-            self._cls = tools[name]
-        except KeyError as error:
-            raise ValueError(f"No tool available named '{name}'") from error
+        self._cls = _registry.registry.load(name)
+
+    @property
+    def streaming(self) -> bool:
+        """Whether the action overrides `AbstractAction.stream`.
+
+        Actions that are created by a class method, like `Aider.code`, are
+        looked up on their class.
+        """
+        cls: object = getattr(self._cls, "__self__", self._cls)
+        return (
+            isinstance(cls, type)
+            and issubclass(cls, AbstractAction)
+            and cls.stream is not AbstractAction.stream
+        )
 
     def create(self, prompt: str, **kwargs: str) -> AbstractAction:
         """Create an instance of the specified tool with provided arguments.
@@ -190,24 +535,21 @@ class ActionFactory:
 
     @classmethod
     def names(cls) -> list[str]:
-        """Return a list of available tool names.
+        """Return a list of available tool names, without importing them.
 
         Returns:
             list[str]: List of tool names.
         """
-        return list(cls.all().keys())
+        return _registry.registry.names()
 
     @classmethod
-    def all(cls) -> dict[str, Callable[[str, str], AbstractAction]]:
+    def all(cls) -> dict[str, Callable[..., AbstractAction]]:
         """Return a mapping from tool names to tool classes.
 
+        This imports all tools, including those of plugins; use `names` to
+        only list them.
+
         Returns:
-            Dictionary mapping lowercase class names to the tool classes.
-        """
-        actions: dict[str, Callable[[str, str], AbstractAction]] = {
-            cls.__name__.lower(): cls for cls in AbstractAction.__subclasses__()
-        }
-        actions["aider-code"] = Aider.code
-        actions["aider-ask"] = Aider.ask
-        actions["aider-commit"] = Aider.commit
-        return actions
+            Dictionary mapping tool names to the tool classes or factories.
+        """
+        return {name: _registry.registry.load(name) for name in cls.names()}
@@ -0,0 +1,186 @@
+"""Library API to render prompts from within another program.
+
+A `PromptBuilder` is created once for an instructions directory, bundle or
+stack of layers, e.g., when a web service starts, and is then shared by all
+threads that render prompts:
+
+```python
+from prompts.builder import PromptBuilder
+
+builder = PromptBuilder("path/to/instructions")
+prompt = builder.render("fix", files="main.py", filetype="python")
+```
+"""
+
+from collections.abc import Iterable, Mapping
+
+from prompts import _paths, profiling
+from prompts._logger import logger
+from prompts.exceptions import InvalidInstructionsError
+from prompts.instructions import Instructions
+
+
+class PromptBuilder:
+    """Render prompts for a fixed set of instructions.
+
+    By default, the instructions are validated and read into memory when the
+    builder is created, see `Instructions.freeze`, so `render` does not do
+    any filesystem I/O and is safe to call from multiple threads. Create a
+    new builder to pick up changes to the instructions.
+
+    Attributes:
+        directory: The instructions directory, bundle or layers.
+        instructions: The instructions that render the prompts.
+    """
+
+    directory: str
+    instructions: Instructions
+    _preloaded: bool
+
+    def __init__(
+        self,
+        directory: str = _paths.instructions,
+        preload: bool = True,
+        validate: bool = True,
+    ) -> None:
+        """Load the instructions.
+
+        Args:
+            directory: The instructions directory, the path of a bundle, or
+                several of them separated by `os.pathsep`.
+            preload: Read all instructions into memory now. Otherwise, they
+                are read when they are used, which is faster for a single
+                prompt, like in the CLI.
+            validate: Check that all instructions can be rendered, see
+                `validate`.
+
+        Raises:
+            InvalidInstructionsError: If `validate` is set and some
+                instructions cannot be rendered.
+        """
+        self.directory = directory
+        self.instructions = Instructions(directory)
+        self._preloaded = preload
+        if preload:
+            self.instructions = self.instructions.freeze()
+        if validate:
+            self.validate()
+
+    def validate(self) -> None:
+        """Check that every instruction of every command can be rendered.
+
+        Each command is rendered alone, and then with a value for each
+        `<key>.md` file and with each file in a `<key>` directory, so
+        problems like unknown placeholders or commands without a
+        `command.md` are found before the first request instead of during
+        it. The instructions of a command that cannot be rendered alone are
+        not checked.
+
+        Raises:
+            InvalidInstructionsError: If some instructions cannot be
+                rendered. The message lists all problems.
+        """
+        problems: list[str] = []
+        commands: list[str] = sorted(self.instructions.list_commands())
+        with profiling.span("builder.validate"):
+            for command in commands:
+                for key, value in self._samples(command):
+                    try:
+                        self.render(command, **({key: value} if key else {}))
+                    except (LookupError, ValueError, OSError) as error:
+                        option: str = f" --{key} {value!r}" if key else ""
+                        problems.append(
+                            f"{command}{option}: {type(error).__name__}: "
+                            f"{error}"
+                        )
+                        if not key:
+                            break
+        if problems:
+            raise InvalidInstructionsError(
+                f"Invalid instructions in '{self.directory}':\n"
+                + "\n".join(problems)
+            )
+        logger.debug("Validated %s commands", len(commands))
+
+    def _samples(self, command: str) -> list[tuple[str, str]]:
+        """Return a value to validate each instruction of a command.
+
+        Args:
+            command: The command name.
+
+        Returns:
+            The keys with a value: the name of each file of a `<key>`
+            directory, or a placeholder value for a `<key>.md` file. The
+            first item, with an empty key, stands for the command alone.
+        """
+        samples: list[tuple[str, str]] = [("", "")]
+        for key in sorted(self.instructions.list(command) - {"command"}):
+            values: set[str] = self.instructions.values(command, key)
+            samples.extend((key, x) for x in sorted(values or {key}))
+        return samples
+
+    def commands(self) -> set[str]:
+        """Return the names of the available commands."""
+        return self.instructions.list_commands()
+
+    def options(self, command: str) -> set[str]:
+        """Return the names of the values that a command accepts.
+
+        Args:
+            command: The command name.
+        """
+        return self.instructions.list(command) - {"command"}
+
+    def render(self, command: str, **kwargs: str) -> str:
+        """Render the prompt of a command.
+
+        Args:
+            command: The command name.
+            **kwargs: The values of the instructions, e.g., `files`. Empty
+                values are left out.
+
+        Returns:
+            The prompt, like `Instructions.make_prompt`.
+
+        Raises:
+            InstructionNotFoundError: If the command or an instruction does
+                not exist.
+        """
+        return self.instructions.make_prompt(command, **kwargs)
+
+    async def arender(self, command: str, **kwargs: str) -> str:
+        """Render the prompt of a command from a coroutine, see `render`.
+
+        A preloaded builder renders in the event loop, as it does not do
+        I/O; otherwise, the instructions are read in a thread.
+
+        Returns:
+            The prompt.
+        """
+        if self._preloaded:
+            return self.render(command, **kwargs)
+        return await self.instructions.amake_prompt(command, **kwargs)
+
+    def render_many(self, requests: Iterable[Mapping[str, str]]) -> list[str]:
+        """Render the prompts of many requests.
+
+        Args:
+            requests: The requests, each with a `command` and the values of
+                its instructions, like the lines of `prompts batch`.
+
+        Returns:
+            The prompts, in the same order as the requests.
+
+        Raises:
+            InstructionNotFoundError: If a command or an instruction does
+                not exist.
+            KeyError: If a request has no command.
+        """
+        render = self.instructions.make_prompt
+        return [
+            render(
+                request["command"],
+                **{k: v for k, v in request.items() if k != "command"},
+            )
+            for request in requests
+        ]
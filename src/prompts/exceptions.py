@@ -3,4 +3,42 @@ class InstructionNotFoundError(FileNotFoundError):
 
 
 class AiderActionError(Exception):
-    """Raised when there is an error performing an action in Aider."""
+    """Raised when there is an error performing an action in Aider.
+
+    Attributes:
+        returncode: The return code of aider, or None if it is not known.
+    """
+
+    returncode: int | None
+
+    def __init__(self, message: str, returncode: int | None = None) -> None:
+        """Initialize the error.
+
+        Args:
+            message: The error message.
+            returncode: The return code of aider, if it is known.
+        """
+        super().__init__(message)
+        self.returncode = returncode
+
+
+class OpenAIActionError(Exception):
+    """Raised when there is an error sending a prompt to an OpenAI-compatible
+    endpoint."""
+
+
+class InvalidInstructionsError(ValueError):
+    """Raised when an instructions directory contains instructions that
+    cannot be rendered."""
+
+
+class PipelineError(Exception):
+    """Raised when a stage of a pipeline of commands fails."""
+
+
+class TokenBudgetError(ValueError):
+    """Raised when a prompt does not fit into its token budget."""
+
+
+class JobError(Exception):
+    """Raised when one or more queued jobs fail."""
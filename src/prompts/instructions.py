@@ -1,10 +1,19 @@
-from prompts._logger import logger
-import os
-from os.path import exists, join, splitext
+from collections.abc import Iterable, Iterator
+from contextlib import suppress
+from copy import copy
+from os.path import splitext
+from typing import TYPE_CHECKING, NoReturn
 
-from prompts import _paths
+from prompts import _index, _paths, _templates
+from prompts._logger import logger
+from prompts._templates import CacheInfo
 from prompts.exceptions import InstructionNotFoundError
 
+if TYPE_CHECKING:
+    from prompts._bundle import Bundle
+    from prompts._index import Index, Overlay, Snapshot
+    from prompts._sources import Source
+
 
 class Instructions:
     """A set of instructions together make up the prompt. This class is
@@ -44,32 +53,257 @@ class Instructions:
     This mechanism allows for adding new instructions and commands without
     changing the source code. Users can set their own instruction directory
     instead of using the default that is part of the source distribution.
+
+    All lookups are answered from an `Index` of the directory, which is built
+    with a single scan and cached on disk, instead of hitting the filesystem
+    for each key. Instruction files are parsed once and kept in a
+    `TemplateCache` that is shared by all instances.
+
+    Instead of a directory, a bundle that was created with `prompts bundle`
+    can be used. The lookups are the same, but the instructions are read
+    from the memory-mapped bundle file.
+
+    Several directories or bundles can be stacked as layers by separating
+    them with `os.pathsep`, e.g., "org:team:personal". Each instruction is
+    served by the last layer that contains it, see `which`.
     """
 
     _directory: str
+    _index: "Index | Bundle | Overlay | Snapshot"
+    _kinds: dict[tuple[str, str], str | None]
 
     def __init__(self, directory: str = _paths.instructions) -> None:
         """Initializes the Instructions instance.
 
         Args:
-            directory: The directory path where instructions are stored.
+            directory: The directory path where instructions are stored, or
+                the path of an instructions bundle. Multiple layers are
+                separated by `os.pathsep`.
         """
         self._directory = directory
+        self._index = _index.load(directory)
+        self._kinds = {}
         logger.info("Using instructions directory: %s", self._directory)
 
-    def make_prompt(self, command: str, **kwargs: str) -> str:
+    def freeze(self) -> "Instructions":
+        """Return a copy that has all instructions in memory.
+
+        All instruction files are read and parsed, and for each command it
+        is decided whether its instructions are a `<key>.md` file or a
+        `<key>` directory. Afterwards, the copy never touches the filesystem
+        and can be shared by threads, but it does not pick up changes to the
+        instruction files.
+
+        Returns:
+            The frozen instructions.
+
+        Raises:
+            OSError: If an instruction file cannot be read.
+        """
+        frozen: Instructions = copy(self)
+        frozen._index = _index.Snapshot(self._index)
+        frozen._kinds = dict(self._kinds)
+        for command in frozen.list_commands():
+            for key in frozen.list(command):
+                frozen._kind(command, key)
+        return frozen
+
+    def make_prompt(self, command: str, **kwargs: "str | Source") -> str:
         """Assemble the full prompt from the instructions.
 
+        Values that are a `Source` are read completely, see `iter_prompt`
+        to stream them instead.
+
         Returns:
             The full prompt as a string.
         """
+        fragments: list[tuple[str, str]] = self.fragments(command, **kwargs)
+        logger.debug(
+            "Instructions of '%s': %s", command, [x for x, _ in fragments]
+        )
+        return "\n".join([x for _, x in fragments])
+
+    def fragments(
+        self, command: str, **kwargs: "str | Source"
+    ) -> list[tuple[str, str]]:
+        """Return the instructions of a prompt, see `make_prompt`.
+
+        Returns:
+            The key and the text of each non-empty instruction, in prompt
+            order, starting with "command".
+        """
+        kwargs = {key: str(value) for key, value in kwargs.items() if value}
+        fragments: list[tuple[str, str]] = [
+            ("command", self.fragment(command, "command"))
+        ]
+        fragments.extend(
+            (key, self.fragment(command, key, value))
+            for key, value in kwargs.items()
+        )
+        return [(key, text) for key, text in fragments if text]
+
+    def fragment(self, command: str, key: str, value: str = "") -> str:
+        """Return the formatted instruction of a key.
+
+        Args:
+            command: The command name.
+            key: The instruction key.
+            value: The value of the instruction.
+
+        Returns:
+            The instruction.
+
+        Raises:
+            InstructionNotFoundError: If the instruction file is not found.
+        """
+        return self._get(command, key, value)
+
+    async def amake_prompt(self, command: str, **kwargs: "str | Source") -> str:
+        """Assemble the full prompt without blocking the event loop.
+
+        The instruction files are read in a thread, see `make_prompt`.
+
+        Returns:
+            The full prompt as a string.
+        """
+        import asyncio
+
+        return await asyncio.to_thread(self.make_prompt, command, **kwargs)
+
+    def iter_prompt(
+        self, command: str, **kwargs: "str | Source"
+    ) -> Iterator[str]:
+        """Assemble the full prompt from the instructions, in chunks.
+
+        The result is the same as `make_prompt`, but the prompt is yielded
+        as the literal text of the instructions and the values, without
+        joining them. Values that are a `Source` are read in chunks, so they
+        are never held in memory at once.
+
+        Yields:
+            The chunks of the prompt.
+        """
         kwargs = {key: value for key, value in kwargs.items() if value}
-        instructions: list[str] = [self._get(command, "command")]
-        instructions.extend(
-            [self._get(command, key, value) for key, value in kwargs.items()]
+        fragments: list[Iterable[str]] = [self._stream(command, "command")]
+        fragments.extend(
+            self._stream(command, key, value) for key, value in kwargs.items()
+        )
+        separator: bool = False
+        for fragment in fragments:
+            pending: bool = separator
+            for chunk in fragment:
+                if not chunk:
+                    continue
+                if pending:
+                    yield "\n"
+                    pending = False
+                separator = True
+                yield chunk
+
+    def arrange(
+        self, command: str, kwargs: "dict[str, str | Source]"
+    ) -> "dict[str, str | Source]":
+        """Order the values for a stable prompt prefix.
+
+        Providers and local KV caches only reuse an exact shared prefix of a
+        prompt. The fragments are therefore ordered by `volatility`: static
+        text first and the fragments that contain the values last. Within
+        each level, the keys are sorted, so the order does not depend on the
+        order in which the values are given.
+
+        Args:
+            command: The command name.
+            kwargs: The values of the instructions.
+
+        Returns:
+            The values, in the order in which they should be passed to
+            `make_prompt` or `iter_prompt`.
+        """
+        keys: list[str] = sorted(
+            kwargs, key=lambda x: (self.volatility(command, x), x)
         )
-        logger.debug("Instruction list: %s", instructions)
-        return "\n".join([x for x in instructions if x])
+        return {key: kwargs[key] for key in keys}
+
+    def volatility(self, command: str, key: str) -> int:
+        """Return how likely the fragment of a key differs between calls.
+
+        Args:
+            command: The command name.
+            key: The instruction key.
+
+        Returns:
+            0 for the command itself, 1 for fragments that are static text,
+            e.g., a file selected by the value like `filetype/python.md`,
+            and 2 for fragments that contain the value, like `{files}`.
+        """
+        if key == "command":
+            return 0
+        relative: str | None = self._kind(command, key)
+        if relative is None or not self._index.template(relative).fields:
+            return 1
+        return 2
+
+    def static_prefix(self, command: str, **kwargs: "str | Source") -> str:
+        """Return the static part at the start of a prompt.
+
+        This is the part of `make_prompt` that comes before the first
+        fragment that contains a value, e.g., the end of the prefix that
+        can be cached when the values are ordered by `arrange`.
+
+        Args:
+            command: The command name.
+            **kwargs: The values of the instructions, in prompt order.
+
+        Returns:
+            The static prefix, without the separator that follows it.
+        """
+        static: dict[str, str] = {}
+        for key, value in kwargs.items():
+            if not value:
+                continue
+            if self.volatility(command, key) > 1:
+                break
+            static[key] = str(value)
+        return self.make_prompt(command, **static)
+
+    def values(self, command: str, key: str) -> set[str]:
+        """Return the values of an instruction that selects a file.
+
+        Args:
+            command: The command name.
+            key: The instruction key, e.g., "filetype".
+
+        Returns:
+            The names of the files in the `<key>` directories of the command
+            and of the defaults, without extension. Empty if the key is not
+            a directory.
+        """
+        names: set[str] = set()
+        for relative in (f"commands/{command}/{key}", f"default/{key}"):
+            with suppress(FileNotFoundError):
+                entries: list[str] = self._index.listdir(relative)
+                names.update(splitext(x)[0] for x in entries)
+        return names
+
+    def _stream(
+        self, command: str, key: str, value: "str | Source" = ""
+    ) -> Iterable[str]:
+        """Get and format an instruction, in chunks, see `_get`.
+
+        Args:
+            key: The instruction key.
+            value: The value to format the instruction.
+
+        Returns:
+            The chunks of the instruction.
+
+        Raises:
+            InstructionNotFoundError: If the instruction file is not found.
+        """
+        relative: str | None = self._kind(command, key)
+        if relative is not None:
+            return self._index.template(relative).stream(**{key: value})
+        return (self.read(command, key, f"{value}.md"),)
 
     def _get(self, command: str, key: str, value: str = "") -> str:
         """Get and format an instruction string.
@@ -79,6 +313,8 @@ class Instructions:
           2. If not found, look for a file named `<value>.md` in a directory
           named `<key>`.
 
+        Which pattern applies is decided once per command and key.
+
         Args:
             key: The instruction key.
             value: The value to format the instruction.
@@ -89,10 +325,30 @@ class Instructions:
         Raises:
             InstructionNotFoundError: If the instruction file is not found.
         """
+        relative: str | None = self._kind(command, key)
+        if relative is not None:
+            return self._index.template(relative).render(**{key: value})
+        return self.read(command, key, f"{value}.md")
+
+    def _kind(self, command: str, key: str) -> str | None:
+        """Return the `<key>.md` file of an instruction, if there is one.
+
+        The result is memoized per command and key.
+
+        Args:
+            command: The command name.
+            key: The instruction key.
+
+        Returns:
+            The relative path of `<key>.md`, or None if the value selects a
+            file in the `<key>` directory instead.
+        """
         try:
-            return self.read(command, f"{key}.md").format(**{key: value})
-        except InstructionNotFoundError:
-            return self.read(command, key, f"{value}.md")
+            return self._kinds[command, key]
+        except KeyError:
+            relative = self._lookup(command, f"{key}.md")
+            self._kinds[command, key] = relative
+            return relative
 
     def read(self, command: str, *args: str) -> str:
         """Read the contents of an instruction file.
@@ -107,10 +363,29 @@ class Instructions:
         Raises:
             InstructionNotFoundError: If the instruction file is not found.
         """
-        path: str = self.find(command, *args)
-        with open(path, "r", encoding="utf-8") as file:
-            logger.debug("Reading instruction from '%s'", path)
-            return file.read()
+        relative: str | None = self._lookup(command, *args)
+        if relative is None:
+            self._not_found(command, *args)
+        return self._index.template(relative).source
+
+    def digest(self) -> str:
+        """Return a digest of the instruction tree.
+
+        The digest changes when an instruction file is added, removed or
+        modified, so it identifies the prompts that the tree produces.
+
+        Returns:
+            The hexadecimal digest.
+        """
+        return self._index.digest()
+
+    def cache_info(self) -> CacheInfo:
+        """Return the hit and miss statistics of the template cache.
+
+        Returns:
+            The statistics, like `functools.lru_cache`.
+        """
+        return _templates.cache.cache_info()
 
     def find(self, command: str, *args: str) -> str:
         """Find the path to an instruction file.
@@ -128,13 +403,62 @@ class Instructions:
         Raises:
             InstructionNotFoundError: If the instruction file is not found.
         """
+        relative: str | None = self._lookup(command, *args)
+        if relative is None:
+            self._not_found(command, *args)
+        return self._index.path(relative)
+
+    def _lookup(self, command: str, *args: str) -> str | None:
+        """Find an instruction file in the index without raising.
+
+        Args:
+            command: The command name.
+            *args: Additional path components.
+
+        Returns:
+            The "/" separated path of the instruction file relative to the
+            instructions directory, or None if it is not found.
+        """
+        for relative in (
+            "/".join(("commands", command, *args)),
+            "/".join(("default", *args)),
+        ):
+            if self._index.exists(relative):
+                logger.debug("Instruction found in '%s'", relative)
+                return relative
+        return None
+
+    def which(self, command: str, *args: str) -> str:
+        """Return the layer that serves an instruction file.
+
+        Args:
+            command: The command name.
+            *args: Additional path components.
+
+        Returns:
+            The directory or bundle of the layer. Without layers, this is
+            the instructions directory itself.
+
+        Raises:
+            InstructionNotFoundError: If the instruction file is not found.
+        """
+        relative: str | None = self._lookup(command, *args)
+        if relative is None:
+            self._not_found(command, *args)
+        return self._index.which(relative)
+
+    def _not_found(self, command: str, *args: str) -> NoReturn:
+        """Raise an error for an instruction file that is not found.
+
+        Args:
+            command: The command name.
+            *args: Additional path components.
+
+        Raises:
+            InstructionNotFoundError: Always.
+        """
         custom = self._join("commands", command, *args)
         default = self._join("default", *args)
-        for path in (custom, default):
-            if exists(path):
-                logger.debug("Instruction found in '%s'", path)
-                return path
-
         raise InstructionNotFoundError(
             f"No instructions found in '{custom}' or '{default}'"
         )
@@ -148,7 +472,7 @@ class Instructions:
         Returns:
             The joined path.
         """
-        return join(self._directory, *args)
+        return self._index.path("/".join(args))
 
     def list_commands(self) -> set[str]:
         """Get the set of available commands.
@@ -156,24 +480,24 @@ class Instructions:
         Returns:
             A set of command names.
         """
-        dir_commands: str = self._join("commands")
-        return self._list_dir(dir_commands)
+        return self._list_dir("commands")
 
-    def _list_dir(self, directory: str) -> set[str]:
-        """List files and directories in the given directory.
+    def _list_dir(self, relative: str) -> set[str]:
+        """List files and directories in the given indexed directory.
 
         Extension names are stripped from filenames.
 
         Args:
-            directory: The directory path.
+            relative: The directory path relative to the instructions
+                directory, using "/" as separator.
 
         Returns:
             A set of filenames and directory names.
         """
         try:
-            return set(splitext(x)[0] for x in os.listdir(directory))
+            return set(splitext(x)[0] for x in self._index.listdir(relative))
         except FileNotFoundError:
-            logger.error("Directory not found: %s", directory)
+            logger.error("Directory not found: %s", self._join(relative))
             return set()
 
     def list(self, command: str = "") -> set[str]:
@@ -186,9 +510,7 @@ class Instructions:
         Returns:
             A set of instruction names.
         """
-        dir_default: str = self._join("default")
         if not command:
-            return self._list_dir(dir_default)
+            return self._list_dir("default")
 
-        dir_commands: str = self._join("commands", command)
-        return self._list_dir(dir_commands) | self._list_dir(dir_default)
+        return self._list_dir(f"commands/{command}") | self._list_dir("default")
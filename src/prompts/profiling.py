@@ -0,0 +1,207 @@
+"""Named timing spans around the stages of a prompts call.
+
+The stages of the CLI, like building the parser, scanning the instructions
+directory, reading and formatting templates, and running an action, are
+wrapped in a `span`. Spans only cost a function call until a `Profiler` is
+started, e.g., by the `--profile` option or programmatically:
+
+```python
+from prompts import profiling
+from prompts.instructions import Instructions
+
+with profiling.profile() as profiler:
+    Instructions().make_prompt("explain", files="main.py")
+print(profiler.report())
+```
+
+The report is a JSON-serializable mapping of span names to their count and
+total and maximum duration in seconds. Optionally, a `cProfile` profile is
+captured as well, which can be inspected with `pstats`.
+"""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from typing import IO, TYPE_CHECKING, Any, ContextManager
+
+if TYPE_CHECKING:
+    import cProfile
+
+_active: "Profiler | None" = None
+_null: ContextManager[None] = nullcontext()
+
+
+class SpanStats:
+    """Accumulated timings of a span name.
+
+    Attributes:
+        count: The number of times the span was entered.
+        total: The total duration in seconds.
+        max: The longest duration in seconds.
+    """
+
+    count: int
+    total: float
+    max: float
+
+    def __init__(self) -> None:
+        """Initialize the statistics of a span that did not run yet."""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration: float) -> None:
+        """Record a single run of the span.
+
+        Args:
+            duration: The duration in seconds.
+        """
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+
+class Profiler:
+    """Collector of span timings and, optionally, a cProfile profile.
+
+    Spans of all threads are collected, so a profiler that is started in a
+    long-running process, like `prompts serve`, covers all requests.
+
+    Attributes:
+        spans: Mapping of span names to their statistics.
+        wall: The duration between `start` and `stop` in seconds.
+    """
+
+    spans: dict[str, SpanStats]
+    wall: float
+    _lock: threading.Lock
+    _start: float
+    _cprofile: "cProfile.Profile | None"
+
+    def __init__(self, cprofile: bool = False) -> None:
+        """Initialize a profiler that is not started yet.
+
+        Args:
+            cprofile: Also capture a cProfile profile of the thread that
+                starts the profiler.
+        """
+        self.spans = {}
+        self.wall = 0.0
+        self._lock = threading.Lock()
+        self._start = 0.0
+        self._cprofile = None
+        if cprofile:
+            import cProfile
+
+            self._cprofile = cProfile.Profile()
+
+    def start(self) -> None:
+        """Start collecting spans."""
+        self._start = time.perf_counter()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def stop(self) -> None:
+        """Stop collecting spans."""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self.wall = time.perf_counter() - self._start
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the body of the with statement as span `name`.
+
+        Args:
+            name: The name of the span.
+        """
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration: float = time.perf_counter() - start
+            with self._lock:
+                self.spans.setdefault(name, SpanStats()).add(duration)
+
+    def report(self) -> dict[str, Any]:
+        """Return the timing breakdown.
+
+        Returns:
+            The wall time and the statistics of each span, sorted by total
+            duration.
+        """
+        with self._lock:
+            spans = sorted(self.spans.items(), key=lambda x: -x[1].total)
+            return dict(
+                wall=self.wall,
+                spans={
+                    name: dict(count=x.count, total=x.total, max=x.max)
+                    for name, x in spans
+                },
+            )
+
+    def dump(self, file: IO[str]) -> None:
+        """Write the timing breakdown as JSON.
+
+        Args:
+            file: The file to write to.
+        """
+        import json
+
+        json.dump(self.report(), file, indent=2)
+        file.write("\n")
+
+    def dump_stats(self, path: str) -> None:
+        """Write the cProfile profile to `path`, see `pstats.Stats`.
+
+        Args:
+            path: The output file.
+
+        Raises:
+            ValueError: If the profiler does not capture a cProfile profile.
+        """
+        if self._cprofile is None:
+            raise ValueError("The profiler was created without cprofile")
+        self._cprofile.dump_stats(path)
+
+
+def span(name: str) -> ContextManager[None]:
+    """Time the body of a with statement, if a profiler is active.
+
+    Args:
+        name: The name of the span, e.g., "index.scan".
+
+    Returns:
+        A context manager.
+    """
+    profiler: Profiler | None = _active
+    return _null if profiler is None else profiler.span(name)
+
+
+def active() -> Profiler | None:
+    """Return the profiler that is collecting spans, if any."""
+    return _active
+
+
+@contextmanager
+def profile(cprofile: bool = False) -> Iterator[Profiler]:
+    """Collect spans while the with statement runs.
+
+    The previously active profiler, if any, is restored afterwards.
+
+    Args:
+        cprofile: Also capture a cProfile profile.
+
+    Yields:
+        The profiler.
+    """
+    global _active
+    previous: Profiler | None = _active
+    profiler = Profiler(cprofile=cprofile)
+    _active = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active = previous
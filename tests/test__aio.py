@@ -0,0 +1,41 @@
+"""Unit tests for the asyncio helpers of the prompts package."""
+
+import asyncio
+import sys
+import unittest
+
+from prompts import _aio
+
+
+class TestStreamSubprocess(unittest.TestCase):
+    """Test suite for streaming the output of a subprocess."""
+
+    def _run(self, code: str) -> tuple[int, list[str], list[str]]:
+        """Run Python `code` and return its return code, stdout and stderr."""
+        stdout: list[str] = []
+        stderr: list[str] = []
+        cmd = [sys.executable, "-c", code]
+        returncode = asyncio.run(
+            _aio.stream_subprocess(cmd, [stdout.append], [stderr.append])
+        )
+        return returncode, stdout, stderr
+
+    def test_lines(self) -> None:
+        """Test that the output is passed to the sinks line by line."""
+        code = "import sys; print('a\\nb'); print('c', file=sys.stderr)"
+        self.assertEqual(self._run(code), (0, ["a\n", "b\n"], ["c\n"]))
+
+    def test_long_line(self) -> None:
+        """Test that lines longer than the limit of the reader are passed."""
+        code = "import sys; print('x' * 200000); sys.stdout.write('end')"
+        returncode, stdout, _ = self._run(code)
+        self.assertEqual(returncode, 0)
+        self.assertEqual(stdout, ["x" * 200000 + "\n", "end"])
+
+    def test_returncode(self) -> None:
+        """Test that the return code of the command is returned."""
+        self.assertEqual(self._run("raise SystemExit(3)")[0], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""Unit tests for the batch mode of the prompts package."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prompts import _batch, _parser
+
+
+class TestBatch(unittest.TestCase):
+    """Test suite for generating prompts in batch mode."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        os.makedirs(os.path.join(self.test_dir, "commands", "explain"))
+        os.makedirs(os.path.join(self.test_dir, "default", "filetype"))
+        self._write("Explain", "commands", "explain", "command.md")
+        self._write("Files: {files}", "default", "files.md")
+        self._write("Python", "default", "filetype", "python.md")
+
+    def _write(self, content: str, *parts: str) -> None:
+        """Write an instruction file."""
+        with open(os.path.join(self.test_dir, *parts), "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def _generate(self, *requests: dict, **kwargs) -> list[dict]:
+        """Generate results for the given requests."""
+        lines = [json.dumps(request) for request in requests]
+        return list(_batch.generate(lines, self.test_dir, **kwargs))
+
+    def test_json(self) -> None:
+        """Test that the json action returns the prompt and the values."""
+        results = self._generate(dict(command="explain", files="a.py"))
+        expected = dict(
+            command="explain", prompt="Explain\nFiles: a.py", files="a.py"
+        )
+        self.assertEqual(results, [expected])
+
+    def test_print(self) -> None:
+        """Test that the print action only returns the prompt."""
+        request = dict(command="explain", filetype="python", action="print")
+        self.assertEqual(
+            self._generate(request), [dict(prompt="Explain\nPython")]
+        )
+
+    def test_files_list(self) -> None:
+        """Test that a list of files is joined with commas."""
+        request = dict(command="explain", files=["a.py", "b.py"])
+        self.assertEqual(self._generate(request)[0]["files"], "a.py,b.py")
+
+    def test_null(self) -> None:
+        """Test that null values are treated as values that are not given."""
+        request = dict(command="explain", files="a.py", filetype=None)
+        expected = dict(
+            command="explain", prompt="Explain\nFiles: a.py", files="a.py"
+        )
+        self.assertEqual(self._generate(request), [expected])
+        request = dict(command="explain", files="a.py", action=None)
+        self.assertEqual(self._generate(request), [expected])
+
+    def test_errors(self) -> None:
+        """Test that failing requests result in an error."""
+        results = self._generate(
+            dict(files="a.py"),
+            dict(command="explain", missing="x"),
+            dict(command="explain", action="aider"),
+        )
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertIn("error", result)
+
+    def test_order(self) -> None:
+        """Test that results keep the order of the requests."""
+        requests = [dict(command="explain", files=f"{i}.py") for i in range(50)]
+        for executor in ("thread", "process"):
+            results = self._generate(
+                *requests, workers=4, executor=executor, chunksize=3
+            )
+            files = [result["files"] for result in results]
+            self.assertEqual(files, [f"{i}.py" for i in range(50)])
+
+    def test_directories(self) -> None:
+        """Test that pools for different directories do not share builders."""
+        other_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other_dir)
+        os.makedirs(os.path.join(other_dir, "commands", "explain"))
+        with open(
+            os.path.join(other_dir, "commands", "explain", "command.md"), "w"
+        ) as file:
+            file.write("Describe")
+
+        lines = [json.dumps(dict(command="explain"))] * 20
+        first = _batch.generate(lines, self.test_dir, chunksize=1)
+        second = _batch.generate(lines, other_dir, chunksize=1)
+        for results in zip(first, second, strict=True):
+            prompts = [result["prompt"] for result in results]
+            self.assertEqual(prompts, ["Explain", "Describe"])
+
+    def test_cli(self) -> None:
+        """Test the batch subcommand from the command line."""
+        argv = ["--dir", self.test_dir, "batch", "--logfile", os.devnull]
+        with patch("sys.argv", ["prompts", *argv]):
+            args = _parser.setup(lazy=True).parse_args(argv)
+
+        stdin = io.StringIO('{"command": "explain"}\n\n')
+        stdout = io.StringIO()
+        with patch("sys.stdin", stdin), patch("sys.stdout", stdout):
+            args.func(args)
+        self.assertEqual(json.loads(stdout.getvalue())["prompt"], "Explain")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""Unit tests for the instruction bundles of the prompts package."""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prompts import _bundle, _parser
+from prompts._bundle import Bundle, BundleError
+from prompts.exceptions import InstructionNotFoundError
+from prompts.instructions import Instructions
+
+
+class TestBundle(unittest.TestCase):
+    """Test suite for packing and reading instruction bundles."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions directory and its bundle."""
+        self.test_dir = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.out_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._write("Explain", "commands", "explain", "command.md")
+        self._write("Files: {files}", "commands", "explain", "files.md")
+        self._write("Python", "commands", "explain", "filetype", "python.md")
+        self._write("Default", "default", "command.md")
+        self._write("Default files: {files}", "default", "files.md")
+        self._write("User: {user}", "default", "user.md")
+        self._write("Lua", "default", "filetype", "lua.md")
+        self.bundle = os.path.join(self.out_dir, "instructions.bundle")
+        _bundle.pack(self.test_dir, self.bundle)
+
+    def _write(self, content: str, *parts: str) -> None:
+        """Write an instruction file, creating its directories."""
+        path = os.path.join(self.test_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.out_dir)
+
+    def test_same_as_directory(self) -> None:
+        """Test that a bundle gives the same results as its directory."""
+        directory = Instructions(self.test_dir)
+        bundle = Instructions(self.bundle)
+        self.assertIsInstance(bundle._index, Bundle)
+
+        self.assertEqual(bundle.list_commands(), directory.list_commands())
+        for command in ("", "explain", "fix"):
+            self.assertEqual(bundle.list(command), directory.list(command))
+
+        requests = [
+            ("explain", dict(files="a.py", filetype="python")),
+            ("explain", dict(filetype="lua", user="me")),
+            ("fix", dict(files="a.py", filetype="lua")),
+        ]
+        for command, kwargs in requests:
+            self.assertEqual(
+                bundle.make_prompt(command, **kwargs),
+                directory.make_prompt(command, **kwargs),
+            )
+
+    def test_not_found(self) -> None:
+        """Test that missing instructions raise the same error."""
+        instructions = Instructions(self.bundle)
+        with self.assertRaises(InstructionNotFoundError):
+            instructions.make_prompt("explain", filetype="rust")
+        with self.assertRaises(InstructionNotFoundError):
+            instructions.find("explain", "missing.md")
+
+    def test_reload(self) -> None:
+        """Test that a repacked bundle is loaded again."""
+        instructions = Instructions(self.bundle)
+        self.assertEqual(instructions.read("fix", "command.md"), "Default")
+        self._write("Fix", "commands", "fix", "command.md")
+        _bundle.pack(self.test_dir, self.bundle)
+        instructions = Instructions(self.bundle)
+        self.assertEqual(instructions.read("fix", "command.md"), "Fix")
+
+    def test_invalid(self) -> None:
+        """Test that a file that is not a bundle is rejected."""
+        path = os.path.join(self.out_dir, "invalid")
+        with open(path, "w") as file:
+            file.write("not a bundle, but long enough")
+        with self.assertRaises(BundleError):
+            Instructions(path)
+
+    def test_cli(self) -> None:
+        """Test the bundle subcommand and using the bundle as --dir."""
+        output = os.path.join(self.out_dir, "cli.bundle")
+        argv = ["--dir", self.test_dir, "bundle", "-o", output]
+        argv += ["--logfile", os.devnull]
+        args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+        with patch("sys.stdout", io.StringIO()):
+            args.func(args)
+
+        argv = ["--dir", output, "explain", "--files", "a.py"]
+        argv += ["--logfile", os.devnull]
+        args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+        stdout = io.StringIO()
+        with patch("sys.stdout", stdout):
+            args.func(args)
+        self.assertCountEqual(
+            stdout.getvalue().splitlines(), ["Explain", "Files: a.py", "Python"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
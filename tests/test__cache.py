@@ -0,0 +1,144 @@
+"""Unit tests for the prompt cache of the prompts package."""
+
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from prompts import _parser
+from prompts._cache import PromptCache
+from prompts.instructions import Instructions
+
+
+class TestPromptCache(unittest.TestCase):
+    """Test suite for the PromptCache class and the `cache` subcommand."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions and cache directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._write("Explain", "commands", "explain", "command.md")
+        self._write("Files: {files}", "default", "files.md")
+        self.instructions = Instructions(self.test_dir)
+
+    def _write(self, content: str, *parts: str) -> None:
+        """Write an instruction file, creating its directories."""
+        path = os.path.join(self.test_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def _run(self, *argv: str) -> str:
+        """Run the CLI and return its output."""
+        argv = ("--dir", self.test_dir, *argv)
+        args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+        stdout = io.StringIO()
+        with patch("sys.stdout", stdout):
+            args.func(args)
+        return stdout.getvalue()
+
+    def test_hit(self) -> None:
+        """Test that a prompt is rendered once and then read from disk."""
+        cache = PromptCache()
+        for _ in range(2):
+            prompt = cache.make_prompt(self.instructions, "explain", files="a")
+            self.assertEqual(prompt, "Explain\nFiles: a")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(PromptCache().stats()["entries"], 1)
+
+    def test_hit_without_templates(self) -> None:
+        """Test that a cache hit does not read the instruction files."""
+        cache = PromptCache()
+        cache.make_prompt(self.instructions, "explain", files="a")
+        instructions = Instructions(self.test_dir)
+        with patch.object(instructions, "make_prompt") as make_prompt:
+            with patch("prompts._templates.cache.get") as get:
+                prompt = cache.make_prompt(instructions, "explain", files="a")
+        self.assertEqual(prompt, "Explain\nFiles: a")
+        make_prompt.assert_not_called()
+        get.assert_not_called()
+
+    def test_invalidation(self) -> None:
+        """Test that editing an instruction file changes the key."""
+        cache = PromptCache()
+        cache.make_prompt(self.instructions, "explain", files="a")
+        path = os.path.join(self.test_dir, "default", "files.md")
+        self._write("Changed: {files}", "default", "files.md")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        prompt = cache.make_prompt(self.instructions, "explain", files="a")
+        self.assertEqual(prompt, "Explain\nChanged: a")
+        self.assertEqual(cache.misses, 2)
+
+    def test_key(self) -> None:
+        """Test that empty values do not change the key."""
+
+        def key(**kwargs: str) -> str:
+            return PromptCache.key(self.instructions, "explain", kwargs)
+
+        self.assertEqual(key(files="a", user=""), key(files="a"))
+        self.assertNotEqual(key(files="b"), key(files="a"))
+
+    @patch("prompts._cache._EVICT_EVERY", 1)
+    def test_evict(self) -> None:
+        """Test that the least recently used prompts are evicted."""
+        cache = PromptCache(max_size=20)
+        cache.put("a", "x" * 10)
+        cache.put("b", "x" * 10)
+        old = time.time() - 60
+        os.utime(os.path.join(cache.directory, "a.txt"), (old, old))
+        cache.get("a")
+        os.utime(os.path.join(cache.directory, "b.txt"), (old, old))
+        cache.put("c", "x" * 10)
+        self.assertEqual(cache.get("a"), "x" * 10)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["size"], 20)
+
+    def test_evict_sampled(self) -> None:
+        """Test that only some writes list the cache directory."""
+        cache = PromptCache()
+        with patch.object(PromptCache, "evict") as evict:
+            for index in range(320):
+                cache.put(str(index), "x")
+        self.assertGreater(evict.call_count, 0)
+        self.assertLess(evict.call_count, 32)
+
+    def test_concurrent(self) -> None:
+        """Test that concurrent writers of the same prompt do not conflict."""
+
+        def render(_: int) -> str:
+            cache = PromptCache()
+            return cache.make_prompt(self.instructions, "explain", files="a")
+
+        with ThreadPoolExecutor(8) as pool:
+            prompts = set(pool.map(render, range(64)))
+        key = PromptCache.key(self.instructions, "explain", {"files": "a"})
+        self.assertEqual(prompts, {"Explain\nFiles: a"})
+        self.assertEqual(os.listdir(PromptCache().directory), [f"{key}.txt"])
+
+    def test_cli(self) -> None:
+        """Test `--cache` and the `cache` subcommand."""
+        self._run("explain", "--files=a")
+        self.assertIn("entries: 0", self._run("cache", "stats"))
+        output = self._run("explain", "--files=a", "--cache")
+        self.assertEqual(output, "Explain\nFiles: a\n")
+        self.assertIn("entries: 1", self._run("cache", "stats"))
+        self.assertIn("Removed 1 prompts", self._run("cache", "clear"))
+        self.assertIn("entries: 0", self._run("cache", "stats"))
+
+
+if __name__ == "__main__":
+    unittest.main()
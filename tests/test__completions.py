@@ -0,0 +1,121 @@
+"""Unit tests for the static shell completion scripts."""
+
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from prompts import _completions, _parser
+
+
+class TestCompletions(unittest.TestCase):
+    """Test suite for the `completions` subcommand."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions, output and cache directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._write("Explain", "commands", "explain", "command.md")
+        self._write("Python", "commands", "explain", "filetype", "python.md")
+        self._write("Lua", "default", "filetype", "lua.md")
+        self._write("Files: {files}", "default", "files.md")
+
+    def _write(self, content: str, *parts: str) -> None:
+        """Write an instruction file, creating its directories."""
+        path = os.path.join(self.test_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.out_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def _manifest(self) -> dict:
+        """Return the written manifest."""
+        path = os.path.join(self.out_dir, "manifest.json")
+        with open(path) as file:
+            return json.load(file)
+
+    def test_manifest(self) -> None:
+        """Test the commands, options and values in the manifest."""
+        argv = ["--dir", self.test_dir, "completions"]
+        argv += ["--output-dir", self.out_dir, "--logfile", os.devnull]
+        args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+        with patch("sys.stdout", io.StringIO()) as stdout:
+            args.func(args)
+        self.assertIn("bash: source", stdout.getvalue())
+        for name in _completions.SCRIPTS.values():
+            self.assertTrue(os.path.isfile(os.path.join(self.out_dir, name)))
+
+        manifest = self._manifest()
+        self.assertIn("explain", manifest["commands"])
+        self.assertIn("cache", manifest["commands"])
+        options = {
+            flag: option
+            for option in manifest["commands"]["explain"]["options"]
+            for flag in option["flags"]
+        }
+        self.assertEqual(options["--filetype"]["choices"], ["lua", "python"])
+        self.assertIn("json", options["--action"]["choices"])
+        self.assertFalse(options["--no-cache"]["value"])
+        arguments = manifest["commands"]["cache"]["arguments"]
+        self.assertEqual(arguments[0]["choices"], ["stats", "clear"])
+        self.assertIn("--files", manifest["commands"]["explain"]["usage"])
+
+    def test_regenerate(self) -> None:
+        """Test that the scripts are only regenerated when the tree changes."""
+        bash = os.path.join(self.out_dir, "prompts.bash")
+        _completions.generate(self.test_dir, self.out_dir)
+        os.utime(bash, (0, 0))
+        _completions.generate(self.test_dir, self.out_dir)
+        self.assertEqual(os.stat(bash).st_mtime, 0)
+
+        self._write("Bash", "default", "filetype", "bash.md")
+        _completions.generate(self.test_dir, self.out_dir)
+        self.assertNotEqual(os.stat(bash).st_mtime, 0)
+        with open(bash) as file:
+            self.assertIn("'bash lua python'", file.read())
+
+    @unittest.skipIf(shutil.which("bash") is None, "bash is not installed")
+    def test_bash(self) -> None:
+        """Test the bash script without starting the interpreter."""
+        _completions.generate(self.test_dir, self.out_dir)
+        manifest = os.path.join(self.out_dir, "manifest.json")
+        future = time.time() + 60
+        os.utime(manifest, (future, future))
+        script = (
+            f"source {os.path.join(self.out_dir, 'prompts.bash')}\n"
+            "COMP_WORDS=(prompts explain --filetype p)\n"
+            "COMP_CWORD=3\n"
+            "_prompts\n"
+            'echo "${COMPREPLY[*]}"\n'
+            "COMP_WORDS=(prompts --dir x e)\n"
+            "COMP_CWORD=3\n"
+            "_prompts\n"
+            'echo "${COMPREPLY[*]}"\n'
+        )
+        result = subprocess.run(
+            ["bash", "-c", script],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={"PATH": "/usr/bin:/bin"},
+        )
+        self.assertEqual(result.stdout.splitlines(), ["python", "explain"])
+
+
+if __name__ == "__main__":
+    unittest.main()
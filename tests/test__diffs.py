@@ -0,0 +1,155 @@
+"""Unit tests for splitting large diffs into commit prompts."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prompts import _diffs, _parser
+from prompts._diffs import Splitter
+from prompts.instructions import Instructions
+
+
+def _file(path: str, *hunks: list[str]) -> list[str]:
+    """Return the lines of the diff of a file with the given hunks."""
+    lines = [
+        f"diff --git a/{path} b/{path}\n",
+        "index 1111111..2222222 100644\n",
+        f"--- a/{path}\n",
+        f"+++ b/{path}\n",
+    ]
+    for i, hunk in enumerate(hunks):
+        lines.append(f"@@ -{i * 10},3 +{i * 10},3 @@\n")
+        lines.extend(f"{line}\n" for line in hunk)
+    return lines
+
+
+_DIFF: list[str] = [
+    *_file("main.py", [" a", "-b", "+c"], [" d", "+e"]),
+    *_file("uv.lock", ["+lock"] * 50),
+    "diff --git a/logo.png b/logo.png\n",
+    "index 1111111..2222222 100644\n",
+    "Binary files a/logo.png and b/logo.png differ\n",
+    *_file("big.py", [f"+line {i}" for i in range(100)]),
+    *_file("vendor/lib/x.go", ["+vendored"]),
+]
+
+
+class TestSplitter(unittest.TestCase):
+    """Test suite for the Splitter class."""
+
+    def test_small(self) -> None:
+        """Test that a small diff fits in a single chunk."""
+        splitter = Splitter(budget=10000)
+        chunks = list(splitter.split(_DIFF[:11]))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0].files, ["main.py"])
+        self.assertEqual(chunks[0].text, "".join(_DIFF[:11]))
+
+    def test_split(self) -> None:
+        """Test that chunks stay within the budget and skip files."""
+        splitter = Splitter(budget=300)
+        chunks = list(splitter.split(_DIFF))
+        self.assertGreater(len(chunks), 2)
+        indexes = [x.index for x in chunks]
+        self.assertEqual(indexes, list(range(1, len(chunks) + 1)))
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk.text), 300)
+            self.assertTrue(chunk.text.startswith("diff --git "))
+
+        text = "".join(x.text for x in chunks)
+        for i in range(100):
+            self.assertEqual(text.count(f"+line {i}\n"), 1)
+        self.assertIn("(continued)", text)
+        self.assertNotIn("lock", text)
+        self.assertNotIn("logo.png", text)
+        self.assertNotIn("vendored", text)
+
+    def test_overview(self) -> None:
+        """Test that all files are listed with their changes."""
+        splitter = Splitter(budget=300)
+        list(splitter.split(_DIFF))
+        self.assertEqual(
+            splitter.overview().splitlines(),
+            [
+                "- main.py (+2 -1)",
+                "- uv.lock (+50 -0), generated",
+                "- logo.png (+0 -0), binary",
+                "- big.py (+100 -0)",
+                "- vendor/lib/x.go (+1 -0), generated",
+            ],
+        )
+
+
+class TestCommitChunks(unittest.TestCase):
+    """Test suite for the commit-chunks subcommand."""
+
+    def setUp(self) -> None:
+        """Write the diff to a temporary file."""
+        self.test_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.test_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.diff = os.path.join(self.test_dir, "diff")
+        with open(self.diff, "w") as file:
+            file.writelines(_DIFF)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def test_generate(self) -> None:
+        """Test that a prompt is made per chunk, followed by a combiner."""
+        records = list(
+            _diffs.generate(Instructions(), Splitter(budget=500), _DIFF)
+        )
+        *chunks, combine = records
+        self.assertTrue(all(x["kind"] == "chunk" for x in chunks))
+        self.assertIn("## Part 1", chunks[0]["prompt"])
+        self.assertIn("## Diff\n\ndiff --git", chunks[0]["prompt"])
+        self.assertEqual(combine["kind"], "combine")
+        self.assertEqual(combine["chunks"], len(chunks))
+        self.assertEqual(
+            combine["skipped"], ["uv.lock", "logo.png", "vendor/lib/x.go"]
+        )
+        self.assertIn("- big.py (+100 -0)", combine["prompt"])
+
+    def test_not_commit_options(self) -> None:
+        """Test that the diff templates are not options of `commit`."""
+        keys = Instructions().list("commit")
+        self.assertNotIn("chunk", keys)
+        self.assertNotIn("summaries", keys)
+
+    def test_openai(self) -> None:
+        """Test that the replies are added to the combining prompt."""
+        replies = iter(["summary", "more", "again", "message"] * 10)
+        with (
+            patch("prompts._diffs._send", lambda *_: next(replies)),
+            patch("sys.stdout", io.StringIO()),
+        ):
+            records = list(
+                _diffs.generate(
+                    Instructions(), Splitter(budget=5000), _DIFF, "openai"
+                )
+            )
+        self.assertIn("### Part 1\n\nsummary", records[-1]["prompt"])
+
+    def test_cli(self) -> None:
+        """Test the subcommand from the command line."""
+        argv = ["commit-chunks", "-i", self.diff, "--budget", "400"]
+        argv += ["--skip", "big.py", "--logfile", os.devnull]
+        args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+        stdout = io.StringIO()
+        with patch("sys.stdout", stdout):
+            args.func(args)
+        records = [json.loads(x) for x in stdout.getvalue().splitlines()]
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]["files"], ["main.py"])
+        self.assertIn("big.py", records[1]["skipped"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+"""Unit tests for the expansion of `--files` and the filetype detection."""
+
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prompts import _files, _parser, _sessions
+
+
+class TestFiles(unittest.TestCase):
+    """Test suite for the `_files` module and its use by the CLI."""
+
+    def setUp(self) -> None:
+        """Set up a temporary tree of files and of instructions."""
+        self.tree = tempfile.mkdtemp()
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for path in (
+            "setup.py",
+            "README.md",
+            "src/pkg/__init__.py",
+            "src/pkg/run.sh",
+            "src/pkg/sub/deep.py",
+            "build/out.py",
+            "notes.log",
+        ):
+            self._write("", self.tree, path)
+        self._write("build/\n*.log\n# comment\n", self.tree, ".gitignore")
+
+        self._write("Explain", self.test_dir, "commands/explain/command.md")
+        self._write("Python", self.test_dir, "default/filetype/python.md")
+        self._write("Bash", self.test_dir, "default/filetype/bash.md")
+        self._write("Files: {files}", self.test_dir, "default/files.md")
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.tree)
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
+
+    @staticmethod
+    def _write(content: str, *parts: str) -> None:
+        """Write a file, creating its directories."""
+        path = os.path.join(*parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def _expand(self, value: str) -> list[str]:
+        """Expand `value` in the tree, without git."""
+        with patch("subprocess.run", side_effect=FileNotFoundError):
+            return sorted(_files.expand(value, self.tree))
+
+    def test_compile_glob(self) -> None:
+        """Test the translation of globs to regular expressions."""
+        cases = [
+            ("*.py", "setup.py", True),
+            ("*.py", "src/setup.py", False),
+            ("src/**/*.py", "src/a.py", True),
+            ("src/**/*.py", "src/a/b/c.py", True),
+            ("src/?.py", "src/ab.py", False),
+            ("[!a]*.py", "b.py", True),
+            ("[!a]*.py", "a.py", False),
+            ("a+b.py", "a+b.py", True),
+        ]
+        for pattern, path, expected in cases:
+            match = _files.compile_glob(pattern).fullmatch(path)
+            self.assertEqual(match is not None, expected, (pattern, path))
+
+    def test_expand_walk(self) -> None:
+        """Test globs, directories and literals, honoring `.gitignore`."""
+        self.assertEqual(
+            self._expand("**/*.py"),
+            ["setup.py", "src/pkg/__init__.py", "src/pkg/sub/deep.py"],
+        )
+        self.assertEqual(
+            self._expand("./src/pkg/,missing.py"),
+            [
+                "missing.py",
+                "src/pkg/__init__.py",
+                "src/pkg/run.sh",
+                "src/pkg/sub/deep.py",
+            ],
+        )
+        self.assertEqual(self._expand("src/*.py"), [])
+        self.assertEqual(self._expand("build/*.py"), ["build/out.py"])
+
+    def test_expand_order(self) -> None:
+        """Test that the order of the items is kept without duplicates."""
+        with patch("subprocess.run", side_effect=FileNotFoundError):
+            files = _files.expand("README.md,*.md,*.py", self.tree)
+        self.assertEqual(files, ["README.md", "setup.py"])
+
+    @unittest.skipIf(shutil.which("git") is None, "git is not installed")
+    def test_expand_git(self) -> None:
+        """Test that the files are listed from the git index."""
+        subprocess.run(["git", "init", "-q", self.tree], check=True)
+        self._write("", self.tree, "src/pkg/ignored.py")
+        self._write("ignored.py\n", self.tree, "src/pkg/.gitignore")
+        files = sorted(_files.expand("**/*.py", self.tree))
+        self.assertEqual(
+            files, ["setup.py", "src/pkg/__init__.py", "src/pkg/sub/deep.py"]
+        )
+
+    def test_group(self) -> None:
+        """Test the detection of filetypes from extensions."""
+        index = _files.extension_index({"python", "lua"})
+        self.assertEqual(index["py"], "python")
+        self.assertEqual(index["lua"], "lua")
+        self.assertNotIn("sh", index)
+        groups = _files.group(["a.lua", "b.PY", "c.sh", "d.py"], index)
+        self.assertEqual(
+            groups, {"lua": ["a.lua"], "python": ["b.PY", "d.py"], "": ["c.sh"]}
+        )
+
+    def test_cli(self) -> None:
+        """Test that a prompt is generated per filetype."""
+        argv = ("--dir", self.test_dir, "explain", "--files", "src")
+        argv = (*argv, "--action", "json")
+        args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+        stdout = io.StringIO()
+        with patch("sys.stdout", stdout), _sessions.workdir(self.tree):
+            args.func(args)
+        rows = [json.loads(x) for x in stdout.getvalue().splitlines()]
+        self.assertEqual(
+            [(x["filetype"], x["files"]) for x in rows],
+            [
+                ("python", "src/pkg/__init__.py,src/pkg/sub/deep.py"),
+                ("bash", "src/pkg/run.sh"),
+            ],
+        )
+        self.assertIn("Python", rows[0]["prompt"])
@@ -0,0 +1,163 @@
+"""Unit tests for the OpenAI-compatible HTTP client and action."""
+
+import io
+import json
+import os
+import threading
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from prompts import _http
+from prompts.actions import ActionFactory
+from prompts.exceptions import OpenAIActionError
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Stub chat completions endpoint that streams the prompt back."""
+
+    protocol_version = "HTTP/1.1"
+    connections: int = 0
+    requests: list[dict] = []
+
+    def setup(self) -> None:
+        """Count the number of connections."""
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self) -> None:
+        """Stream the words of the user message as tokens."""
+        length = int(self.headers["Content-Length"])
+        request = json.loads(self.rfile.read(length))
+        type(self).requests.append(request)
+        prompt = request["messages"][0]["content"]
+        if prompt == "error":
+            self._respond(500, b"boom", "text/plain")
+            return
+        if prompt == "malformed":
+            self._respond(200, b"data: {not json\n\n", "text/event-stream")
+            return
+        if prompt == "truncated":
+            self.close_connection = True
+            self.send_response(200)
+            self.send_header("Content-Length", "1000")
+            self.end_headers()
+            self.wfile.write(b'data: {"choices": []}\n\n')
+            return
+
+        events = [
+            dict(choices=[dict(delta=dict(content=f"{word} "))])
+            for word in prompt.split()
+        ]
+        body = "".join(f"data: {json.dumps(x)}\n\n" for x in events)
+        body += "data: [DONE]\n\n"
+        self._respond(200, body.encode(), "text/event-stream")
+
+    def _respond(self, status: int, body: bytes, content_type: str) -> None:
+        """Send a response with a content length, keeping the connection."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        """Silence the request log."""
+
+
+class TestHttp(unittest.TestCase):
+    """Test suite for the streaming client, using a stub server."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Start the stub server."""
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}/v1"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Stop the stub server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        """Reset the request statistics."""
+        _Handler.connections = 0
+        _Handler.requests = []
+
+    def test_stream(self) -> None:
+        """Test that tokens are passed to the sink as they arrive."""
+        pool = _http.ConnectionPool()
+        self.addCleanup(pool.close)
+        tokens: list[str] = []
+        reply = _http.stream_chat(
+            pool, self.base_url, "hello world", tokens.append, model="m"
+        )
+        self.assertEqual(tokens, ["hello ", "world "])
+        self.assertEqual(reply, "hello world ")
+        self.assertEqual(_Handler.requests[0]["model"], "m")
+        self.assertTrue(_Handler.requests[0]["stream"])
+
+    def test_keep_alive(self) -> None:
+        """Test that connections are reused by later requests."""
+        pool = _http.ConnectionPool()
+        self.addCleanup(pool.close)
+        for _ in range(3):
+            _http.stream_chat(pool, self.base_url, "hi", lambda _: None)
+        self.assertEqual(_Handler.connections, 1)
+
+    def test_reconnect(self) -> None:
+        """Test that a closed keep-alive connection is replaced."""
+        pool = _http.ConnectionPool()
+        self.addCleanup(pool.close)
+        _http.stream_chat(pool, self.base_url, "hi", lambda _: None)
+        for connections in pool._idle.values():
+            for connection in connections:
+                connection.sock.close()
+                connection.sock = None
+                connection.auto_open = 1
+        reply = _http.stream_chat(pool, self.base_url, "hi", lambda _: None)
+        self.assertEqual(reply, "hi ")
+
+    def test_error(self) -> None:
+        """Test that an error status raises an HTTPError."""
+        pool = _http.ConnectionPool()
+        self.addCleanup(pool.close)
+        with self.assertRaises(_http.HTTPError):
+            _http.stream_chat(pool, self.base_url, "error", lambda _: None)
+
+    def test_invalid_stream(self) -> None:
+        """Test that a cut off or malformed stream raises an HTTPError."""
+        pool = _http.ConnectionPool()
+        self.addCleanup(pool.close)
+        for prompt in ("malformed", "truncated"):
+            with self.subTest(prompt), self.assertRaises(_http.HTTPError):
+                _http.stream_chat(pool, self.base_url, prompt, lambda _: None)
+
+    def test_action(self) -> None:
+        """Test that the openai action streams the reply to stdout."""
+        action = ActionFactory("openai").create("hello there", command="fix")
+        stdout = io.StringIO()
+        env = dict(PROMPTS_OPENAI_BASE_URL=self.base_url)
+        with patch.dict(os.environ, env), redirect_stdout(stdout):
+            action()
+        self.assertEqual(stdout.getvalue(), "hello there \n")
+
+    def test_action_error(self) -> None:
+        """Test that a failing request raises an OpenAIActionError."""
+        env = dict(PROMPTS_OPENAI_BASE_URL=self.base_url)
+        for prompt in ("error", "malformed", "truncated"):
+            action = ActionFactory("openai").create(prompt, command="fix")
+            with (
+                self.subTest(prompt),
+                patch.dict(os.environ, env),
+                redirect_stdout(io.StringIO()),
+                self.assertRaises(OpenAIActionError),
+            ):
+                action()
+
+
+if __name__ == "__main__":
+    unittest.main()
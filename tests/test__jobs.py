@@ -0,0 +1,180 @@
+"""Unit tests for the resumable job queue."""
+
+import io
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from prompts import _jobs, _parser
+from prompts.actions import Json
+from prompts.exceptions import AiderActionError, JobError
+
+
+class TestJobs(unittest.TestCase):
+    """Test suite for the job store and the `jobs` subcommand."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions directory, cache and job store."""
+        self.test_dir = tempfile.mkdtemp()
+        self.state_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.state_dir, "jobs.db")
+        patcher = patch("prompts._paths.jobs", self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._write("Explain", "commands", "explain", "command.md")
+        self._write("Files: {files}", "default", "files.md")
+
+    def _write(self, content: str, *parts: str) -> None:
+        """Write an instruction file, creating its directories."""
+        path = os.path.join(self.test_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.state_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def _run(self, *argv: str) -> tuple[str, str]:
+        """Run the CLI and return its output and the summary."""
+        argv = ("--dir", self.test_dir, *argv, "--logfile", os.devnull)
+        args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with patch("sys.stdout", stdout), patch("sys.stderr", stderr):
+            args.func(args)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def _queue(self) -> tuple[str, str]:
+        """Queue and run a job per file with the json action."""
+        argv = ["explain", "--files", "a.py,b.py", "--queue"]
+        return self._run(*argv, "--action", "json")
+
+    def test_queue(self) -> None:
+        """Test that a job runs per file and done jobs are skipped."""
+        output, summary = self._queue()
+        rows = [json.loads(x) for x in output.splitlines()]
+        self.assertEqual([x["files"] for x in rows], ["a.py", "b.py"])
+        self.assertEqual(rows[0]["prompt"], "Explain\nFiles: a.py")
+        self.assertIn("2 of 2 jobs succeeded", summary)
+
+        jobs = _jobs.JobStore().jobs()
+        self.assertEqual([x.status for x in jobs], ["done", "done"])
+        self.assertEqual([x.exitcode for x in jobs], [0, 0])
+
+        output, summary = self._queue()
+        self.assertEqual(output, "")
+        self.assertIn("No jobs to run", summary)
+        self.assertEqual(len(_jobs.JobStore().jobs()), 2)
+
+    def test_retry(self) -> None:
+        """Test that failed jobs are recorded and can be retried."""
+        call = Json.__call__
+
+        def fail(action: Json) -> None:
+            if action._kwargs["files"] == "a.py":
+                raise RuntimeError("boom")
+            call(action)
+
+        with patch.object(Json, "__call__", fail):
+            with self.assertRaises(JobError) as context:
+                self._queue()
+        self.assertIn("prompts jobs retry", str(context.exception))
+
+        output, _ = self._run("jobs", "list", "--status", "failed")
+        self.assertRegex(output, r"1  failed   explain  a.py .*exit 1")
+        self.assertIn("RuntimeError: boom", output)
+
+        output, summary = self._run("jobs", "retry")
+        self.assertEqual(json.loads(output)["files"], "a.py")
+        self.assertIn("1 of 1 jobs succeeded", summary)
+        output, _ = self._run("jobs", "list", "--json")
+        jobs = [json.loads(x) for x in output.splitlines()]
+        self.assertEqual([x["status"] for x in jobs], ["done", "done"])
+        self.assertEqual(jobs[0]["attempts"], 2)
+
+    def test_exitcode(self) -> None:
+        """Test that the return code of aider is stored as the exit code."""
+
+        def fail(action: Json) -> None:
+            raise AiderActionError("Aider command failed", 3)
+
+        with patch.object(Json, "__call__", fail):
+            with self.assertRaises(JobError):
+                self._queue()
+        jobs = _jobs.JobStore().jobs()
+        self.assertEqual([x.exitcode for x in jobs], [3, 3])
+
+    def test_resume(self) -> None:
+        """Test that pending and interrupted jobs are resumed."""
+        store = _jobs.JobStore()
+        items = [
+            (f"Prompt {x}", {"command": "explain", "files": x}, {})
+            for x in ["a.py", "b.py", "c.py"]
+        ]
+        ids = store.add("print", items)
+        self.assertEqual(ids, [1, 2, 3])
+        self.assertEqual(store.claim(1).prompt, "Prompt a.py")
+        self.assertIsNone(store.claim(1))
+
+        # The process of a running job is alive, so it is not resumed.
+        self.assertEqual(store.add("print", items), [2, 3])
+        self.assertEqual(store.requeue("running"), [])
+
+        # The process died while the job was running.
+        dead = self._dead_pid()
+        with sqlite3.connect(self.path) as connection:
+            connection.execute("UPDATE jobs SET pid = ? WHERE id = 1", (dead,))
+        output, summary = self._run("jobs", "resume")
+        self.assertEqual(
+            output.splitlines(), ["Prompt a.py", "Prompt b.py", "Prompt c.py"]
+        )
+        self.assertIn("3 of 3 jobs succeeded", summary)
+
+    def _dead_pid(self) -> int:
+        """Return the id of a process that exited."""
+        process = subprocess.Popen(["true"])
+        process.wait()
+        return process.pid
+
+    def test_work(self) -> None:
+        """Test that the workers run at most the given number of jobs."""
+        store = _jobs.JobStore()
+        items = [
+            (str(x), {"command": "explain", "files": str(x)}, {})
+            for x in range(6)
+        ]
+        running: list[int] = []
+        peak: list[int] = [0]
+        lock = threading.Lock()
+
+        def call(action: Json) -> None:
+            with lock:
+                running.append(1)
+                peak[0] = max(peak[0], len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+
+        with patch.object(Json, "__call__", call):
+            jobs = _jobs.work(store, store.add("json", items), workers=3)
+        self.assertEqual([x.status for x in jobs], ["done"] * 6)
+        self.assertLessEqual(peak[0], 3)
+        self.assertGreater(peak[0], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+"""Unit tests for the non-blocking logging of the prompts package."""
+
+import argparse
+import io
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+from unittest.mock import patch
+
+from prompts import _logqueue
+from prompts._logger import logger
+
+
+class TestLogQueue(unittest.TestCase):
+    """Test suite for the queue-based logging pipeline."""
+
+    def setUp(self) -> None:
+        """Set up a temporary log file."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.logfile = os.path.join(self.tmp_dir, "state", "prompts.log")
+
+    def tearDown(self) -> None:
+        """Stop the listener and remove the log file."""
+        _logqueue.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def _read(self) -> str:
+        """Stop the listener and return the contents of the log file."""
+        _logqueue.stop()
+        with open(self.logfile) as file:
+            return file.read()
+
+    def test_setup(self) -> None:
+        """Test that records are written and handlers are not duplicated."""
+        _logqueue.setup(self.logfile, "INFO")
+        _logqueue.setup(self.logfile, "INFO")
+        handlers = [
+            x for x in logger.handlers if isinstance(x, _logqueue._Handler)
+        ]
+        self.assertEqual(len(handlers), 1)
+        logger.info("Hello %s", "world")
+        logger.debug("Not written")
+        contents = self._read()
+        self.assertIn("INFO - bartste_prompts@test__logqueue", contents)
+        self.assertIn("Hello world", contents)
+        self.assertNotIn("Not written", contents)
+
+    def test_truncate(self) -> None:
+        """Test that large arguments are truncated and hashed."""
+        _logqueue.setup(self.logfile, "DEBUG")
+        logger.debug("Prompt: %s", "x" * 100000)
+        logger.debug("y" * 100000)
+        contents = self._read()
+        self.assertEqual(contents.count("... [100000 characters, sha1 "), 2)
+        self.assertLess(len(contents), 10000)
+
+    def test_truncate_objects(self) -> None:
+        """Test that objects with a large repr are truncated as well."""
+        _logqueue.setup(self.logfile, "DEBUG")
+        args = argparse.Namespace(command="commit", user="x" * 100000)
+        logger.debug("Parsed arguments: %s", args)
+        logger.debug("Count: %d", 3)
+        contents = self._read()
+        self.assertIn("Parsed arguments: Namespace(command='commit'", contents)
+        self.assertIn(f"... [{len(repr(args))} characters, sha1 ", contents)
+        self.assertIn("Count: 3", contents)
+        self.assertLess(len(contents), 10000)
+
+    def test_fork(self) -> None:
+        """Test that a forked child logs through the parent's listener."""
+        _logqueue.setup(self.logfile, "INFO")
+        with warnings.catch_warnings():
+            # The listener thread is not used by the child.
+            warnings.simplefilter("ignore", DeprecationWarning)
+            pid: int = os.fork()
+        if pid == 0:
+            code: int = 0 if _logqueue._listener is None else 1
+            logger.info("Hello from the child")
+            os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        contents = self._read()
+        self.assertEqual(contents.count("Hello from the child"), 1)
+
+    def test_closed_stderr(self) -> None:
+        """Test that a replaced and closed stderr is not written to."""
+        stderr = io.StringIO()
+        with patch("sys.stderr", stderr):
+            _logqueue.setup(self.logfile, "INFO")
+            logger.info("Hello %s", "world")
+        stderr.close()
+        self.assertIn("Hello world", self._read())
+
+    def test_drop_oldest(self) -> None:
+        """Test that the oldest records are dropped when the queue is full."""
+        records = _logqueue._DroppingQueue(2)
+        for message in ("a", "b", "c"):
+            record = logging.makeLogRecord(dict(msg=message))
+            records.put(record, block=True)
+        self.assertEqual(records.dropped, 1)
+        self.assertEqual(records.get_nowait().msg, "b")
+        self.assertEqual(records.get_nowait().msg, "c")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Unit tests for the argument parser of the prompts package."""
+
+import argparse
+import io
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prompts import _parser
+
+
+def _subparsers(parser: argparse.ArgumentParser) -> dict:
+    """Return the mapping of command names to subparsers."""
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            return action.choices
+    raise AssertionError("No subparsers configured")
+
+
+def _options(parser: argparse.ArgumentParser) -> set[str]:
+    """Return the long option strings of a parser."""
+    return {
+        option
+        for action in parser._actions
+        for option in action.option_strings
+        if option.startswith("--")
+    }
+
+
+class TestSetup(unittest.TestCase):
+    """Test suite for the setup function."""
+
+    def setUp(self) -> None:
+        """Set up a temporary cache directory for the instruction index."""
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary cache directory."""
+        shutil.rmtree(self.cache_dir)
+
+    def test_full(self) -> None:
+        """Test that all subcommands are configured by default."""
+        with patch("sys.argv", ["prompts", "fix"]):
+            parser = _parser.setup()
+        for name, subparser in _subparsers(parser).items():
+            if name not in _parser._BUILTINS:
+                self.assertIn("--action", _options(subparser))
+
+    def test_lazy_configures_selected_command(self) -> None:
+        """Test that lazy mode only adds the selected command."""
+        argv = ["prompts", "fix", "--files", "a.py"]
+        with patch("sys.argv", argv):
+            parser = _parser.setup(lazy=True)
+
+        subparsers = _subparsers(parser)
+        self.assertEqual(list(subparsers), ["fix"])
+        self.assertIn("--files", _options(subparsers["fix"]))
+        args = parser.parse_args(argv[1:])
+        self.assertEqual(args.command, "fix")
+        self.assertEqual(args.files, "a.py")
+
+    def test_lazy_help(self) -> None:
+        """Test that all commands are listed with --help before a command."""
+        with patch("sys.argv", ["prompts", "--help", "fix"]):
+            parser = _parser.setup(lazy=True)
+        self.assertIn("explain", _subparsers(parser))
+
+    def test_lazy_error(self) -> None:
+        """Test that all commands are added when parsing fails."""
+        with patch("sys.argv", ["prompts", "fix"]):
+            parser = _parser.setup(lazy=True)
+        stderr = io.StringIO()
+        with self.assertRaises(SystemExit), patch("sys.stderr", stderr):
+            parser.parse_args(["fix", "--unknown"])
+        self.assertIn("explain", stderr.getvalue())
+        self.assertIn("serve", _subparsers(parser))
+
+    def test_lazy_without_command(self) -> None:
+        """Test that lazy mode still lists all commands."""
+        with patch("sys.argv", ["prompts"]):
+            parser = _parser.setup(lazy=True)
+        self.assertIn("fix", _subparsers(parser))
+
+    def test_lazy_builtin(self) -> None:
+        """Test that a builtin subcommand is configured when selected."""
+        with patch("sys.argv", ["prompts", "serve"]):
+            parser = _parser.setup(lazy=True)
+        self.assertIn("--socket", _options(_subparsers(parser)["serve"]))
+
+    def test_preparse_command(self) -> None:
+        """Test that the command is found after the --dir option."""
+        argv = ["prompts", "--dir", "/tmp", "explain", "--user", "x"]
+        with patch("sys.argv", argv):
+            self.assertEqual(_parser._preparse_command(), "explain")
+
+
+class TestActionNames(unittest.TestCase):
+    """Test suite for the lazy action names."""
+
+    def test_contains(self) -> None:
+        """Test membership of the available action names."""
+        names = _parser._ActionNames()
+        self.assertIn("print", names)
+        self.assertNotIn("foo", names)
+        self.assertIn("json", list(names))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""Unit tests for running several commands with `prompts run`."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prompts import _parser, _pipeline, _sessions
+from prompts.exceptions import PipelineError
+
+
+class TestPipeline(unittest.TestCase):
+    """Test suite for the `run` subcommand."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._write("Explain", "commands", "explain", "command.md")
+        self._write("Fix", "commands", "fix", "command.md")
+        self._write("Issue: {issue}", "commands", "fix", "issue.md")
+        self._write("Files: {files}", "default", "files.md")
+
+    def _write(self, content: str, *parts: str) -> None:
+        """Write an instruction file, creating its directories."""
+        path = os.path.join(self.test_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def _run(self, *argv: str) -> tuple[str, str]:
+        """Run the CLI and return its output and the summary."""
+        argv = ("--dir", self.test_dir, "run", *argv, "--logfile", os.devnull)
+        args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with patch("sys.stdout", stdout), patch("sys.stderr", stderr):
+            args.func(args)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_run(self) -> None:
+        """Test that the commands share the values of the options."""
+        argv = ["fix,explain", "--files", "a.py", "--issue", "crash"]
+        output, summary = self._run(*argv, "--action", "json")
+        rows = [json.loads(x) for x in output.splitlines()]
+        self.assertEqual([x["command"] for x in rows], ["fix", "explain"])
+        self.assertEqual(rows[0]["issue"], "crash")
+        self.assertNotIn("issue", rows[1])
+        self.assertEqual(rows[1]["files"], "a.py")
+        self.assertRegex(summary, r"fix +ok +\d+\.\d\ds")
+        self.assertIn("2 of 2 stages succeeded", summary)
+
+    def test_glob_characters(self) -> None:
+        """Test that expanded paths with glob characters are kept."""
+        tree = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tree)
+        os.makedirs(os.path.join(tree, "app"))
+        for name in ["[id].tsx", "page.tsx"]:
+            with open(os.path.join(tree, "app", name), "w"):
+                pass
+        with _sessions.workdir(tree):
+            output, _ = self._run("explain", "--files", "app", "-a", "json")
+        files = json.loads(output)["files"]
+        self.assertEqual(
+            sorted(files.split(",")), ["app/[id].tsx", "app/page.tsx"]
+        )
+
+    def test_unknown_command(self) -> None:
+        """Test that unknown commands are rejected by the parser."""
+        with self.assertRaises(SystemExit), patch("sys.stderr"):
+            self._run("fix,missing")
+
+    def test_failure(self) -> None:
+        """Test that a failed stage stops the pipeline unless keep going."""
+        execute = _parser.execute
+
+        def fail(args, builder, expand):
+            if args.command == "fix":
+                raise RuntimeError("boom")
+            execute(args, builder, expand)
+
+        with patch("prompts._parser.execute", side_effect=fail):
+            with self.assertRaises(PipelineError) as context:
+                self._run("fix,explain")
+            self.assertIn("fix", str(context.exception))
+
+            argv = ("--dir", self.test_dir, "run", "fix,explain")
+            args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+            with patch("sys.stdout", io.StringIO()):
+                stages = _pipeline.execute(args)
+            self.assertEqual([x.status for x in stages], ["failed", "skipped"])
+
+            args.keep_going = True
+            with patch("sys.stdout", io.StringIO()) as stdout:
+                stages = _pipeline.execute(args)
+            self.assertEqual([x.status for x in stages], ["failed", "ok"])
+            self.assertEqual(stdout.getvalue(), "Explain\n")
+        summary = _pipeline.summary(stages)
+        self.assertIn("RuntimeError: boom", summary)
+        self.assertIn("1 of 2 stages succeeded", summary)
+
+    def test_session(self) -> None:
+        """Test that the aider stages share one aider session."""
+        actions: list[str] = []
+        with (
+            patch("prompts._parser.execute") as execute,
+            patch("prompts._sessions.pool.close") as close,
+        ):
+            execute.side_effect = lambda args, *_: actions.append(args.action)
+            self._run("fix,explain", "--action", "aider-code")
+        self.assertEqual(actions, ["aider-session-code"] * 2)
+        close.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
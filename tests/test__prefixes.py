@@ -0,0 +1,84 @@
+"""Unit tests for the prefix report and the stable layout of the prompts."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prompts import _parser
+
+
+class TestPrefixes(unittest.TestCase):
+    """Test suite for the `prefix-report` subcommand and `--layout`."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._write("Explain", "commands", "explain", "command.md")
+        self._write("Python", "commands", "explain", "filetype", "python.md")
+        self._write("Lua code", "default", "filetype", "lua.md")
+        self._write("Files: {files}", "default", "files.md")
+
+    def _write(self, content: str, *parts: str) -> None:
+        """Write an instruction file, creating its directories."""
+        path = os.path.join(self.test_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def _run(self, *argv: str) -> str:
+        """Run the CLI and return its output."""
+        argv = ("--dir", self.test_dir, *argv)
+        args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+        stdout = io.StringIO()
+        with patch("sys.stdout", stdout):
+            args.func(args)
+        return stdout.getvalue()
+
+    def test_report(self) -> None:
+        """Test the prefix of the command and of each filetype."""
+        output = self._run("prefix-report", "--json")
+        rows = [json.loads(x) for x in output.splitlines()]
+        self.assertEqual(
+            [(x["key"], x["value"], x["chars"]) for x in rows],
+            [
+                ("", "", len("Explain")),
+                ("filetype", "lua", len("Explain\nLua code")),
+                ("filetype", "python", len("Explain\nPython")),
+            ],
+        )
+        table = self._run("prefix-report", "explain").splitlines()
+        self.assertEqual(
+            table[2].split(), ["explain", "filetype=lua", "16", "4"]
+        )
+
+    def test_cache_breakpoints(self) -> None:
+        """Test the stable layout and the breakpoint in the json output."""
+        output = self._run(
+            "explain",
+            "--action=json",
+            "--layout=stable",
+            "--cache-breakpoints",
+            "--files=a.py",
+            "--filetype=python",
+        )
+        result = json.loads(output)
+        self.assertEqual(result["prompt"], "Explain\nPython\nFiles: a.py")
+        self.assertEqual(result["cache_breakpoints"], [len("Explain\nPython")])
+
+
+if __name__ == "__main__":
+    unittest.main()
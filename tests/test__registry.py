@@ -0,0 +1,84 @@
+"""Unit tests for the action registry of the prompts package."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from importlib.metadata import EntryPoint
+from unittest.mock import patch
+
+from prompts._registry import GROUP, Registry
+from prompts.actions import AbstractAction, Json, Print
+
+# Module of a plugin that provides the `shout` action.
+_PLUGIN = """
+from prompts.actions import Print
+
+class Shout(Print):
+    def __call__(self):
+        print(self.prompt.upper())
+"""
+
+
+class TestRegistry(unittest.TestCase):
+    """Test suite for the Registry class, using a plugin module."""
+
+    def setUp(self) -> None:
+        """Write the plugin module and register it as an entry point."""
+        self.tmp_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.tmp_dir, "shout_plugin.py"), "w") as file:
+            file.write(_PLUGIN)
+        sys.path.insert(0, self.tmp_dir)
+        entries = [
+            EntryPoint("shout", "shout_plugin:Shout", GROUP),
+            EntryPoint("print", "shout_plugin:Shout", GROUP),
+        ]
+        patcher = patch("importlib.metadata.entry_points", return_value=entries)
+        self.entry_points = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        """Remove the plugin module."""
+        sys.path.remove(self.tmp_dir)
+        sys.modules.pop("shout_plugin", None)
+        shutil.rmtree(self.tmp_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def test_builtin(self) -> None:
+        """Test that builtin actions do not scan the entry points."""
+        registry = Registry()
+        self.assertIn("json", registry)
+        self.assertIs(registry.load("json"), Json)
+        self.assertEqual(registry.load("aider-code").__name__, "code")
+        self.entry_points.assert_not_called()
+
+    def test_plugin(self) -> None:
+        """Test that a plugin is only imported when it is loaded."""
+        registry = Registry()
+        self.assertIn("shout", registry.names())
+        self.assertNotIn("shout_plugin", sys.modules)
+        factory = registry.load("shout")
+        self.assertTrue(issubclass(factory, AbstractAction))
+        self.assertIs(registry.load("print"), Print)
+        self.entry_points.assert_called_once_with(group=GROUP)
+
+    def test_register(self) -> None:
+        """Test registering an action and loading an unknown action."""
+        registry = Registry()
+        registry.register("echo", Print)
+        registry.register("broken", "shout_plugin:Missing")
+        self.assertIs(registry.load("echo"), Print)
+        with self.assertRaisesRegex(ValueError, "Could not load"):
+            registry.load("broken")
+        with self.assertRaisesRegex(ValueError, "No tool available"):
+            registry.load("missing")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""Unit tests for the prompt server and its client."""
+
+import io
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+from prompts import _client
+from prompts.instructions import Instructions
+
+
+class TestServer(unittest.TestCase):
+    """Test suite for the server, which is started in a subprocess."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Start a server on a temporary socket."""
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.socket = os.path.join(cls.tmp_dir, "prompts.sock")
+        src = os.path.join(os.path.dirname(__file__), "..", "src")
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.path.abspath(src),
+            XDG_CACHE_HOME=cls.tmp_dir,
+        )
+        cls.process = subprocess.Popen(
+            [sys.executable, "-m", "prompts", "serve", "--socket", cls.socket],
+            env=env,
+        )
+        # The socket file exists before the server listens, so wait until a
+        # connection is accepted.
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                with socket.socket(socket.AF_UNIX) as client:
+                    client.connect(cls.socket)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("Server did not start")
+                time.sleep(0.01)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Stop the server and remove the temporary directory."""
+        cls.process.terminate()
+        cls.process.wait(timeout=10)
+        shutil.rmtree(cls.tmp_dir)
+
+    def _request(self, *argv: str) -> tuple[int | None, str, str]:
+        """Send a request and return the status, stdout and stderr."""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            status = _client.request(argv, self.socket)
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_print(self) -> None:
+        """Test that the server prints the same prompt as the CLI."""
+        status, stdout, _ = self._request("explain", "--user", "hi")
+        expected = Instructions().make_prompt("explain", user="hi")
+        self.assertEqual(status, 0)
+        self.assertEqual(stdout, f"{expected}\n")
+
+    def test_json(self) -> None:
+        """Test that the json action is handled by the server."""
+        status, stdout, _ = self._request("fix", "--action", "json")
+        self.assertEqual(status, 0)
+        self.assertEqual(json.loads(stdout)["command"], "fix")
+
+    def test_parse_error(self) -> None:
+        """Test that argparse errors are sent to the client."""
+        status, _, stderr = self._request("fix", "--unknown")
+        self.assertEqual(status, 2)
+        self.assertIn("unrecognized arguments", stderr)
+
+    def test_fallback(self) -> None:
+        """Test that other actions are run by the client."""
+        status, stdout, _ = self._request("fix", "--action", "aider")
+        self.assertIsNone(status)
+        self.assertEqual(stdout, "")
+
+    def test_no_server(self) -> None:
+        """Test that the client falls back when no server is running."""
+        path = os.path.join(self.tmp_dir, "missing.sock")
+        self.assertIsNone(_client.request(["fix"], path))
+
+    def test_already_running(self) -> None:
+        """Test that a second server cannot use the same socket."""
+        from prompts._server import Server
+
+        with self.assertRaises(OSError):
+            Server(self.socket)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+"""Unit tests for the aider sessions of the prompts package."""
+
+import asyncio
+import io
+import os
+import re
+import shutil
+import signal
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from prompts import _sessions
+from prompts._sessions import Pool, Session, SessionError
+from prompts.actions import ActionFactory
+
+# Stub for an interactive aider process. It prints an input prompt, replies
+# to multi-line messages with its pid and the message, and to /add commands,
+# whose file names are parsed like aider does.
+_AIDER = f"""#!{sys.executable}
+import os, re, sys
+print("Aider stub")
+sys.stdout.write("> ")
+sys.stdout.flush()
+for line in sys.stdin:
+    line = line.rstrip("\\n")
+    if line.startswith("{{"):
+        tag, body = line[1:], []
+        for line in sys.stdin:
+            if line.rstrip("\\n") == tag + "}}":
+                break
+            body.append(line.rstrip("\\n"))
+        print(f"{{os.getpid()}}: " + " | ".join(body))
+    elif line.startswith("/add "):
+        names = re.findall(r'"(.+?)"|(\\S+)', line[5:])
+        print("Added", ", ".join(a or b for a, b in names))
+    sys.stdout.write("> ")
+    sys.stdout.flush()
+"""
+
+
+class TestSessions(unittest.TestCase):
+    """Test suite for aider sessions, using a stub aider executable."""
+
+    def setUp(self) -> None:
+        """Create the stub executable."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.aider = self._executable("aider", _AIDER)
+
+    def _executable(self, name: str, content: str) -> str:
+        """Create an executable script and return its path."""
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w") as file:
+            file.write(content)
+        os.chmod(path, 0o755)
+        return path
+
+    def tearDown(self) -> None:
+        """Remove the stub executable."""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_send(self) -> None:
+        """Test that a multi-line message is answered."""
+        session = Session(self.tmp_dir, self.aider)
+        self.addCleanup(session.close)
+        lines: list[str] = []
+        session.send("first\nsecond", lines.append)
+        self.assertEqual(lines, [f"{session.pid}: first | second\n"])
+
+    def test_add(self) -> None:
+        """Test that files are only added once."""
+        session = Session(self.tmp_dir, self.aider)
+        self.addCleanup(session.close)
+        lines: list[str] = []
+        session.add(["a.py", "b.py"], lines.append)
+        session.add(["a.py", "c.py"], lines.append)
+        self.assertEqual(lines, ["Added a.py, b.py\n", "Added c.py\n"])
+
+    def test_add_whitespace(self) -> None:
+        """Test that paths with whitespace are added as a single file."""
+        session = Session(self.tmp_dir, self.aider)
+        self.addCleanup(session.close)
+        lines: list[str] = []
+        session.add(["my file.py", "b.py"], lines.append)
+        self.assertEqual(lines, ["Added my file.py, b.py\n"])
+
+    def test_exit_before_ready(self) -> None:
+        """Test that an aider process that exits raises a SessionError."""
+        failing = self._executable("failing", f"#!{sys.executable}\n")
+        with self.assertRaises(SessionError):
+            Session(self.tmp_dir, failing)
+
+    def test_timeout(self) -> None:
+        """Test that an aider process that is not ready times out."""
+        hanging = self._executable(
+            "hanging", f"#!{sys.executable}\nimport time\ntime.sleep(60)\n"
+        )
+        with self.assertRaisesRegex(SessionError, "not ready within 0.2"):
+            Session(self.tmp_dir, hanging, timeout=0.2)
+
+    def test_pool_environment(self) -> None:
+        """Test that the pool reads its settings when it is used."""
+        pool = Pool()
+        env = dict(PROMPTS_AIDER_IDLE="60", PROMPTS_AIDER_TIMEOUT="soon")
+        with patch.dict(os.environ, env):
+            with self.assertLogs("bartste_prompts", "WARNING") as logs:
+                self.assertEqual(pool.timeout, 1800.0)
+            self.assertEqual(pool.max_idle, 60.0)
+        self.assertIn("PROMPTS_AIDER_TIMEOUT='soon'", logs.output[0])
+
+    def test_pool_reuses_session(self) -> None:
+        """Test that a session is reused for the same working tree."""
+        pool = Pool(executable=self.aider)
+        self.addCleanup(pool.close)
+        with pool.session(self.tmp_dir) as first:
+            pass
+        with pool.session(self.tmp_dir) as second:
+            pass
+        self.assertIs(first, second)
+
+    def test_pool_replaces_dead_session(self) -> None:
+        """Test that a session whose process died is replaced."""
+        pool = Pool(executable=self.aider)
+        self.addCleanup(pool.close)
+        with pool.session(self.tmp_dir) as first:
+            pass
+        os.kill(first.pid, signal.SIGKILL)
+        first._process.wait()
+        with pool.session(self.tmp_dir) as second:
+            self.assertNotEqual(first.pid, second.pid)
+
+    def test_pool_evicts_idle_sessions(self) -> None:
+        """Test that idle sessions are closed."""
+        pool = Pool(max_idle=0, executable=self.aider)
+        with pool.session(self.tmp_dir) as session:
+            pass
+        self.assertEqual(pool.evict_idle(), 1)
+        self.assertFalse(session.is_alive())
+
+    def test_pool_closes_session_on_error(self) -> None:
+        """Test that a session is not reused after an error."""
+        pool = Pool(executable=self.aider)
+        with self.assertRaises(RuntimeError):
+            with pool.session(self.tmp_dir) as session:
+                raise RuntimeError
+        self.assertFalse(session.is_alive())
+
+    def test_action(self) -> None:
+        """Test that the aider-session action streams the response."""
+        pool = Pool(executable=self.aider)
+        self.addCleanup(pool.close)
+        action = ActionFactory("aider-session").create(
+            "prompt", command="fix", files="a.py"
+        )
+        stdout = io.StringIO()
+        with patch.object(_sessions, "pool", pool), redirect_stdout(stdout):
+            with _sessions.workdir(self.tmp_dir):
+                action()
+        self.assertRegex(stdout.getvalue(), r"Added a.py\n\d+: prompt\n")
+
+    def test_action_async(self) -> None:
+        """Test that awaiting the aider-session action uses the pool."""
+        pool = Pool(executable=self.aider)
+        self.addCleanup(pool.close)
+        factory = ActionFactory("aider-session")
+        stdout = io.StringIO()
+        with patch.object(_sessions, "pool", pool), redirect_stdout(stdout):
+            with _sessions.workdir(self.tmp_dir):
+                factory.create("one", command="fix", files="a.py")()
+                action = factory.create("two", command="fix", files="a.py")
+                asyncio.run(action.acall())
+        pids = re.findall(r"(\d+): (?:one|two)", stdout.getvalue())
+        self.assertEqual(len(pids), 2)
+        self.assertEqual(pids[0], pids[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
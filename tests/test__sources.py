@@ -0,0 +1,142 @@
+"""Unit tests for option values that are read from their source."""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prompts import _parser, _sources
+from prompts._sources import Source
+from prompts.instructions import Instructions
+
+
+class TestSources(unittest.TestCase):
+    """Test suite for parsing and reading value sources."""
+
+    def setUp(self) -> None:
+        """Set up a temporary directory with a value file."""
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.path = os.path.join(self.test_dir, "diff.txt")
+        with open(self.path, "w") as file:
+            file.write("x" * 100)
+
+    def test_parse(self) -> None:
+        """Test that only values starting with @ refer to a source."""
+        self.assertEqual(_sources.parse("plain"), "plain")
+        self.assertEqual(_sources.parse("@@literal"), "@literal")
+        for value in ("@-", "@fd:3", f"@{self.path}"):
+            source = _sources.parse(value)
+            self.assertIsInstance(source, Source)
+            self.assertEqual(source.spec, value)
+
+    def test_parse_errors(self) -> None:
+        """Test that invalid sources are rejected."""
+        for value in ("@fd:x", "@/does/not/exist"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                _sources.parse(value)
+
+    def test_file(self) -> None:
+        """Test that a file is read in chunks."""
+        source = Source(f"@{self.path}")
+        self.assertEqual(list(source.chunks(40)), ["x" * 40] * 2 + ["x" * 20])
+        self.assertEqual(str(source), "x" * 100)
+
+    def test_stdin(self) -> None:
+        """Test that stdin is kept after it is read completely."""
+        with patch("sys.stdin", io.StringIO("from stdin")):
+            source = Source("@-")
+            self.assertEqual(source.read(), "from stdin")
+        self.assertEqual(list(source.chunks()), ["from stdin"])
+
+    def test_fd(self) -> None:
+        """Test that a file descriptor is read without closing it."""
+        read, write = os.pipe()
+        self.addCleanup(os.close, read)
+        with os.fdopen(write, "w") as file:
+            file.write("from fd")
+        self.assertEqual(Source(f"@fd:{read}").read(), "from fd")
+        os.fstat(read)
+
+
+class TestStreaming(unittest.TestCase):
+    """Test suite for streaming prompts with value sources."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        os.makedirs(os.path.join(self.test_dir, "commands", "commit"))
+        os.makedirs(os.path.join(self.test_dir, "default", "filetype"))
+        self._write("Commit", "commands", "commit", "command.md")
+        self._write("Diff:\n{user}\nEnd", "commands", "commit", "user.md")
+        self._write("{files!r}", "default", "files.md")
+        self._write("", "default", "empty.md")
+        self._write("Python", "default", "filetype", "python.md")
+        self.diff = os.path.join(self.cache_dir, "diff")
+        with open(self.diff, "w") as file:
+            file.write("+ added\n- removed")
+
+    def _write(self, content: str, *parts: str) -> None:
+        """Write an instruction file."""
+        with open(os.path.join(self.test_dir, *parts), "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def test_iter_prompt(self) -> None:
+        """Test that the chunks join to the same prompt as make_prompt."""
+        instructions = Instructions(self.test_dir)
+        requests = [
+            dict(user="a diff"),
+            dict(user="", filetype="python", empty="x"),
+            dict(files="a.py", filetype="python"),
+            dict(user=Source(f"@{self.diff}"), filetype="python"),
+        ]
+        for kwargs in requests:
+            self.assertEqual(
+                "".join(instructions.iter_prompt("commit", **kwargs)),
+                instructions.make_prompt("commit", **kwargs),
+            )
+
+    def _run(self, *argv: str, stdin: str = "") -> str:
+        """Run the CLI and return its stdout."""
+        argv = ("--dir", self.test_dir, *argv, "--logfile", os.devnull)
+        args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+        stdout = io.StringIO()
+        with (
+            patch("sys.stdout", stdout),
+            patch("sys.stdin", io.StringIO(stdin)),
+        ):
+            args.func(args)
+        return stdout.getvalue()
+
+    def test_print(self) -> None:
+        """Test that the print action streams values from a file."""
+        stdout = self._run("commit", "--user", f"@{self.diff}")
+        self.assertEqual(stdout, "Commit\nDiff:\n+ added\n- removed\nEnd\n")
+
+    def test_json(self) -> None:
+        """Test that the json action streams values from stdin."""
+        stdout = self._run(
+            "commit", "--user", "@-", "--action", "json", stdin='a "diff"'
+        )
+        result = json.loads(stdout)
+        self.assertEqual(result["prompt"], 'Commit\nDiff:\na "diff"\nEnd')
+        self.assertEqual(result["user"], "@-")
+        self.assertEqual(result["command"], "commit")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Unit tests for the template cache of the prompts package."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from prompts._templates import Template, TemplateCache
+
+
+class TestTemplate(unittest.TestCase):
+    """Test suite for the Template class."""
+
+    def test_fields(self) -> None:
+        """Test that the placeholders are extracted."""
+        template = Template("Files: {files}, user: {user} {{literal}}")
+        self.assertEqual(template.fields, {"files", "user"})
+
+    def test_render_matches_format(self) -> None:
+        """Test that rendering gives the same result as str.format."""
+        sources = [
+            "Files: {files}",
+            "{files}{files} and {{braces}}",
+            "No placeholders",
+            "Padded: {files:>10}",
+            "Repr: {files!r}",
+            "",
+        ]
+        for source in sources:
+            with self.subTest(source=source):
+                self.assertEqual(
+                    Template(source).render(files="a.py"),
+                    source.format(files="a.py"),
+                )
+
+    def test_render_missing_value(self) -> None:
+        """Test that a placeholder without value raises a KeyError."""
+        with self.assertRaises(KeyError):
+            Template("{files} {user}").render(files="a.py")
+
+    def test_render_invalid(self) -> None:
+        """Test that invalid templates raise like str.format."""
+        with self.assertRaises(ValueError):
+            Template("Unbalanced {").render(files="a.py")
+
+
+class TestTemplateCache(unittest.TestCase):
+    """Test suite for the TemplateCache class."""
+
+    def setUp(self) -> None:
+        """Set up a temporary directory with instruction files."""
+        self.test_dir = tempfile.mkdtemp()
+        self.paths = [self._write(f"{i}.md", f"Template {i}") for i in range(3)]
+
+    def _write(self, name: str, content: str) -> str:
+        """Write a file and return its path."""
+        path = os.path.join(self.test_dir, name)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def test_hits_and_misses(self) -> None:
+        """Test that repeated reads are served from the cache."""
+        cache = TemplateCache()
+        first = cache.get(self.paths[0])
+        self.assertIs(cache.get(self.paths[0]), first)
+        self.assertEqual(tuple(cache.cache_info()), (1, 1, 256, 1))
+
+    def test_mtime_invalidation(self) -> None:
+        """Test that a modified file is read again."""
+        cache = TemplateCache()
+        cache.get(self.paths[0])
+        self._write("0.md", "Changed")
+        os.utime(self.paths[0], ns=(0, 0))
+        self.assertEqual(cache.get(self.paths[0]).source, "Changed")
+        self.assertEqual(cache.cache_info().misses, 2)
+
+    def test_eviction(self) -> None:
+        """Test that the least recently used template is evicted."""
+        cache = TemplateCache(maxsize=2)
+        cache.get(self.paths[0])
+        cache.get(self.paths[1])
+        cache.get(self.paths[0])
+        cache.get(self.paths[2])
+        self.assertEqual(cache.cache_info().currsize, 2)
+        cache.get(self.paths[0])
+        self.assertEqual(cache.cache_info().hits, 2)
+        cache.get(self.paths[1])
+        self.assertEqual(cache.cache_info().misses, 4)
+
+    def test_clear(self) -> None:
+        """Test that clearing resets the cache and its statistics."""
+        cache = TemplateCache()
+        cache.get(self.paths[0])
+        cache.clear()
+        self.assertEqual(tuple(cache.cache_info()), (0, 0, 256, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
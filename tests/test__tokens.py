@@ -0,0 +1,147 @@
+"""Unit tests for counting tokens and fitting prompts into a budget."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from prompts import _parser, _tokens
+from prompts.exceptions import TokenBudgetError
+from prompts.instructions import Instructions
+
+
+def words(text: str) -> int:
+    """Count the words of a text, a tokenizer for the tests."""
+    return len(text.split())
+
+
+class TestTokens(unittest.TestCase):
+    """Test suite for the token budget."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions and cache directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self._write("Review", "commands", "review", "command.md")
+        self._write("Files: {files}", "default", "files.md")
+        self._write("Diff:\n{user}", "default", "user.md")
+        self.instructions = Instructions(self.test_dir)
+
+    def _write(self, content: str, *parts: str) -> None:
+        """Write an instruction file, creating its directories."""
+        path = os.path.join(self.test_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def test_estimate(self) -> None:
+        """Test the estimate of ASCII and multi-byte text."""
+        self.assertEqual(_tokens.estimate(""), 0)
+        self.assertEqual(_tokens.estimate("a" * 16), 4)
+        self.assertEqual(_tokens.estimate("a" * 17), 5)
+        self.assertGreater(_tokens.estimate("日本語" * 4), 12)
+
+        value = "x" * 10_000_000
+        start = time.perf_counter()
+        self.assertEqual(_tokens.estimate(value), 2_500_000)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_load(self) -> None:
+        """Test loading tokenizers by name."""
+        self.assertIs(_tokens.load(), _tokens.estimate)
+        self.assertIs(_tokens.load(f"{__name__}:words"), words)
+        environ = {"PROMPTS_TOKENIZER": f"{__name__}:words"}
+        with patch.dict("os.environ", environ):
+            self.assertIs(_tokens.load(), words)
+        with self.assertRaises(ValueError):
+            _tokens.load("missing.module:count")
+
+    def test_fit(self) -> None:
+        """Test that a prompt within the budget is counted, not changed."""
+        budget = _tokens.Budget(tokenizer=words)
+        fragments = budget.fit(
+            self.instructions, "review", files="a.py", user="one two"
+        )
+        self.assertEqual(
+            [x.report() for x in fragments],
+            [
+                dict(key="command", tokens=1),
+                dict(key="files", tokens=2),
+                dict(key="user", tokens=3),
+            ],
+        )
+        self.assertEqual(_tokens.count(fragments), 8)
+        self.assertEqual(
+            _tokens.join(fragments),
+            self.instructions.make_prompt(
+                "review", files="a.py", user="one two"
+            ),
+        )
+
+    def test_truncate(self) -> None:
+        """Test that the largest value is truncated first."""
+        user = " ".join(["word"] * 100)
+        budget = _tokens.Budget(50, tokenizer=words)
+        fragments = budget.fit(
+            self.instructions, "review", files="a.py", user=user
+        )
+        self.assertLessEqual(_tokens.count(fragments), 50)
+        report = {x.key: x.report() for x in fragments}
+        self.assertEqual(report["files"], dict(key="files", tokens=2))
+        self.assertEqual(report["user"]["status"], "truncated")
+        self.assertEqual(report["user"]["original"], 101)
+        self.assertIn("[... truncated", _tokens.join(fragments))
+
+    def test_drop(self) -> None:
+        """Test that instructions are dropped in the order of priority."""
+        user = " ".join(["word"] * 10)
+        budget = _tokens.Budget(13, "drop", ["user"], tokenizer=words)
+        fragments = budget.fit(
+            self.instructions, "review", files="a.py", user=user
+        )
+        self.assertEqual(_tokens.join(fragments), f"Review\nDiff:\n{user}")
+        self.assertEqual(fragments[1].status, "dropped")
+
+        self._write("Explain the code", "commands", "explain", "command.md")
+        budget = _tokens.Budget(2, "drop", tokenizer=words)
+        with self.assertRaises(TokenBudgetError):
+            budget.fit(Instructions(self.test_dir), "explain", user=user)
+
+    def test_error(self) -> None:
+        """Test that the error policy rejects a prompt that is too long."""
+        budget = _tokens.Budget(3, "error", tokenizer=words)
+        with self.assertRaises(TokenBudgetError) as context:
+            budget.fit(self.instructions, "review", files="a.py b.py")
+        self.assertIn("5 tokens", str(context.exception))
+        with self.assertRaises(ValueError):
+            _tokens.Budget(3, "unknown")
+
+    def test_cli(self) -> None:
+        """Test the token counts in the json output."""
+        argv = ["--dir", self.test_dir, "review", "--user", "x" * 10_000]
+        argv += ["--max-tokens", "100", "--action", "json"]
+        argv += ["--logfile", os.devnull]
+        args = _parser.setup(lazy=True, argv=argv).parse_args(argv)
+        with patch("sys.stdout", io.StringIO()) as stdout:
+            args.func(args)
+        output = json.loads(stdout.getvalue())
+        self.assertLessEqual(output["total_tokens"], 100)
+        self.assertEqual(output["tokens"][0], dict(key="command", tokens=2))
+        self.assertEqual(output["tokens"][1]["status"], "truncated")
+        self.assertLess(len(output["prompt"]), 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
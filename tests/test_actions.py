@@ -0,0 +1,194 @@
+"""Unit tests for the actions of the prompts package."""
+
+import asyncio
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.mock import patch
+
+from prompts import _shards
+from prompts.actions import AbstractAction, ActionFactory, Aider
+from prompts.exceptions import AiderActionError
+
+# Stub for the aider CLI that prints its file arguments. It fails when a file
+# named "fail.py" is passed, or when a file named "flaky.py" is passed for the
+# first time. When a file named "sleep.py" is passed, it writes its pid to a
+# file and sleeps.
+_AIDER = f"""#!{sys.executable}
+import os, sys, time
+files = sys.argv[sys.argv.index("--message") + 2:]
+print("files:", ",".join(files))
+if "sleep.py" in files:
+    with open(os.path.join(os.path.dirname(__file__), "pid"), "w") as file:
+        file.write(str(os.getpid()))
+    time.sleep(60)
+marker = os.path.join(os.path.dirname(__file__), "flaky")
+if "flaky.py" in files and not os.path.exists(marker):
+    open(marker, "w").close()
+    sys.exit(3)
+sys.exit(1 if "fail.py" in files else 0)
+"""
+
+
+class TestAider(unittest.TestCase):
+    """Test suite for the Aider action, using a stub aider executable."""
+
+    def setUp(self) -> None:
+        """Put a stub aider executable on the PATH."""
+        self.bin_dir = tempfile.mkdtemp()
+        path = os.path.join(self.bin_dir, "aider")
+        with open(path, "w") as file:
+            file.write(_AIDER)
+        os.chmod(path, 0o755)
+        env = dict(PATH=f"{self.bin_dir}{os.pathsep}{os.environ['PATH']}")
+        patcher = patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        """Remove the stub executable."""
+        shutil.rmtree(self.bin_dir)
+
+    def _call(self, files: str, **env: str) -> tuple[str, str]:
+        """Call the aider action and return its stdout and stderr."""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with patch.dict(os.environ, env):
+            action = Aider("prompt", "fix", files=files)
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                action()
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_single_process(self) -> None:
+        """Test that all files are passed to a single aider process."""
+        stdout, _ = self._call("a.py,b.py,c.py")
+        self.assertEqual(stdout, "files: a.py,b.py,c.py\n")
+
+    def test_single_process_failure(self) -> None:
+        """Test that a failing aider process raises an error."""
+        with self.assertRaises(AiderActionError):
+            self._call("fail.py")
+
+    def test_sharded(self) -> None:
+        """Test that files are split over prefixed aider processes."""
+        stdout, stderr = self._call(
+            "a.py,b.py,c.py", PROMPTS_AIDER_SHARD_SIZE="2"
+        )
+        self.assertIn("[shard 1/2] files: a.py,b.py\n", stdout)
+        self.assertIn("[shard 2/2] files: c.py\n", stdout)
+        self.assertIn("2 of 2 shards succeeded", stderr)
+
+    def test_sharded_failure(self) -> None:
+        """Test that all shards run and failed files are reported."""
+        with self.assertRaises(AiderActionError) as context:
+            self._call("a.py,fail.py,c.py", PROMPTS_AIDER_SHARD_SIZE="1")
+        self.assertIn("--files fail.py", str(context.exception))
+
+    def test_sharded_retry(self) -> None:
+        """Test that a failing shard is retried."""
+        _, stderr = self._call(
+            "a.py,flaky.py",
+            PROMPTS_AIDER_SHARD_SIZE="1",
+            PROMPTS_AIDER_RETRIES="1",
+        )
+        self.assertIn("attempts 2", stderr)
+        self.assertIn("2 of 2 shards succeeded", stderr)
+
+    def _acall(self, files: str, **env: str) -> tuple[str, str]:
+        """Await the aider action and return its stdout and stderr."""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with patch.dict(os.environ, env):
+            action = Aider("prompt", "fix", files=files)
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                asyncio.run(action.acall())
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_async(self) -> None:
+        """Test that the async action streams the output of aider."""
+        stdout, _ = self._acall("a.py,b.py")
+        self.assertEqual(stdout, "files: a.py,b.py\n")
+        with self.assertRaises(AiderActionError):
+            self._acall("fail.py")
+
+    def test_async_sharded(self) -> None:
+        """Test that the async action runs the shards concurrently."""
+        stdout, stderr = self._acall(
+            "a.py,b.py,c.py", PROMPTS_AIDER_SHARD_SIZE="2"
+        )
+        self.assertIn("[shard 1/2] files: a.py,b.py\n", stdout)
+        self.assertIn("[shard 2/2] files: c.py\n", stdout)
+        self.assertIn("2 of 2 shards succeeded", stderr)
+
+    def test_async_cancel(self) -> None:
+        """Test that cancelling the action terminates aider."""
+        pidfile = os.path.join(self.bin_dir, "pid")
+
+        async def cancel() -> int:
+            action = Aider("prompt", "fix", files="sleep.py")
+            task = asyncio.create_task(action.acall())
+            while not os.path.exists(pidfile) or not os.path.getsize(pidfile):
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            with open(pidfile) as file:
+                return int(file.read())
+
+        with redirect_stdout(io.StringIO()):
+            pid = asyncio.run(asyncio.wait_for(cancel(), 30))
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pid, 0)
+
+
+class TestStream(unittest.TestCase):
+    """Test suite for actions that are given the prompt in chunks."""
+
+    def test_default(self) -> None:
+        """Test that the default joins the chunks and calls the action."""
+        prompts: list[str] = []
+
+        class Recorder(AbstractAction):
+            def __call__(self) -> None:
+                prompts.append(self.prompt)
+
+        Recorder("", "fix").stream(["a", "b", "c"])
+        self.assertEqual(prompts, ["abc"])
+
+    def test_streaming(self) -> None:
+        """Test that only actions that override `stream` are streamed to."""
+        for name, expected in [
+            ("print", True),
+            ("json", True),
+            ("aider", False),
+            ("aider-code", False),
+        ]:
+            with self.subTest(name=name):
+                self.assertEqual(ActionFactory(name).streaming, expected)
+
+
+class TestShards(unittest.TestCase):
+    """Test suite for the shard helpers."""
+
+    def test_split(self) -> None:
+        """Test that files are split in order."""
+        shards = _shards.split(["a", "b", "c", "d", "e"], 2)
+        files = [shard.files for shard in shards]
+        self.assertEqual(files, [["a", "b"], ["c", "d"], ["e"]])
+        self.assertEqual(shards[2].name, "shard 3/3")
+
+    def test_run_exception(self) -> None:
+        """Test that an exception counts as a failed attempt."""
+
+        def func(shard: _shards.Shard) -> int:
+            raise RuntimeError("boom")
+
+        (shard,) = _shards.run(_shards.split(["a"], 1), func, retries=2)
+        self.assertFalse(shard.ok)
+        self.assertEqual(shard.attempts, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
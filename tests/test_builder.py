@@ -0,0 +1,114 @@
+"""Unit tests for the PromptBuilder class of the prompts package."""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from prompts.builder import PromptBuilder
+from prompts.exceptions import (
+    InstructionNotFoundError,
+    InvalidInstructionsError,
+)
+from prompts.instructions import Instructions
+
+
+class TestPromptBuilder(unittest.TestCase):
+    """Test suite for the PromptBuilder class."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._write("Explain", "commands", "explain", "command.md")
+        self._write("Python", "commands", "explain", "filetype", "python.md")
+        self._write("Files: {files}", "default", "files.md")
+        self._write("User: {user}", "default", "user.md")
+
+    def _write(self, content: str, *parts: str) -> None:
+        """Write an instruction file, creating its directories."""
+        path = os.path.join(self.test_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def test_render(self) -> None:
+        """Test that the builder renders the same prompts as Instructions."""
+        builder = PromptBuilder(self.test_dir)
+        kwargs = dict(files="a.py", filetype="python", user="hi")
+        self.assertEqual(
+            builder.render("explain", **kwargs),
+            Instructions(self.test_dir).make_prompt("explain", **kwargs),
+        )
+        self.assertEqual(builder.commands(), {"explain"})
+        self.assertEqual(
+            builder.options("explain"), {"files", "filetype", "user"}
+        )
+
+    def test_no_io(self) -> None:
+        """Test that rendering does not touch the filesystem."""
+        builder = PromptBuilder(self.test_dir)
+        with (
+            patch("os.stat", side_effect=AssertionError("stat")),
+            patch("builtins.open", side_effect=AssertionError("open")),
+        ):
+            prompt = builder.render("explain", files="a.py")
+            with self.assertRaises(InstructionNotFoundError):
+                builder.render("explain", filetype="lua")
+        self.assertEqual(prompt, "Explain\nFiles: a.py")
+
+    def test_render_many(self) -> None:
+        """Test rendering many requests from multiple threads."""
+        builder = PromptBuilder(self.test_dir)
+        requests = [
+            {"command": "explain", "files": f"{i}.py"} for i in range(100)
+        ]
+        with ThreadPoolExecutor(4) as pool:
+            prompts = list(pool.map(builder.render_many, [requests] * 8))
+        expected = [f"Explain\nFiles: {i}.py" for i in range(100)]
+        self.assertEqual(prompts, [expected] * 8)
+
+    def test_arender(self) -> None:
+        """Test rendering concurrently from coroutines."""
+
+        async def render(builder: PromptBuilder) -> list[str]:
+            return await asyncio.gather(
+                *(builder.arender("explain", files=f"{i}") for i in range(10))
+            )
+
+        for preload in (True, False):
+            builder = PromptBuilder(self.test_dir, preload=preload)
+            prompts = asyncio.run(render(builder))
+            expected = [f"Explain\nFiles: {i}" for i in range(10)]
+            self.assertEqual(prompts, expected)
+
+    def test_validate(self) -> None:
+        """Test that invalid instructions are reported up front."""
+        self._write("Files: {files} {missing}", "default", "files.md")
+        self._write("Fix", "commands", "fix", "command.md")
+        self._write("Fix {", "commands", "fix", "user.md")
+        self._write("User: {user}", "commands", "ask", "user.md")
+        with self.assertRaises(InvalidInstructionsError) as context:
+            PromptBuilder(self.test_dir)
+        message = str(context.exception)
+        self.assertIn("explain --files 'files': KeyError", message)
+        self.assertIn("fix --user 'user': ValueError", message)
+        self.assertIn("ask: InstructionNotFoundError", message)
+        self.assertEqual(len(message.splitlines()), 5)
+        PromptBuilder(self.test_dir, validate=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+"""Unit tests for the Index class in the prompts package."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prompts import _index
+from prompts._index import Index
+
+
+class TestIndex(unittest.TestCase):
+    """Test suite for the Index class."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions and cache directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(_index._loaded.clear)
+
+        os.makedirs(os.path.join(self.test_dir, "commands", "explain"))
+        os.makedirs(os.path.join(self.test_dir, "default", "filetype"))
+        self._touch("commands", "explain", "command.md")
+        self._touch("default", "files.md")
+        self._touch("default", "filetype", "python.md")
+
+    def _touch(self, *parts: str) -> None:
+        """Create an empty file in the instructions directory."""
+        with open(os.path.join(self.test_dir, *parts), "w") as file:
+            file.write("")
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def test_scan(self) -> None:
+        """Test that a scan indexes all files and directories."""
+        index = Index.scan(self.test_dir)
+        self.assertEqual(index.listdir("commands"), ["explain"])
+        self.assertEqual(index.listdir("default"), ["files.md", "filetype"])
+        self.assertTrue(index.isfile("default/filetype/python.md"))
+        self.assertTrue(index.exists("default/filetype"))
+        self.assertFalse(index.isfile("default/filetype"))
+        self.assertFalse(index.exists("default/user.md"))
+
+    def test_listdir_missing(self) -> None:
+        """Test that listing a missing directory raises FileNotFoundError."""
+        index = Index.scan(self.test_dir)
+        with self.assertRaises(FileNotFoundError):
+            index.listdir("commands/fix")
+
+    def test_path(self) -> None:
+        """Test that relative paths are joined to the directory."""
+        index = Index.scan(self.test_dir)
+        expected = os.path.join(self.test_dir, "default", "files.md")
+        self.assertEqual(index.path("default/files.md"), expected)
+        self.assertEqual(index.path(""), self.test_dir)
+
+    def test_load_persists_cache(self) -> None:
+        """Test that loading writes a cache file that is reused."""
+        Index.load(self.test_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        _index._loaded.clear()
+        with patch.object(Index, "scan") as scan:
+            index = Index.load(self.test_dir)
+        scan.assert_not_called()
+        self.assertTrue(index.isfile("default/files.md"))
+
+    def test_load_reuses_memory(self) -> None:
+        """Test that a second load in the same process is not rescanned."""
+        first = Index.load(self.test_dir)
+        self.assertIs(Index.load(self.test_dir), first)
+
+    def test_stale_after_change(self) -> None:
+        """Test that adding a file invalidates the index."""
+        index = Index.load(self.test_dir)
+        self.assertFalse(index.is_stale())
+
+        self._touch("default", "user.md")
+        os.utime(os.path.join(self.test_dir, "default"), ns=(0, 0))
+        self.assertTrue(index.is_stale())
+        self.assertTrue(Index.load(self.test_dir).isfile("default/user.md"))
+
+    def test_missing_directory(self) -> None:
+        """Test that a missing directory results in an empty index."""
+        index = Index.load(os.path.join(self.test_dir, "missing"))
+        self.assertFalse(index.is_stale())
+        with self.assertRaises(FileNotFoundError):
+            index.listdir("")
+
+
+class TestOverlay(unittest.TestCase):
+    """Test suite for layered instruction directories."""
+
+    def setUp(self) -> None:
+        """Set up three layers and a cache directory."""
+        self.root = tempfile.mkdtemp()
+        cache = os.path.join(self.root, "cache")
+        patcher = patch("prompts._paths.cache", cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(_index._loaded.clear)
+        self.addCleanup(_index._overlays.clear)
+        self.layers = [os.path.join(self.root, x) for x in "abc"]
+
+        self._write("a", "Org", "commands", "explain", "command.md")
+        self._write("a", "Files: {files}", "default", "files.md")
+        self._write("a", "Python", "default", "filetype", "python.md")
+        self._write("b", "Team", "commands", "explain", "command.md")
+        self._write("b", "Lua", "default", "filetype", "lua.md")
+        self._write("c", "Personal", "commands", "fix", "command.md")
+        self.directory = os.pathsep.join(self.layers)
+
+    def _write(self, layer: str, content: str, *parts: str) -> None:
+        """Write an instruction file in a layer."""
+        path = os.path.join(self.root, layer, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.root)
+
+    def test_merge(self) -> None:
+        """Test that later layers override earlier ones."""
+        overlay = _index.load(self.directory)
+        self.assertIsInstance(overlay, _index.Overlay)
+        self.assertEqual(overlay.listdir("commands"), ["explain", "fix"])
+        self.assertEqual(
+            overlay.listdir("default/filetype"), ["lua.md", "python.md"]
+        )
+        path = "commands/explain/command.md"
+        self.assertEqual(overlay.which(path), self.layers[1])
+        self.assertEqual(overlay.template(path).source, "Team")
+        self.assertEqual(overlay.which("default/files.md"), self.layers[0])
+        self.assertFalse(overlay.exists("default/user.md"))
+        with self.assertRaises(FileNotFoundError):
+            overlay.which("default/user.md")
+
+    def test_reload(self) -> None:
+        """Test that the overlay is only rebuilt when a layer changed."""
+        overlay = _index.load(self.directory)
+        self.assertIs(_index.load(self.directory), overlay)
+        self._write("c", "Personal", "commands", "explain", "command.md")
+        changed = _index.load(self.directory)
+        self.assertIsNot(changed, overlay)
+        path = "commands/explain/command.md"
+        self.assertEqual(changed.which(path), self.layers[2])
+
+    def test_missing_layer(self) -> None:
+        """Test that a missing layer is ignored."""
+        missing = os.path.join(self.root, "missing")
+        overlay = _index.load(os.pathsep.join([missing, self.layers[0]]))
+        self.assertEqual(overlay.listdir("commands"), ["explain"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ import os
 import shutil
 import tempfile
 import unittest
+from unittest.mock import patch
 
 from prompts.instructions import Instructions
 from prompts.exceptions import InstructionNotFoundError
@@ -15,6 +16,10 @@ class TestInstructions(unittest.TestCase):
     def setUp(self) -> None:
         """Set up a temporary directory with sample instruction files."""
         self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
         self._create_instruction_structure()
 
     def _create_instruction_structure(self) -> None:
@@ -43,6 +48,7 @@ class TestInstructions(unittest.TestCase):
     def tearDown(self) -> None:
         """Clean up the temporary directory."""
         shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
 
     def test_initialization(self) -> None:
         """Test that Instructions initializes correctly with custom directory."""
@@ -86,6 +92,16 @@ class TestInstructions(unittest.TestCase):
         with self.assertRaises(InstructionNotFoundError):
             instructions.make_prompt("explain", missing_key="value")
 
+    def test_template_cache(self) -> None:
+        """Test that repeated prompts are served from the template cache."""
+        instructions = Instructions(self.test_dir)
+        instructions.make_prompt("explain", files="a.py", filetype="python")
+        before = instructions.cache_info()
+        instructions.make_prompt("explain", files="b.py", filetype="python")
+        after = instructions.cache_info()
+        self.assertEqual(after.hits - before.hits, 3)
+        self.assertEqual(after.misses, before.misses)
+
     def test_list_commands(self) -> None:
         """Test that list_commands returns available commands."""
         instructions = Instructions(self.test_dir)
@@ -118,6 +134,50 @@ class TestInstructions(unittest.TestCase):
         expected = os.path.join(self.test_dir, "default", "files.md")
         self.assertEqual(path, expected)
 
+    def test_layers(self) -> None:
+        """Test that layers are merged and report which layer is used."""
+        layer = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, layer)
+        os.makedirs(os.path.join(layer, "commands", "fix"))
+        with open(
+            os.path.join(layer, "commands", "fix", "command.md"), "w"
+        ) as f:
+            f.write("Fix command")
+
+        instructions = Instructions(os.pathsep.join([self.test_dir, layer]))
+        self.assertEqual(instructions.list_commands(), {"explain", "fix"})
+        prompt = instructions.make_prompt("fix", files="utils.py")
+        self.assertEqual(prompt, "Fix command\nDefault files: utils.py")
+        self.assertEqual(instructions.which("fix", "command.md"), layer)
+        self.assertEqual(
+            instructions.which("fix", "files.md"), self.test_dir
+        )
+
+    def test_arrange(self) -> None:
+        """Test that static fragments are placed before volatile ones."""
+        instructions = Instructions(self.test_dir)
+        kwargs = {"user": "hi", "files": "a.py", "filetype": "python"}
+        arranged = instructions.arrange("explain", kwargs)
+        self.assertEqual(list(arranged), ["filetype", "files", "user"])
+        self.assertEqual(instructions.volatility("explain", "command"), 0)
+        self.assertEqual(instructions.volatility("explain", "filetype"), 1)
+        self.assertEqual(instructions.volatility("explain", "files"), 2)
+
+    def test_static_prefix(self) -> None:
+        """Test that the static prefix is the start of the prompt."""
+        instructions = Instructions(self.test_dir)
+        kwargs = instructions.arrange(
+            "explain", {"files": "a.py", "filetype": "python"}
+        )
+        prompt = instructions.make_prompt("explain", **kwargs)
+        prefix = instructions.static_prefix("explain", **kwargs)
+        self.assertEqual(
+            prefix, "Explain command: explain\nPython-specific instruction"
+        )
+        self.assertTrue(prompt.startswith(prefix + "\n"))
+        self.assertEqual(instructions.values("explain", "filetype"), {"python"})
+        self.assertEqual(instructions.values("explain", "files"), set())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,135 @@
+"""Unit tests for the profiling module of the prompts package."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from prompts import _parser, profiling
+from prompts.__main__ import main
+from prompts.instructions import Instructions
+
+
+class TestProfiling(unittest.TestCase):
+    """Test suite for the spans and the profiler."""
+
+    def test_inactive(self) -> None:
+        """Test that spans do nothing without an active profiler."""
+        self.assertIsNone(profiling.active())
+        with profiling.span("noop"):
+            pass
+        self.assertIsNone(profiling.active())
+
+    def test_spans(self) -> None:
+        """Test that spans of all threads are collected."""
+        with profiling.profile() as profiler:
+            self.assertIs(profiling.active(), profiler)
+            threads = [
+                threading.Thread(target=self._work, args=("thread",))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self._work("main")
+
+        report = profiler.report()
+        self.assertEqual(report["spans"]["thread"]["count"], 4)
+        self.assertEqual(report["spans"]["main"]["count"], 1)
+        self.assertGreaterEqual(report["wall"], report["spans"]["main"]["max"])
+        self.assertIsNone(profiling.active())
+        json.dumps(report)
+
+    @staticmethod
+    def _work(name: str) -> None:
+        """Run a span."""
+        with profiling.span(name):
+            sum(range(1000))
+
+    def test_nested(self) -> None:
+        """Test that a nested profiler restores the outer one."""
+        with profiling.profile() as outer:
+            with profiling.profile() as inner:
+                self._work("inner")
+            self.assertIs(profiling.active(), outer)
+            self._work("outer")
+        self.assertEqual(list(inner.spans), ["inner"])
+        self.assertEqual(list(outer.spans), ["outer"])
+
+    def test_cprofile(self) -> None:
+        """Test that a cProfile profile is written when requested."""
+        with profiling.profile(cprofile=True) as profiler:
+            self._work("work")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profile.out")
+            profiler.dump_stats(path)
+            self.assertTrue(os.path.getsize(path))
+        with self.assertRaises(ValueError):
+            profiling.Profiler().dump_stats(path)
+
+
+class TestProfilingCli(unittest.TestCase):
+    """Test suite for the profiling of the prompts pipeline."""
+
+    def setUp(self) -> None:
+        """Set up a temporary instructions directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("prompts._paths.cache", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        os.makedirs(os.path.join(self.test_dir, "commands", "explain"))
+        os.makedirs(os.path.join(self.test_dir, "default"))
+        self._write("Explain", "commands", "explain", "command.md")
+        self._write("Files: {files}", "default", "files.md")
+
+    def _write(self, content: str, *parts: str) -> None:
+        """Write an instruction file."""
+        with open(os.path.join(self.test_dir, *parts), "w") as file:
+            file.write(content)
+
+    def tearDown(self) -> None:
+        """Clean up the temporary directories."""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def test_instructions(self) -> None:
+        """Test that the stages of making a prompt are profiled."""
+        with profiling.profile() as profiler:
+            Instructions(self.test_dir).make_prompt("explain", files="a.py")
+        for name in ("index.load", "template.read", "template.format"):
+            self.assertIn(name, profiler.spans)
+
+    def test_preparse(self) -> None:
+        """Test that the profiling options are parsed before the setup."""
+        argv = ["--profile-output", "out.json", "explain", "--files", "a.py"]
+        options = _parser.preparse_profile(argv)
+        self.assertEqual(options.profile_output, "out.json")
+        self.assertFalse(options.profile)
+        self.assertEqual(_parser._preparse_command(argv), "explain")
+
+    def test_main(self) -> None:
+        """Test that the CLI writes the timing breakdown to stderr."""
+        argv = ["prompts", "--dir", self.test_dir, "--profile", "explain"]
+        argv += ["--files", "a.py", "--logfile", os.devnull]
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with (
+            patch("sys.argv", argv),
+            patch("sys.stdout", stdout),
+            patch("sys.stderr", stderr),
+        ):
+            main()
+        self.assertEqual(stdout.getvalue(), "Explain\nFiles: a.py\n")
+        spans = json.loads(stderr.getvalue())["spans"]
+        for name in ("setup", "run", "template.read", "action.print"):
+            self.assertIn(name, spans)
+
+
+if __name__ == "__main__":
+    unittest.main()